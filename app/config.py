@@ -8,7 +8,68 @@ class Settings(BaseSettings):
     # Use Union to allow pydantic-settings to read it as a string from env, 
     # then validator converts to list.
     CORS_ORIGINS: Union[List[str], str] = ["*"]
+
+    # STI read mode: "download" (full NetCDF to /tmp, eager load) or
+    # "remote" (lazy byte-range reads over S3, only the chunks of the bbox)
+    STI_READ_MODE: str = "download"
+    STI_REMOTE_BLOCK_SIZE: int = 256 * 1024
+
+    # indices/sti/manifest.json: in-memory copy revalidated in the background after this age
+    STI_MANIFEST_TTL_SECONDS: float = 60
+
+    # Prefer the per-run Zarr stores (indices/sti_zarr/) for step listing and subsets
+    # when they exist; STI_ZARR_CHUNK is the lat/lon chunk size used by the ingest job
+    STI_ZARR_ENABLED: bool = False
+    STI_ZARR_CHUNK: int = 128
+    # Store 'sti' packed as int16 (CF scale_factor/add_offset/_FillValue, see sti_encoding)
+    STI_ZARR_INT16: bool = False
+
+    # On-disk cache of downloaded NetCDFs: LRU by access time within a byte budget
+    # ("" -> <tmp>/sti_nc)
+    STI_DISK_CACHE_DIR: str = ""
+    STI_DISK_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+
+    # In-process LRU of decoded STI grids (bytes)
+    STI_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Level-of-detail overview pyramids (2x/4x/8x block means) per step (bytes)
+    STI_LOD_CACHE_MAX_BYTES: int = 128 * 1024 * 1024
+
+    # Rasterized polygon masks keyed by geometry hash and grid signature (bytes)
+    STI_MASK_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+    # Decode NetCDFs in N worker processes (0 = in-thread under the HDF5 lock)
+    STI_DECODE_PROCESSES: int = 0
+
+    # Raster tiles: memory LRU (bytes) + on-disk directory ("" -> <tmp>/sti_tiles)
+    # with its own LRU byte budget (0 = unbounded)
+    STI_TILE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    STI_TILE_CACHE_DIR: str = ""
+    STI_TILE_DISK_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Point time series: decode pool size and per-run cube cache (bytes)
+    STI_POINT_WORKERS: int = 8
+    STI_POINT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # Background warm-up of newly published runs (started from the app lifespan)
+    STI_WARMER_ENABLED: bool = False
+    STI_WARMER_POLL_SECONDS: float = 300
+    STI_WARMER_CONCURRENCY: int = 4
+    STI_WARMER_MAX_BYTES_PER_SEC: float = 0
+    STI_WARMER_INITIAL_RUNS: int = 1
     
+    # Response compression (Accept-Encoding: zstd, br, gzip); br/zstd need the
+    # optional brotli/zstandard packages. Immutable responses keep their compressed
+    # variants in an LRU (bytes). Streamed bodies are flushed to the client every
+    # COMPRESSION_STREAM_FLUSH_BYTES of input instead of on every chunk.
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 5
+    COMPRESSION_ZSTD_LEVEL: int = 3
+    COMPRESSION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    COMPRESSION_STREAM_FLUSH_BYTES: int = 64 * 1024
+
     @field_validator("CORS_ORIGINS", mode="before")
     @classmethod
     def parse_cors_origins(cls, v: Union[str, List[str]]) -> List[str]:
@@ -19,6 +80,13 @@ class Settings(BaseSettings):
                  return [origin.strip() for origin in v.split(",") if origin.strip()]
         return v
 
+    @field_validator("STI_READ_MODE")
+    @classmethod
+    def check_read_mode(cls, v: str) -> str:
+        if v not in ("download", "remote"):
+            raise ValueError("STI_READ_MODE must be 'download' or 'remote'")
+        return v
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8"
@@ -0,0 +1,116 @@
+"""
+LRUs con presupuesto en bytes, compartidos por los servicios STI y las librerías
+(máscaras de polígonos en ``lib/geo/mask.py``).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from cachetools import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class ByteBudgetLRU(LRUCache):
+    """
+    LRU cuyo tamaño se mide en bytes (``nbytes`` de cada entrada) con contadores de uso.
+    """
+
+    def __init__(self, max_bytes: int, getsizeof: Callable[[Any], int] | None = None):
+        super().__init__(maxsize=max_bytes, getsizeof=getsizeof or (lambda v: int(v.nbytes)))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.rejected = 0
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.evictions += 1
+        self.evicted_bytes += self.getsizeof(value)
+        logger.info(f"Cache LRU: evict {key}")
+        return key, value
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self),
+            "bytes": int(self.currsize),
+            "max_bytes": int(self.maxsize),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "evicted_bytes": self.evicted_bytes,
+            "rejected": self.rejected,
+        }
+
+
+class DecodedCache:
+    """
+    Cache thread-safe de objetos decodificados con presupuesto en bytes.
+
+    ``get_or_load`` garantiza una sola decodificación concurrente por key
+    (los demás threads esperan el resultado en vez de re-abrir el HDF5).
+    """
+
+    def __init__(self, max_bytes: int):
+        self._lru = ByteBudgetLRU(max_bytes)
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            return self._lru.get(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._lru
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            try:
+                self._lru[key] = value
+            except ValueError:
+                # Entrada más grande que el presupuesto completo: se sirve pero no se cachea
+                self._lru.rejected += 1
+                logger.warning(f"Cache LRU: entrada {key} excede el presupuesto ({self._lru.maxsize} B)")
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._lru:
+                self._lru.hits += 1
+                return self._lru[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._lru:
+                    self._lru.hits += 1
+                    return self._lru[key]
+                self._lru.misses += 1
+            try:
+                value = loader()
+                self.put(key, value)
+                return value
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def resize(self, max_bytes: int) -> None:
+        """
+        Cambia el presupuesto en bytes. Vacía el cache: se usa al configurarlo.
+        """
+        with self._lock:
+            self._lru = ByteBudgetLRU(max_bytes, self._lru.getsizeof)
+
+    def clear(self) -> None:
+        """
+        Vacía el cache y reinicia los contadores.
+        """
+        with self._lock:
+            self._lru = ByteBudgetLRU(self._lru.maxsize, self._lru.getsizeof)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._lru.stats()
@@ -0,0 +1,3 @@
+from .grid import *
+from .mask import *
+from .polygon import *
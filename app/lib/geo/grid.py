@@ -0,0 +1,93 @@
+"""Index lookups on regular lat/lon grid axes.
+
+The STI and ERA5 products are stored on regular 0.25 deg grids, so the cell that
+contains a coordinate can be computed arithmetically (O(1) per query) instead of
+via ``.sel(method="nearest")``. Irregular axes fall back to a binary search.
+"""
+from __future__ import annotations
+
+from typing import Any, Tuple
+
+import numpy as np
+
+__all__ = [
+    "axis_spacing",
+    "axis_window",
+    "grid_signature",
+    "is_regular",
+    "nearest_index",
+]
+
+
+def axis_spacing(axis: Any) -> float:
+    """Return the mean signed spacing of a 1-D axis (0.0 for fewer than two values)."""
+
+    axis = np.asarray(axis, dtype="float64")
+    if axis.size < 2:
+        return 0.0
+    return float((axis[-1] - axis[0]) / (axis.size - 1))
+
+
+def is_regular(axis: Any, rtol: float = 1e-4) -> bool:
+    """True when consecutive differences are all equal to the mean spacing."""
+
+    axis = np.asarray(axis, dtype="float64")
+    if axis.size < 3:
+        return True
+    d = axis_spacing(axis)
+    return bool(np.allclose(np.diff(axis), d, rtol=rtol, atol=abs(d) * rtol))
+
+
+def nearest_index(axis: Any, values: Any, tolerance: float | None = None) -> np.ndarray:
+    """Vectorised nearest-cell lookup.
+
+    Returns an ``int64`` array with the index of the nearest axis value for each
+    query, or ``-1`` where the query is farther than ``tolerance`` from every
+    axis value. The default tolerance is half a grid cell, i.e. a query must fall
+    inside the cell footprint. Works for ascending and descending axes.
+    """
+
+    axis = np.asarray(axis, dtype="float64")
+    q = np.asarray(values, dtype="float64")
+    if axis.size == 0:
+        return np.full(q.shape, -1, dtype="int64")
+
+    d = axis_spacing(axis)
+    if tolerance is None:
+        # Half a cell (plus float slack); a single-value axis only matches itself
+        tolerance = abs(d) * 0.5 * (1 + 1e-9) if d else 1e-9
+
+    if d and is_regular(axis):
+        idx = np.rint((q - axis[0]) / d)
+        idx = np.where(np.isfinite(idx), idx, -1).astype("int64")
+        idx = np.clip(idx, 0, axis.size - 1)
+    else:
+        order = np.argsort(axis, kind="stable")
+        sorted_axis = axis[order]
+        pos = np.clip(np.searchsorted(sorted_axis, q), 1, max(axis.size - 1, 1))
+        left = np.clip(pos - 1, 0, axis.size - 1)
+        right = np.clip(pos, 0, axis.size - 1)
+        pick_right = np.abs(sorted_axis[right] - q) < np.abs(sorted_axis[left] - q)
+        idx = order[np.where(pick_right, right, left)]
+
+    ok = np.abs(axis[idx] - q) <= tolerance
+    return np.where(ok, idx, -1).astype("int64")
+
+
+def axis_window(axis: Any, lo: float, hi: float) -> slice:
+    """Index slice of the axis cells whose footprint intersects ``[lo, hi]`` (empty if none)."""
+
+    axis = np.asarray(axis, dtype="float64")
+    half = abs(axis_spacing(axis)) / 2
+    idx = np.nonzero((axis >= lo - half) & (axis <= hi + half))[0]
+    return slice(int(idx[0]), int(idx[-1]) + 1) if idx.size else slice(0, 0)
+
+
+def grid_signature(lats: Any, lons: Any) -> Tuple:
+    """Identity of a regular grid (size and end values of each axis), usable as a cache key."""
+
+    def axis(a: np.ndarray) -> Tuple:
+        a = np.asarray(a, dtype="float64")
+        return (int(a.size), round(float(a[0]), 6), round(float(a[-1]), 6)) if a.size else (0,)
+
+    return axis(lats) + axis(lons)
@@ -0,0 +1,129 @@
+"""Area weights of a polygon on a regular lat/lon grid.
+
+``build_mask`` rasterizes the polygon only inside the window of its bbox and
+weighs every cell ``coverage x cos(latitude)``. Coverage is the 0/1 centre test
+(``supersample=1``) or the covered fraction estimated on ``n x n`` sub-centres.
+A part that covers no cell (smaller than a cell, or between centres) takes the
+cell that contains its representative point.
+
+Masks only depend on the geometry and the grid: ``get_mask`` caches them by
+``(geometry_hash, grid_signature, supersample)`` in ``MASK_CACHE``, one
+byte-bounded LRU shared by the STI polygon stats and the historic aggregation.
+The app sets its budget from ``STI_MASK_CACHE_MAX_BYTES``.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+from ..cache import DecodedCache
+from .grid import axis_window, grid_signature
+from .polygon import (
+    Polygons,
+    cell_area_weights,
+    geometry_hash,
+    nearest_cell,
+    polygon_bounds,
+    rasterize,
+    representative_point,
+)
+
+__all__ = [
+    "GridMask",
+    "MASK_CACHE",
+    "build_mask",
+    "get_mask",
+]
+
+# Default budget (bytes) of the shared mask cache
+MASK_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+MASK_CACHE = DecodedCache(MASK_CACHE_MAX_BYTES)
+
+
+@dataclass(frozen=True)
+class GridMask:
+    """Weights of a polygon inside the ``rows`` x ``cols`` window of the grid (0 outside)."""
+
+    rows: slice
+    cols: slice
+    weights: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.weights.nbytes)
+
+    @property
+    def cells(self) -> int:
+        return int(np.count_nonzero(self.weights))
+
+    @property
+    def empty(self) -> bool:
+        return self.cells == 0
+
+    def flat(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(flat indices into the window, weights) of the cells the polygon touches."""
+
+        weights = self.weights.ravel()
+        cells = np.flatnonzero(weights)
+        return cells, weights[cells]
+
+
+def _widen(window: slice, n: int) -> slice:
+    # One extra cell per side keeps >= 2 cells per axis, which supersampling needs for the spacing
+    if window.start == window.stop:
+        return window
+    return slice(max(window.start - 1, 0), min(window.stop + 1, n))
+
+
+def _match_lon_convention(polygons: Polygons, lons: np.ndarray) -> Polygons:
+    """Map polygon longitudes > 180 to -180..180 on a -180..180 grid (rasterize handles 0..360 grids)."""
+
+    if lons.size == 0 or float(lons.max()) > 180.0:
+        return polygons
+    return [
+        [np.column_stack((np.where(r[:, 0] > 180.0, r[:, 0] - 360.0, r[:, 0]), r[:, 1])) for r in rings]
+        for rings in polygons
+    ]
+
+
+def build_mask(polygons: Polygons, lats: np.ndarray, lons: np.ndarray, supersample: int = 1) -> GridMask:
+    """Read-only ``GridMask`` of ``polygons`` on the (lats, lons) grid."""
+
+    polygons = _match_lon_convention(polygons, lons)
+    lon_min, lat_min, lon_max, lat_max = polygon_bounds(polygons)
+    if lons.size and float(lons.max()) > 180.0:
+        lon_min, lon_max = lon_min % 360.0, lon_max % 360.0
+        if lon_min > lon_max:
+            # Crosses the 0 meridian on a 0..360 grid: full longitude window
+            lon_min, lon_max = float(lons.min()), float(lons.max())
+    rows = axis_window(lats, lat_min, lat_max)
+    cols = axis_window(lons, lon_min, lon_max)
+    if supersample > 1:
+        rows, cols = _widen(rows, lats.size), _widen(cols, lons.size)
+    win_lats, win_lons = lats[rows], lons[cols]
+
+    coverage = np.zeros((win_lats.size, win_lons.size))
+    if coverage.size:
+        for part in polygons:
+            part_cov = rasterize([part], win_lats, win_lons, supersample=supersample)
+            if not part_cov.any():
+                # On the full grid: the window may have a single cell per axis
+                iy, ix = nearest_cell(lats, lons, *representative_point(part))
+                iy, ix = iy - rows.start, ix - cols.start
+                if 0 <= iy < win_lats.size and 0 <= ix < win_lons.size:
+                    part_cov[iy, ix] = 1.0
+            np.maximum(coverage, part_cov, out=coverage)
+
+    weights = coverage * cell_area_weights(win_lats)[:, None]
+    weights.setflags(write=False)
+    return GridMask(rows=rows, cols=cols, weights=weights)
+
+
+def get_mask(polygons: Polygons, lats: np.ndarray, lons: np.ndarray, supersample: int = 1) -> GridMask:
+    """``build_mask`` through ``MASK_CACHE`` (one build per geometry, grid and supersample)."""
+
+    key = (geometry_hash(polygons), grid_signature(lats, lons), supersample)
+    return MASK_CACHE.get_or_load(key, lambda: build_mask(polygons, lats, lons, supersample))
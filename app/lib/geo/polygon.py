@@ -0,0 +1,182 @@
+"""Polygon rasterization onto regular lat/lon grids.
+
+GeoJSON ``Polygon``/``MultiPolygon`` geometries are rasterized with a vectorized
+scanline even-odd rule: for every grid row, the crossings of all ring edges are
+computed at once and a cumulative count along the row gives the parity of each
+cell centre. Holes are handled by the even-odd rule; the parts of a multipolygon
+are combined with a union.
+
+``rasterize`` can supersample each cell (``n x n`` sub-centres) to obtain the
+fraction of the cell covered by the polygon instead of a 0/1 centre test.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Any, List, Sequence, Tuple
+
+import numpy as np
+
+from .grid import axis_spacing, nearest_index
+
+__all__ = [
+    "Polygons",
+    "parse_geometry",
+    "geometry_hash",
+    "polygon_bounds",
+    "representative_point",
+    "rasterize",
+    "nearest_cell",
+    "cell_area_weights",
+]
+
+# One entry per polygon; each polygon is a list of (n, 2) lon/lat rings, exterior first
+Polygons = List[List[np.ndarray]]
+
+
+def _ring(coords: Any) -> np.ndarray:
+    ring = np.asarray(coords, dtype="float64")
+    if ring.ndim != 2 or ring.shape[0] < 3 or ring.shape[1] < 2:
+        raise ValueError("Each polygon ring needs at least 3 [lon, lat] positions")
+    ring = ring[:, :2]
+    if not np.isfinite(ring).all():
+        raise ValueError("Polygon coordinates must be finite numbers")
+    return ring
+
+
+def parse_geometry(geojson: Any) -> Polygons:
+    """Parse a GeoJSON Polygon/MultiPolygon (bare, Feature or FeatureCollection).
+
+    Raises ``ValueError`` for any other geometry type or malformed coordinates.
+    """
+
+    if not isinstance(geojson, dict):
+        raise ValueError("GeoJSON geometry must be an object")
+    kind = geojson.get("type")
+    if kind == "Feature":
+        return parse_geometry(geojson.get("geometry"))
+    if kind == "FeatureCollection":
+        polygons: Polygons = []
+        for feature in geojson.get("features") or []:
+            polygons.extend(parse_geometry(feature))
+        if not polygons:
+            raise ValueError("FeatureCollection without polygon features")
+        return polygons
+
+    coords = geojson.get("coordinates")
+    try:
+        if kind == "Polygon":
+            parts = [coords]
+        elif kind == "MultiPolygon":
+            parts = list(coords)
+        else:
+            raise ValueError(f"Unsupported geometry type {kind!r}; expected Polygon or MultiPolygon")
+        polygons = [[_ring(r) for r in rings] for rings in parts]
+    except TypeError:
+        raise ValueError(f"Malformed {kind} coordinates")
+    if not polygons or any(not rings for rings in polygons):
+        raise ValueError(f"Empty {kind}")
+    return polygons
+
+
+def geometry_hash(polygons: Polygons) -> str:
+    """Stable hash of the parsed coordinates (independent of GeoJSON wrapping/key order)."""
+
+    h = hashlib.sha256()
+    for rings in polygons:
+        h.update(b"P")
+        for ring in rings:
+            h.update(b"R")
+            h.update(np.ascontiguousarray(ring, dtype="<f8").tobytes())
+    return h.hexdigest()
+
+
+def polygon_bounds(polygons: Polygons) -> Tuple[float, float, float, float]:
+    """(lon_min, lat_min, lon_max, lat_max) of all exterior rings."""
+
+    pts = np.concatenate([rings[0] for rings in polygons])
+    return float(pts[:, 0].min()), float(pts[:, 1].min()), float(pts[:, 0].max()), float(pts[:, 1].max())
+
+
+def representative_point(rings: Sequence[np.ndarray]) -> Tuple[float, float]:
+    """Vertex mean of the exterior ring (closing vertex not double counted)."""
+
+    ring = rings[0]
+    if np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+    return float(ring[:, 0].mean()), float(ring[:, 1].mean())
+
+
+def _parity_mask(rings: Sequence[np.ndarray], lats: np.ndarray, sorted_lons: np.ndarray) -> np.ndarray:
+    """Even-odd inside test of every (lat, sorted_lon) centre; (ny, nx) bool."""
+
+    ny, nx = lats.size, sorted_lons.size
+    counts = np.zeros((ny, nx + 1), dtype=np.int32)
+    for ring in rings:
+        x0, y0 = ring[:, 0], ring[:, 1]
+        x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+        # Half-open rule: an edge spans a row when exactly one endpoint is at or below it
+        rows, edges = np.nonzero((y0 <= lats[:, None]) != (y1 <= lats[:, None]))
+        if rows.size == 0:
+            continue
+        t = (lats[rows] - y0[edges]) / (y1[edges] - y0[edges])
+        xc = x0[edges] + t * (x1[edges] - x0[edges])
+        # Crossing counted for every centre strictly to its right
+        np.add.at(counts, (rows, np.searchsorted(sorted_lons, xc, side="right")), 1)
+    return (np.cumsum(counts, axis=1)[:, :nx] & 1).astype(bool)
+
+
+def _centre_mask(polygons: Polygons, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    order = np.argsort(lons, kind="stable")
+    sorted_lons = lons[order]
+    inside = np.zeros((lats.size, lons.size), dtype=bool)
+    for rings in polygons:
+        inside |= _parity_mask(rings, lats, sorted_lons)
+    mask = np.empty_like(inside)
+    mask[:, order] = inside
+    return mask
+
+
+def _supersampled_axis(axis: np.ndarray, n: int) -> np.ndarray:
+    d = axis_spacing(axis)
+    offsets = (np.arange(n) + 0.5) / n - 0.5
+    return (axis[:, None] + offsets[None, :] * d).ravel()
+
+
+def rasterize(polygons: Polygons, lats: Any, lons: Any, supersample: int = 1) -> np.ndarray:
+    """Fraction of each grid cell covered by ``polygons``; float64 (ny, nx) in [0, 1].
+
+    With ``supersample=1`` this is the 0/1 cell-centre test. Polygon longitudes are
+    wrapped to 0..360 when the grid uses that convention.
+    """
+
+    lats = np.asarray(lats, dtype="float64").ravel()
+    lons = np.asarray(lons, dtype="float64").ravel()
+    if lats.size == 0 or lons.size == 0:
+        return np.zeros((lats.size, lons.size))
+
+    if float(lons.max()) > 180.0:
+        polygons = [[np.column_stack((r[:, 0] % 360.0, r[:, 1])) for r in rings] for rings in polygons]
+
+    if supersample <= 1:
+        return _centre_mask(polygons, lats, lons).astype("float64")
+
+    n = int(supersample)
+    fine = _centre_mask(polygons, _supersampled_axis(lats, n), _supersampled_axis(lons, n))
+    return fine.reshape(lats.size, n, lons.size, n).mean(axis=(1, 3))
+
+
+def nearest_cell(lats: Any, lons: Any, lon: float, lat: float) -> Tuple[int, int]:
+    """Indices (iy, ix) of the cell containing (lon, lat), -1 when outside the grid."""
+
+    lons = np.asarray(lons, dtype="float64")
+    if lons.size and float(lons.max()) > 180.0:
+        lon = lon % 360.0
+    iy = int(nearest_index(lats, [lat])[0])
+    ix = int(nearest_index(lons, [lon])[0])
+    return iy, ix
+
+
+def cell_area_weights(lats: Any) -> np.ndarray:
+    """Relative cell area of each grid row on a regular lat/lon grid (cos(latitude))."""
+
+    return np.clip(np.cos(np.deg2rad(np.asarray(lats, dtype="float64"))), 0.0, None)
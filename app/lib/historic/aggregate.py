@@ -0,0 +1,124 @@
+"""Area-weighted historic series over GeoJSON polygons.
+
+Each polygon is rasterized once per grid with ``lib.geo.build_mask`` (supersampled,
+so edge cells count by the fraction they cover) inside the window of its bbox.
+Every cell weighs ``coverage x cos(latitude)``. A part smaller than a cell takes
+the cell that contains its representative point. Masks share the byte-bounded
+``lib.geo.MASK_CACHE`` with the STI polygon stats.
+
+The series is one weighted reduction over the time axis: the (cells x time) block
+of the window is multiplied by the weight vector. Cells that are NaN in a month
+drop out of that month's mean and the remaining weights are renormalized.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ..geo import GridMask, get_mask, parse_geometry, polygon_bounds
+from .extract import is_kelvin_units
+from .loader import LAT, LON, VAR_NAME, TimeAxis, get_time_axis, load_merged_dataset
+
+# Polygons (GeoJSON geometries) per request
+MAX_POLYGONS = 200
+
+# Sub-samples per cell and axis used to estimate the covered fraction of edge cells
+SUPERSAMPLE = 4
+
+
+def weighted_mean_series(block: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Weighted mean over the cells of a (cells x time) block, ignoring NaN per time step.
+    NaN where no cell is valid.
+    """
+    valid = np.isfinite(block)
+    num = weights @ np.where(valid, block, 0.0)
+    den = weights @ valid
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den > 0, num / den, np.nan)
+
+
+class PolygonAggregation:
+    """
+    Area-weighted series for a list of GeoJSON geometries, one result per geometry.
+
+    Same interface as ``PointExtraction`` (``time_columns``, ``iter_rows``,
+    ``iter_columns``): parsing, dataset loading and the masks happen eagerly, and
+    each geometry's reduction runs when the iterator reaches it.
+    """
+
+    def __init__(
+        self,
+        geometries: List[Any],
+        units: str = "K",
+        date_start: Optional[str] = None,
+        date_end: Optional[str] = None,
+    ):
+        if not geometries:
+            raise ValueError("No polygons provided")
+        if len(geometries) > MAX_POLYGONS:
+            raise ValueError(f"Too many polygons requested. Max is {MAX_POLYGONS}")
+        self.polygons = [parse_geometry(g) for g in geometries]
+        self.units = units
+
+        ds = load_merged_dataset()
+        self.da = ds[VAR_NAME]
+        self.to_celsius = units == "C" and is_kelvin_units(self.da)
+        self.time_axis: TimeAxis = get_time_axis(ds).window(date_start, date_end)
+
+        lats = np.asarray(ds.coords[LAT].values, dtype="float64")
+        lons = np.asarray(ds.coords[LON].values, dtype="float64")
+        self.masks = [get_mask(p, lats, lons, SUPERSAMPLE) for p in self.polygons]
+
+    def time_columns(self) -> Dict[str, List]:
+        return {"dates": self.time_axis.dates, "timestamps": self.time_axis.timestamps}
+
+    def _series(self, mask: GridMask) -> List[Optional[float]]:
+        window = self.da.isel({
+            LAT: mask.rows,
+            LON: mask.cols,
+            self.time_axis.dim: self.time_axis.indexer,
+        }).transpose(LAT, LON, self.time_axis.dim)
+        ny, nx, nt = window.shape
+        block = np.asarray(window.values, dtype="float64").reshape(ny * nx, nt)
+        cells, weights = mask.flat()
+        mean = weighted_mean_series(block[cells], weights)
+        if self.to_celsius:
+            mean = mean - 273.15
+        values = mean.astype(object)
+        values[np.isnan(mean)] = None
+        return values.tolist()
+
+    def _head(self, i: int) -> Tuple[Dict[str, Any], Optional[GridMask]]:
+        mask = self.masks[i]
+        bounds = list(polygon_bounds(self.polygons[i]))
+        if mask.empty:
+            return {"polygon": i, "bbox": bounds, "error": "Polygon does not intersect the historic grid"}, None
+        return {
+            "polygon": i,
+            "bbox": bounds,
+            "cells": mask.cells,
+            "variable": VAR_NAME,
+            "units": self.units,
+        }, mask
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        dates, timestamps = self.time_axis.dates, self.time_axis.timestamps
+        for i in range(len(self.polygons)):
+            head, mask = self._head(i)
+            if mask is None:
+                yield head
+                continue
+            yield {
+                **head,
+                "series": [
+                    {"date": d, "timestamp": t, "value": v}
+                    for d, t, v in zip(dates, timestamps, self._series(mask))
+                ],
+            }
+
+    def iter_columns(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self.polygons)):
+            head, mask = self._head(i)
+            yield head if mask is None else {**head, "values": self._series(mask)}
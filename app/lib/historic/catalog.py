@@ -10,6 +10,11 @@ FILE_1991_2024 = "ERA5_T2M_monthly_1991_2024_chile.nc"
 FILE_1991_2025 = "ERA5_T2M_monthly_1991_2025_chile.nc"
 FILE_2025_UPDATE = "ERA5_T2M_monthly_2025_01_10_chile.nc"
 
+# Compiled cell-major store (see store.py / scripts/compile_historic_store.py)
+COMPILED_DIR = HISTORIC_DIR / "compiled"
+COMPILED_DATA = "t2m_cell_major.npy"
+COMPILED_HEADER = "t2m_cell_major.json"
+
 def get_ordered_sources() -> List[Path]:
     """
     Returns the list of NetCDF file paths to load, in order of 'layering'.
@@ -1,10 +1,11 @@
-from typing import List, Dict, Any, Optional, cast
+from typing import List, Dict, Any, Iterator, Optional
 import numpy as np
-import pandas as pd
 import xarray as xr
-from .loader import load_merged_dataset
+from ..geo import nearest_index
+from .loader import TimeAxis, get_time_axis, load_merged_dataset
 
-MAX_POINTS = 200
+# One vectorized gather serves every point, so thousands per request are fine
+MAX_POINTS = 5000
 
 def normalize_longitude(lon: float, ds_is_360: bool) -> float:
     """
@@ -18,11 +19,19 @@ def normalize_longitude(lon: float, ds_is_360: bool) -> float:
         # Normalize to -180..180
         return ((lon + 180) % 360) - 180
 
+def is_kelvin_units(da: xr.DataArray) -> bool:
+    """
+    True when the variable's ``units`` attribute says Kelvin.
+    """
+    u = da.attrs.get("units")
+    return bool(u) and ("K" in u or "kelvin" in u.lower())
+
+
 def extract_points(
     points: List[Dict[str, float]],
     units: str = "K",  # 'C' or 'K'
-    # date_start: Optional[str] = None,
-    # date_end: Optional[str] = None
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
     Extracts time series for a list of points.
@@ -30,154 +39,185 @@ def extract_points(
     Args:
         points: List of dicts with 'lat', 'lon'.
         units: Target units 'C' (Celsius) or 'K' (Kelvin).
-        date_start: ISO date string.
-        date_end: ISO date string.
+        date_start: ISO date string, inclusive (optional).
+        date_end: ISO date string, inclusive (optional).
+    """
+    return list(iter_extract_points(points, units, date_start, date_end))
+
+
+def iter_extract_points(
+    points: List[Dict[str, float]],
+    units: str = "K",
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Same as extract_points, but yields one result per point so callers can stream them.
+
+    Validation, dataset loading and the (points x time) gather happen eagerly (errors
+    surface before the first item); each point's JSON-ready dict is built only when
+    the iterator reaches it.
     """
     if not points:
-        return []
-    if len(points) > MAX_POINTS:
-        raise ValueError(f"Too many points requested. Max is {MAX_POINTS}")
+        return iter(())
+    return PointExtraction(points, units, date_start, date_end).iter_rows()
 
-    ds = load_merged_dataset()
-    
-    # Detect dataset longitude convention
-    ds_lons = ds.coords["longitude"].values
-    ds_is_360 = np.any(ds_lons > 180).item()
-    
-    # Determine grid resolution for tolerance
-    lat_res = np.abs(np.diff(ds.coords["latitude"].values)).mean()
-    lon_res = np.abs(np.diff(ds_lons)).mean()
-    # Tolerance: slightly more than half a pixel to allow for float errors but avoid far-away matches
-    # actually 'nearest' in xarray matches anything. We need to manually check distance.
-    # Let's say 0.6 * resolution.
-    tol_lat = 0.6 * lat_res
-    tol_lon = 0.6 * lon_res
-
-    results = []
-
-    # Time slicing (if requested)
-    # We slice the dataset ONCE if all points share the timeline, which is more efficient.
-    # But often users want full history.
-    sub_ds = ds
-    # if date_start or date_end:
-    #     sub_ds = ds.sel(time=slice(date_start, date_end))
-
-    # Unit conversion factor
-    is_kelvin = False
-    if "units" in sub_ds["t2m"].attrs:
-        u = sub_ds["t2m"].attrs["units"]
-        if "K" in u or "kelvin" in u.lower():
-            is_kelvin = True
-    
-    # Pre-load needed data into memory? 
-    # If generic, no. But for 'sel', dask is good.
-    # We iterate.
-    
-    for pt in points:
-        req_lat = pt["lat"]
-        req_lon = pt["lon"]
-        
-        # Validation
-        if not (-90 <= req_lat <= 90):
-             # Skip or error? Let's return error payload for this point
-             results.append({
-                 "lat_requested": req_lat, "lon_requested": req_lon,
-                 "error": "Invalid latitude"
-             })
-             continue
-             
-        norm_lon = normalize_longitude(req_lon, ds_is_360)
-        
-        try:
-            # Selection
-            # method='nearest' finds the closest point indiscriminately.
-            # We must check HOW close it is.
-            selection = sub_ds["t2m"].sel(
-                latitude=req_lat, 
-                longitude=norm_lon, 
-                method="nearest"
+
+def extract_points_columnar(
+    points: List[Dict[str, float]],
+    units: str = "K",
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Columnar variant: ``dates`` and ``timestamps`` once, then one ``values`` array per point
+    (no per-row dicts).
+    """
+    if not points:
+        return {"dates": [], "timestamps": [], "data": []}
+    extraction = PointExtraction(points, units, date_start, date_end)
+    return {**extraction.time_columns(), "data": list(extraction.iter_columns())}
+
+
+class PointExtraction:
+    """
+    One vectorized pass over the merged dataset for a list of points.
+
+    Every point's grid cell is looked up at once, the tolerance check is an array
+    operation and all in-grid series are pulled with a single pointwise ``isel`` into
+    a (points x time) block. The serialized time axis comes from ``get_time_axis``,
+    computed once per cached merged dataset and shared across points and requests.
+
+    ``date_start``/``date_end`` narrow that axis with a binary search before the
+    gather, so only the requested months are read and serialized.
+    """
+
+    def __init__(
+        self,
+        points: List[Dict[str, float]],
+        units: str = "K",
+        date_start: Optional[str] = None,
+        date_end: Optional[str] = None,
+    ):
+        if len(points) > MAX_POINTS:
+            raise ValueError(f"Too many points requested. Max is {MAX_POINTS}")
+        self.points = points
+        self.units = units
+
+        ds = load_merged_dataset()
+
+        # Detect dataset longitude convention
+        ds_lats = ds.coords["latitude"].values
+        ds_lons = ds.coords["longitude"].values
+        ds_is_360 = np.any(ds_lons > 180).item()
+
+        # Determine grid resolution for tolerance
+        lat_res = np.abs(np.diff(ds_lats)).mean()
+        lon_res = np.abs(np.diff(ds_lons)).mean()
+        # Tolerance: slightly more than half a pixel to allow for float errors but avoid far-away matches.
+        tol_lat = 0.6 * lat_res
+        tol_lon = 0.6 * lon_res
+
+        # Time window (if requested): searchsorted on the shared axis, before any gather
+        self.time_axis: TimeAxis = get_time_axis(ds).window(date_start, date_end)
+
+        # Unit conversion factor
+        is_kelvin = is_kelvin_units(ds["t2m"])
+
+        # --- Vectorized cell lookup for every point at once ---
+        req_lats = np.array([float(pt["lat"]) for pt in points])
+        req_lons = np.array([float(pt["lon"]) for pt in points])
+        self.valid_lat = (req_lats >= -90) & (req_lats <= 90)
+        norm_lons = (req_lons % 360.0) if ds_is_360 else (((req_lons + 180) % 360) - 180)
+
+        # Nearest cell without tolerance (like .sel(method="nearest")); the distance check follows
+        iy = nearest_index(ds_lats, np.where(self.valid_lat, req_lats, ds_lats[0]), tolerance=np.inf)
+        ix = nearest_index(ds_lons, norm_lons, tolerance=np.inf)
+        self.found_lats = ds_lats[iy].astype("float64")
+        self.found_lons = ds_lons[ix].astype("float64")
+
+        diff_lat = np.abs(self.found_lats - req_lats)
+        diff_lon = np.abs(self.found_lons - norm_lons)
+        # Handle the 0/360 wrap-around
+        diff_lon = np.where(diff_lon > 180, 360 - diff_lon, diff_lon)
+        self.in_grid = self.valid_lat & (diff_lat <= tol_lat) & (diff_lon <= tol_lon)
+
+        # --- One pointwise gather of every series: (points, time) block ---
+        da = ds["t2m"].isel({self.time_axis.dim: self.time_axis.indexer})
+        sel = np.nonzero(self.in_grid)[0]
+        block = np.empty((0, len(self.time_axis.positions)))
+        if sel.size:
+            block = np.asarray(
+                da.isel(
+                    latitude=xr.DataArray(iy[sel], dims="point"),
+                    longitude=xr.DataArray(ix[sel], dims="point"),
+                ).transpose("point", self.time_axis.dim).values,
+                dtype="float64",
             )
-            
-            # Verify tolerance
-            found_lat = float(selection.latitude.values)
-            found_lon = float(selection.longitude.values)
-            
-            # Check diffs (handle circular longitude diff if needed)
-            diff_lat = abs(found_lat - req_lat)
-            
-            # Simple absolute diff for lon (ignoring wrap around edge case for MVP unless strictly needed)
-            # To handle wrap around diff properly for 0/360 boundary:
-            diff_lon = abs(found_lon - norm_lon)
-            if diff_lon > 180:
-                diff_lon = 360 - diff_lon
-                
-            if diff_lat > tol_lat or diff_lon > tol_lon:
-                results.append({
-                    "lat_requested": req_lat, "lon_requested": req_lon,
-                    "error": "Point out of bounds (no grid cell near enough)",
-                    "nearest_grid": {"lat": found_lat, "lon": found_lon}
-                })
+            if is_kelvin and units == "C":
+                block = block - 273.15
+
+        # NaN -> None for the whole block at once (standard json does not accept NaN)
+        values = block.astype(object)
+        values[np.isnan(block)] = None
+        self.values = values
+        self.block_row = np.cumsum(self.in_grid) - 1
+
+    def time_columns(self) -> Dict[str, List]:
+        return {"dates": self.time_axis.dates, "timestamps": self.time_axis.timestamps}
+
+    def _error(self, i: int) -> Optional[Dict[str, Any]]:
+        pt = self.points[i]
+        if not self.valid_lat[i]:
+            return {
+                "lat_requested": pt["lat"], "lon_requested": pt["lon"],
+                "error": "Invalid latitude"
+            }
+        if not self.in_grid[i]:
+            return {
+                "lat_requested": pt["lat"], "lon_requested": pt["lon"],
+                "error": "Point out of bounds (no grid cell near enough)",
+                "nearest_grid": {"lat": float(self.found_lats[i]), "lon": float(self.found_lons[i])}
+            }
+        return None
+
+    def _head(self, i: int) -> Dict[str, Any]:
+        pt = self.points[i]
+        return {
+            "lat_requested": pt["lat"],
+            "lon_requested": pt["lon"],
+            "lat_used": float(self.found_lats[i]),
+            "lon_used": float(self.found_lons[i]),
+            "variable": "t2m",
+            "units": self.units,
+        }
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        """
+        Classic layout: ``series`` as a list of {date, timestamp, value} per point.
+        """
+        dates, timestamps = self.time_axis.dates, self.time_axis.timestamps
+        for i in range(len(self.points)):
+            error = self._error(i)
+            if error is not None:
+                yield error
                 continue
+            values = self.values[self.block_row[i]].tolist()
+            yield {
+                **self._head(i),
+                "series": [
+                    {"date": d, "timestamp": t, "value": v}
+                    for d, t, v in zip(dates, timestamps, values)
+                ],
+            }
 
-            # Extract Series
-            # Convert to Pandas Series for easy JSON serialization
-            series = selection.to_pandas()
-            
-            # Unit Conversion
-            final_units = units
-            if is_kelvin and units == "C":
-                series = series - 273.15
-            elif not is_kelvin and units == "C":
-                # Already C?
-                pass
-            elif is_kelvin and units == "K":
-                pass
-            
-            # Replacement of NaN
-            # series.where(series.notnull(), None) # method for series
-            # Or use json dump default=str for Nan? standard lib doesn't like NaN.
-            # We replace NaN with None
-            series_clean = series.where(pd.notnull(series), other=None)
-            
-            # Format output
-            # timestamps to string YYYY-MM-DD
-            # values to float
-            
-            ts_list = []
-            for date, val in series_clean.items():
-                ts_date = pd.to_datetime(cast(str, date), errors="coerce")
-                if not isinstance(ts_date, pd.Timestamp):
-                    continue
-                timestamp = int(ts_date.timestamp() * 1000)
-                val_out = val
-                if val is not None:
-                    val_out = float(val)
-                
-                ts_list.append({
-                    "date": ts_date.strftime("%Y-%m-%d"),
-                    "timestamp": timestamp,
-                    "value": val_out
-                })
-            
-            results.append({
-                "lat_requested": req_lat,
-                "lon_requested": req_lon,
-                "lat_used": found_lat,
-                "lon_used": found_lon,
-                "variable": "t2m",
-                "units": final_units,
-                "series": ts_list
-            })
-            
-        except KeyError:
-            results.append({
-                 "lat_requested": req_lat, "lon_requested": req_lon,
-                 "error": "Data extraction failed generic"
-            })
-        except Exception as e:
-            results.append({
-                 "lat_requested": req_lat, "lon_requested": req_lon,
-                 "error": str(e)
-            })
-
-    return results
+    def iter_columns(self) -> Iterator[Dict[str, Any]]:
+        """
+        Columnar layout: ``values`` aligned with the shared ``dates``/``timestamps``.
+        """
+        for i in range(len(self.points)):
+            error = self._error(i)
+            if error is not None:
+                yield error
+                continue
+            yield {**self._head(i), "values": self.values[self.block_row[i]].tolist()}
@@ -4,14 +4,15 @@ import xarray as xr
 import numpy as np
 import pandas as pd
 import logging
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from .catalog import get_ordered_sources
 
 logger = logging.getLogger(__name__)
 
-# Cache: keep 2 merged datasets (by files signature)
+# Cache: keep 2 merged datasets (by files signature), each with its time axis
 CACHE = cachetools.LRUCache(maxsize=2)
 CACHE_LOCK = threading.RLock()
 
@@ -42,6 +43,138 @@ def _cache_key(paths: List[Path]) -> Tuple[Tuple[str, int, int], ...]:
     return tuple(sig)
 
 
+def dataset_signature() -> Tuple[Tuple[str, int, int], ...]:
+    """
+    (name, mtime_ns, size) of the current historic sources, without opening them.
+    Changes whenever a file is added, replaced or removed, so it doubles as an HTTP validator.
+    """
+    sources = get_ordered_sources()
+    if not sources:
+        raise FileNotFoundError("No historic NetCDF files found in 'historic/' directory.")
+    return _cache_key(sources)
+
+
+@dataclass(frozen=True)
+class TimeAxis:
+    """
+    Serialized time coordinate of a merged dataset, shared by every point and request.
+
+    ``positions`` are the indices along the time dim of the non-NaT entries; ``dates``
+    (YYYY-MM-DD) and ``timestamps`` (epoch ms) are aligned with them. ``times`` is
+    sorted (the merged dataset is sorted by valid_time), so windows are binary searches.
+    """
+    dim: str
+    positions: np.ndarray
+    times: np.ndarray
+    dates: List[str]
+    timestamps: List[int]
+
+    @property
+    def indexer(self):
+        """
+        ``positions`` as a slice when contiguous (cheaper on dask-backed data), else the array.
+        """
+        p = self.positions
+        if p.size and int(p[-1]) - int(p[0]) + 1 == p.size:
+            return slice(int(p[0]), int(p[-1]) + 1)
+        return p
+
+    def window(self, start: Optional[str] = None, end: Optional[str] = None) -> "TimeAxis":
+        """
+        Sub-axis with ``start <= time <= end`` (both optional, inclusive).
+
+        Bounds are located with ``np.searchsorted`` on ``times``; only the
+        window's dates/timestamps are copied. Raises ``ValueError`` for
+        unparseable bounds or ``start > end``.
+        """
+        if start is None and end is None:
+            return self
+        lo_t = _parse_bound(start, "start")
+        hi_t = _parse_bound(end, "end")
+        if lo_t is not None and hi_t is not None and lo_t > hi_t:
+            raise ValueError(f"'start' ({start}) is after 'end' ({end})")
+        lo = 0 if lo_t is None else int(np.searchsorted(self.times, lo_t, side="left"))
+        hi = len(self.times) if hi_t is None else int(np.searchsorted(self.times, hi_t, side="right"))
+        hi = max(lo, hi)
+        return TimeAxis(
+            dim=self.dim,
+            positions=self.positions[lo:hi],
+            times=self.times[lo:hi],
+            dates=self.dates[lo:hi],
+            timestamps=self.timestamps[lo:hi],
+        )
+
+
+def _parse_bound(value: Optional[str], name: str) -> Optional[np.datetime64]:
+    if value is None or value == "":
+        return None
+    try:
+        ts = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid '{name}' date: {value!r} (expected ISO format, e.g. 2010-01-01)")
+    if ts is pd.NaT:
+        raise ValueError(f"Invalid '{name}' date: {value!r}")
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return np.datetime64(ts.to_datetime64(), "ns")
+
+
+def time_dim(da: xr.DataArray) -> str:
+    """
+    Name of the time dimension of ``da`` (the one that is neither latitude nor longitude).
+    """
+    return next(d for d in da.dims if d not in (LAT, LON))
+
+
+def build_time_axis(ds: xr.Dataset) -> TimeAxis:
+    dim = time_dim(ds[VAR_NAME])
+    times = pd.DatetimeIndex(pd.to_datetime(ds[dim].values, errors="coerce"))
+    positions = np.nonzero(~np.asarray(times.isna()))[0]
+    kept = times[positions]
+    return TimeAxis(
+        dim=dim,
+        positions=positions,
+        times=kept.values.astype("datetime64[ns]"),
+        dates=kept.strftime("%Y-%m-%d").tolist(),
+        timestamps=kept.values.astype("datetime64[ms]").astype("int64").tolist(),
+    )
+
+
+@dataclass
+class MergedDataset:
+    """
+    A ``CACHE`` entry: the merged dataset and its time axis, built on first use.
+    The axis lives and is evicted with its dataset.
+    """
+    ds: xr.Dataset
+    time_axis: Optional[TimeAxis] = None
+
+
+def _cache_entry(ds: xr.Dataset) -> Optional[MergedDataset]:
+    for key in list(CACHE):
+        # Cache.__getitem__ reads without refreshing the LRU order
+        entry = cachetools.Cache.__getitem__(CACHE, key)
+        if entry.ds is ds:
+            return entry
+    return None
+
+
+def get_time_axis(ds: xr.Dataset) -> TimeAxis:
+    """
+    Time axis of ``ds``, built once per cached merged dataset.
+    A dataset that is not (or no longer) in ``CACHE`` gets a fresh axis.
+    """
+    with CACHE_LOCK:
+        entry = _cache_entry(ds)
+        if entry is not None and entry.time_axis is not None:
+            return entry.time_axis
+    axis = build_time_axis(ds)
+    if entry is not None:
+        with CACHE_LOCK:
+            entry.time_axis = axis
+    return axis
+
+
 def _open_dataset_safe(path: Path) -> xr.Dataset:
     """
     Opens a single dataset safely under a global lock.
@@ -182,12 +315,88 @@ def _dedupe_dim_keep_last(ds: xr.Dataset, dim: str) -> xr.Dataset:
     return ds.isel({dim: mask})
 
 
+def merge_sources(sources: List[Path]) -> xr.Dataset:
+    """
+    Opens, canonicalizes, concatenates and de-duplicates the NetCDF sources.
+    Small results are eager-loaded and their files closed.
+    """
+    datasets: List[xr.Dataset] = []
+    try:
+        # Open + canonicalize each dataset
+        for p in sources:
+            ds = _open_dataset_safe(p)
+            ds = _ensure_latlon_names(ds)
+            ds = _strip_extras(ds)
+            ds = _collapse_time_layer_if_present(ds)
+            ds = _normalize_lon_180(ds)
+            logger.warning(f"[GRID] {p.name}: lon_min={float(ds[LON].min()):.3f} lon_max={float(ds[LON].max()):.3f}")
+
+            datasets.append(ds)
+
+        if len(datasets) == 1:
+            final_ds = datasets[0]
+        else:
+            # Concat by valid_time (official axis)
+            final_ds = xr.concat(
+                datasets,
+                dim=TIME_DIM,
+                data_vars="minimal",
+                coords="minimal",
+                join="exact",          # fail early if lat/lon grid differs
+                compat="override",
+                combine_attrs="override",
+            )
+
+            final_ds = final_ds.sortby(TIME_DIM)
+            final_ds = _dedupe_dim_keep_last(final_ds, TIME_DIM)
+
+        # Basic validation
+        if VAR_NAME not in final_ds.data_vars:
+            raise ValueError(f"After merge, '{VAR_NAME}' missing. Vars={list(final_ds.data_vars)}")
+
+        # Optional: eager load if small-ish, then close originals to avoid file handles + HDF5 read races later
+        try:
+            est_bytes = final_ds[VAR_NAME].size * final_ds[VAR_NAME].dtype.itemsize
+        except Exception:
+            est_bytes = None
+
+        if est_bytes is not None and est_bytes <= EAGER_LOAD_BYTES_THRESHOLD:
+            logger.info(f"Eager-loading merged dataset into RAM (~{est_bytes/1024/1024:.1f} MB)")
+            with HDF5_GLOBAL_LOCK:
+                final_ds = final_ds.load()
+
+            # Now safe to close intermediate datasets (they no longer back final_ds)
+            for ds in datasets:
+                try:
+                    ds.close()
+                except Exception:
+                    pass
+
+        return final_ds
+
+    except Exception:
+        # On failure, close what we opened
+        for ds in datasets:
+            try:
+                ds.close()
+            except Exception:
+                pass
+        raise
+
+
 def load_merged_dataset() -> xr.Dataset:
     """
     Returns the merged historic dataset, cached.
     Uses valid_time as official time axis.
     Thread-safe.
+
+    If a compiled store matching the current sources exists (see store.py), it is
+    memory-mapped instead of merging the NetCDFs: dims are then
+    (latitude, longitude, valid_time).
     """
+    # Local import: store.py imports this module's constants
+    from .store import open_store
+
     sources = get_ordered_sources()
     if not sources:
         raise FileNotFoundError("No historic NetCDF files found in 'historic/' directory.")
@@ -196,69 +405,12 @@ def load_merged_dataset() -> xr.Dataset:
 
     with CACHE_LOCK:
         if cache_key in CACHE:
-            return CACHE[cache_key]
-
-        datasets: List[xr.Dataset] = []
-        try:
-            # Open + canonicalize each dataset
-            for p in sources:
-                ds = _open_dataset_safe(p)
-                ds = _ensure_latlon_names(ds)
-                ds = _strip_extras(ds)
-                ds = _collapse_time_layer_if_present(ds)
-                ds = _normalize_lon_180(ds)
-                logger.warning(f"[GRID] {p.name}: lon_min={float(ds[LON].min()):.3f} lon_max={float(ds[LON].max()):.3f}")
-
-                datasets.append(ds)
-
-            if len(datasets) == 1:
-                final_ds = datasets[0]
-            else:
-                # Concat by valid_time (official axis)
-                final_ds = xr.concat(
-                    datasets,
-                    dim=TIME_DIM,
-                    data_vars="minimal",
-                    coords="minimal",
-                    join="exact",          # fail early if lat/lon grid differs
-                    compat="override",
-                    combine_attrs="override",
-                )
-
-                final_ds = final_ds.sortby(TIME_DIM)
-                final_ds = _dedupe_dim_keep_last(final_ds, TIME_DIM)
-
-            # Basic validation
-            if VAR_NAME not in final_ds.data_vars:
-                raise ValueError(f"After merge, '{VAR_NAME}' missing. Vars={list(final_ds.data_vars)}")
-
-            # Optional: eager load if small-ish, then close originals to avoid file handles + HDF5 read races later
-            try:
-                est_bytes = final_ds[VAR_NAME].size * final_ds[VAR_NAME].dtype.itemsize
-            except Exception:
-                est_bytes = None
+            return CACHE[cache_key].ds
 
-            if est_bytes is not None and est_bytes <= EAGER_LOAD_BYTES_THRESHOLD:
-                logger.info(f"Eager-loading merged dataset into RAM (~{est_bytes/1024/1024:.1f} MB)")
-                with HDF5_GLOBAL_LOCK:
-                    final_ds = final_ds.load()
+        final_ds = open_store(cache_key)
+        if final_ds is None:
+            final_ds = merge_sources(sources)
 
-                # Now safe to close intermediate datasets (they no longer back final_ds)
-                for ds in datasets:
-                    try:
-                        ds.close()
-                    except Exception:
-                        pass
-
-            # Store in cache
-            CACHE[cache_key] = final_ds
-            return final_ds
-
-        except Exception:
-            # On failure, close what we opened
-            for ds in datasets:
-                try:
-                    ds.close()
-                except Exception:
-                    pass
-            raise
+        # Store in cache
+        CACHE[cache_key] = MergedDataset(final_ds)
+        return final_ds
@@ -0,0 +1,139 @@
+"""Compiled, cell-major store of the merged historic ``t2m`` cube.
+
+``compile_store`` writes the merged dataset once as a float32 ``.npy`` laid out
+(latitude, longitude, time), plus a small JSON header with the axes, units and
+the signature of the NetCDF sources it was built from. ``open_store`` maps it
+read-only (``np.load(mmap_mode="r")``):
+
+- a point's series is one contiguous run of ``n_times`` floats;
+- a cold start is an ``mmap`` call instead of open + canonicalize + concat;
+- pages live in the OS page cache and are shared across uvicorn workers.
+
+The header is written last and only after the data file is in place, so a
+reader either sees a complete store or none. A store whose signature does not
+match the current sources is ignored (stale).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import xarray as xr
+
+from .catalog import COMPILED_DATA, COMPILED_DIR, COMPILED_HEADER
+from .loader import LAT, LON, TIME_DIM, VAR_NAME
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+
+# Latitude rows written per block while compiling (bounds the memory of a dask-backed source)
+COMPILE_ROWS = 16
+
+
+def _signature_json(signature: Sequence[Tuple[str, int, int]]) -> list:
+    return [[str(name), int(mtime), int(size)] for name, mtime, size in signature]
+
+
+def compile_store(
+    ds: xr.Dataset,
+    signature: Sequence[Tuple[str, int, int]],
+    out_dir: Optional[Path] = None,
+) -> Path:
+    """Write ``ds[t2m]`` as a (lat, lon, time) float32 .npy + JSON header; returns the header path."""
+
+    out_dir = Path(out_dir or COMPILED_DIR)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    da = ds[VAR_NAME].transpose(LAT, LON, TIME_DIM)
+    n_lat, n_lon, n_time = (da.sizes[LAT], da.sizes[LON], da.sizes[TIME_DIM])
+
+    data_path = out_dir / COMPILED_DATA
+    header_path = out_dir / COMPILED_HEADER
+    tmp_data = data_path.with_name(data_path.name + ".tmp")
+    tmp_header = header_path.with_name(header_path.name + ".tmp")
+
+    out = np.lib.format.open_memmap(tmp_data, mode="w+", dtype="<f4", shape=(n_lat, n_lon, n_time))
+    for start in range(0, n_lat, COMPILE_ROWS):
+        rows = slice(start, min(start + COMPILE_ROWS, n_lat))
+        out[rows] = np.asarray(da.isel({LAT: rows}).values, dtype="float32")
+    out.flush()
+    del out
+
+    header: Dict[str, Any] = {
+        "version": STORE_VERSION,
+        "variable": VAR_NAME,
+        "dims": [LAT, LON, TIME_DIM],
+        "shape": [n_lat, n_lon, n_time],
+        "dtype": "float32",
+        "attrs": {k: v for k, v in da.attrs.items() if isinstance(v, (str, int, float))},
+        LAT: np.asarray(ds[LAT].values, dtype="float64").tolist(),
+        LON: np.asarray(ds[LON].values, dtype="float64").tolist(),
+        TIME_DIM: np.datetime_as_string(np.asarray(ds[TIME_DIM].values, dtype="datetime64[ns]"), unit="s").tolist(),
+        "sources": _signature_json(signature),
+        "data_file": COMPILED_DATA,
+    }
+    tmp_header.write_text(json.dumps(header))
+
+    # Data first, header last: the header is what makes the store visible
+    os.replace(tmp_data, data_path)
+    os.replace(tmp_header, header_path)
+    logger.info(f"Compiled historic store {data_path} shape={n_lat}x{n_lon}x{n_time}")
+    return header_path
+
+
+def read_header(store_dir: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    path = Path(store_dir or COMPILED_DIR) / COMPILED_HEADER
+    try:
+        header = json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Unreadable historic store header {path}: {e!r}")
+        return None
+    if header.get("version") != STORE_VERSION:
+        logger.warning(f"Historic store {path} has version {header.get('version')!r}, expected {STORE_VERSION}")
+        return None
+    return header
+
+
+def open_store(
+    signature: Sequence[Tuple[str, int, int]],
+    store_dir: Optional[Path] = None,
+) -> Optional[xr.Dataset]:
+    """Memory-mapped Dataset for the compiled store, or None if missing or stale.
+
+    The variable keeps the store's (latitude, longitude, valid_time) dim order;
+    callers index by dim name, so pointwise selections read contiguous series.
+    """
+
+    store_dir = Path(store_dir or COMPILED_DIR)
+    header = read_header(store_dir)
+    if header is None:
+        return None
+    if header.get("sources") != _signature_json(signature):
+        logger.warning("Historic store is stale (sources changed since it was compiled); ignoring it")
+        return None
+
+    try:
+        data = np.load(store_dir / header["data_file"], mmap_mode="r")
+    except (OSError, ValueError) as e:
+        logger.warning(f"Cannot map historic store in {store_dir}: {e!r}")
+        return None
+    if list(data.shape) != header["shape"]:
+        logger.warning(f"Historic store shape {data.shape} does not match its header {header['shape']}")
+        return None
+
+    times = np.array(header[TIME_DIM], dtype="datetime64[ns]")
+    logger.info(f"Mapped historic store {store_dir / header['data_file']} shape={data.shape}")
+    return xr.Dataset(
+        {VAR_NAME: (tuple(header["dims"]), data, header.get("attrs", {}))},
+        coords={
+            LAT: np.asarray(header[LAT], dtype="float64"),
+            LON: np.asarray(header[LON], dtype="float64"),
+            TIME_DIM: times,
+        },
+    )
@@ -0,0 +1,22 @@
+import numpy as np
+
+from app.lib.geo import is_regular, nearest_index
+
+
+def test_nearest_index_regular_descending_axis():
+    lat = np.array([-17.0, -17.25, -17.5, -17.75])
+    idx = nearest_index(lat, [-17.1, -17.74, -16.0, -17.3])
+    assert idx.tolist() == [0, 3, -1, 1]
+
+
+def test_nearest_index_irregular_axis_uses_binary_search():
+    axis = np.array([0.0, 1.0, 3.0, 7.0])
+    assert not is_regular(axis)
+    idx = nearest_index(axis, [0.2, 2.1, 6.0], tolerance=1.0)
+    assert idx.tolist() == [0, 2, 3]
+
+
+def test_nearest_index_explicit_tolerance():
+    axis = np.arange(0.0, 10.0, 0.25)
+    assert nearest_index(axis, [5.05], tolerance=0.01).tolist() == [-1]
+    assert nearest_index(axis, [5.05], tolerance=0.1).tolist() == [20]
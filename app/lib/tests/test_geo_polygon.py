@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from app.lib.geo import build_mask, geometry_hash, parse_geometry, rasterize
+
+LATS = np.arange(-30.0, -40.25, -0.25)
+LONS = np.arange(-75.0, -64.75, 0.25)
+
+
+def _square(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+
+
+def _brute_force(rings, lats, lons):
+    """Per-cell ray casting reference."""
+    out = np.zeros((lats.size, lons.size), dtype=bool)
+    for i, y in enumerate(lats):
+        for j, x in enumerate(lons):
+            inside = False
+            for ring in rings:
+                for (xa, ya), (xb, yb) in zip(ring, ring[1:] + ring[:1]):
+                    if (ya <= y) != (yb <= y) and x < xa + (y - ya) / (yb - ya) * (xb - xa):
+                        inside = not inside
+            out[i, j] = inside
+    return out
+
+
+def test_rasterize_matches_ray_casting_with_hole():
+    outer = [[-73.1, -31.3], [-66.2, -32.9], [-67.4, -38.8], [-71.9, -39.4], [-74.31, -35.05]]
+    hole = [[-71.05, -34.05], [-69.05, -34.05], [-69.05, -36.05], [-71.05, -36.05]]
+    polygons = parse_geometry({"type": "Polygon", "coordinates": [outer, hole]})
+    mask = rasterize(polygons, LATS, LONS)
+    np.testing.assert_array_equal(mask.astype(bool), _brute_force([outer, hole], LATS, LONS))
+    assert not mask[LATS.tolist().index(-35.0), LONS.tolist().index(-70.0)]
+
+
+def test_rasterize_descending_lon_axis_and_0_360_grid():
+    polygons = parse_geometry({"type": "Polygon", "coordinates": [_square(-72.1, -35.1, -70.9, -33.9)]})
+    expected = rasterize(polygons, LATS, LONS)
+    np.testing.assert_array_equal(rasterize(polygons, LATS, LONS[::-1])[:, ::-1], expected)
+    np.testing.assert_array_equal(rasterize(polygons, LATS, LONS + 360.0), expected)
+    assert expected.sum() == 5 * 5
+
+
+def test_supersampled_coverage_is_fractional():
+    # Cuadrado alineado a los bordes de celda que cubre media celda en cada lado
+    polygons = parse_geometry({"type": "Polygon", "coordinates": [_square(-72.125, -35.125, -71.5, -34.5)]})
+    cov = rasterize(polygons, LATS, LONS, supersample=4)
+    assert cov.max() == 1.0
+    np.testing.assert_allclose(cov.sum(), (0.625 / 0.25) ** 2)
+
+
+def test_multipolygon_union_and_hash_ignores_wrapping():
+    a = _square(-74.0, -31.0, -73.0, -30.5)
+    b = _square(-67.0, -39.0, -66.0, -38.0)
+    geom = {"type": "MultiPolygon", "coordinates": [[a], [b]]}
+    feature = {"type": "Feature", "properties": {"name": "x"}, "geometry": geom}
+    polygons = parse_geometry(feature)
+    mask = rasterize(polygons, LATS, LONS)
+    assert mask.sum() == rasterize(parse_geometry({"type": "Polygon", "coordinates": [a]}), LATS, LONS).sum() \
+        + rasterize(parse_geometry({"type": "Polygon", "coordinates": [b]}), LATS, LONS).sum()
+    assert geometry_hash(polygons) == geometry_hash(parse_geometry(geom))
+
+
+def test_build_mask_window_weights_and_small_parts():
+    polygons = parse_geometry({"type": "Polygon", "coordinates": [_square(-72.1, -35.1, -70.9, -33.9)]})
+    mask = build_mask(polygons, LATS, LONS)
+    np.testing.assert_array_equal(mask.weights > 0, rasterize(polygons, LATS, LONS)[mask.rows, mask.cols] > 0)
+    assert mask.cells == 25
+    cells, weights = mask.flat()
+    assert cells.size == 25
+    np.testing.assert_allclose(weights.sum(), 5 * np.cos(np.deg2rad(LATS[mask.rows])).sum())
+
+    # Con supersample la ventana se ensancha una celda por lado (hace falta el paso de grilla)
+    wide = parse_geometry({"type": "Polygon", "coordinates": [_square(-72.2, -35.2, -70.8, -33.8)]})
+    coarse, fine = build_mask(wide, LATS, LONS), build_mask(wide, LATS, LONS, supersample=4)
+    assert (fine.rows.start, fine.rows.stop) == (coarse.rows.start - 1, coarse.rows.stop + 1)
+    assert fine.cells == 7 * 7  # los bordes cubren 1/4 de la celda vecina
+    assert fine.weights[0].max() < fine.weights[1].max()
+
+    # Parte sin ningún centro: toma la celda de su punto representativo
+    tiny = parse_geometry({"type": "Polygon", "coordinates": [_square(-70.62, -35.62, -70.58, -35.58)]})
+    assert build_mask(tiny, LATS, LONS).cells == 1
+    outside = parse_geometry({"type": "Polygon", "coordinates": [_square(10.0, 10.0, 11.0, 11.0)]})
+    assert build_mask(outside, LATS, LONS).empty
+
+
+@pytest.mark.parametrize("geom", [
+    {"type": "Point", "coordinates": [0, 0]},
+    {"type": "Polygon", "coordinates": [[[0, 0], [1, 1]]]},
+    {"type": "Polygon", "coordinates": 3},
+    [1, 2],
+])
+def test_parse_geometry_rejects_invalid(geom):
+    with pytest.raises(ValueError):
+        parse_geometry(geom)
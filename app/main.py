@@ -2,18 +2,37 @@
 from __future__ import annotations
 import sys
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # Use relative imports from app package
 from .routers import forecast, historic, sti
+from .routers.compression import CompressionMiddleware
 from .config import settings
+from .services import decode_pool, sti_service
+from .services.sti_warmer import WARMER
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Descargas/locks huérfanos de procesos anteriores y presupuesto del cache en disco
+    sti_service.DISK_CACHE.cleanup_orphans()
+    sti_service.DISK_CACHE.evict()
+    # Pre-descarga de runs nuevos en background (opt-in)
+    if settings.STI_WARMER_ENABLED:
+        WARMER.start()
+    yield
+    WARMER.stop()
+    decode_pool.shutdown()
+
 
 app = FastAPI(
     title="Pangu MVP STI API",
     description="API para servir índices STI desde NetCDF en S3",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS Configuration
@@ -27,6 +46,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, min_bytes=settings.COMPRESSION_MIN_BYTES)
+
 app.include_router(forecast.router)
 app.include_router(historic.router, prefix="/historic", tags=["Historic"])
 app.include_router(sti.router)
@@ -0,0 +1,345 @@
+"""
+Compresión de respuestas negociada por ``Accept-Encoding`` (zstd, br, gzip).
+
+Middleware ASGI puro:
+
+- Sólo comprime media types de texto/arrays (JSON, NDJSON, f32, npy, Arrow);
+  PNG/WebP ya vienen comprimidos.
+- Respuestas con cuerpo completo: se comprimen si superan COMPRESSION_MIN_BYTES.
+  Las inmutables (``Cache-Control: immutable`` + ETag, i.e. run/step) guardan
+  los bytes comprimidos por (ETag, encoding) en un LRU: cada variante se
+  comprime una sola vez.
+- Respuestas en streaming: se comprimen con un compresor incremental (memoria
+  acotada) que hace flush cada COMPRESSION_STREAM_FLUSH_BYTES de entrada, no en
+  cada chunk: flushes chicos empeoran la tasa de compresión.
+  Si son inmutables, la salida comprimida se guarda al terminar; la próxima vez
+  se envía desde el cache y se corta la respuesta de la app, que no sigue
+  generando el cuerpo.
+
+``brotli`` y ``zstandard`` son opcionales: si no están instalados esos encodings
+no se ofrecen. Al comprimir, el ETag pasa a débil (W/) y se agrega
+``Vary: Accept-Encoding``.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..services.sti_cache import ByteBudgetLRU
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/octet-stream",
+    "application/x-npy",
+    "application/vnd.apache.arrow.stream",
+    "text/",
+)
+
+# Preferencia del servidor ante q iguales
+PREFERENCE = ("zstd", "br", "gzip")
+
+# Variantes comprimidas de respuestas inmutables, keyed por (ETag, encoding, content-type)
+COMPRESSED_CACHE = ByteBudgetLRU(settings.COMPRESSION_CACHE_MAX_BYTES, getsizeof=len)
+_CACHE_LOCK = threading.Lock()
+
+
+# Firma de stream(): (compress, flush, finish)
+StreamCodec = Tuple[Callable[[bytes], bytes], Callable[[], bytes], Callable[[], bytes]]
+
+
+class _Served(Exception):
+    """
+    La variante cacheada ya se envió: corta la respuesta de la app.
+    """
+
+
+def _only_served(exc: BaseException) -> bool:
+    # Según la versión de starlette/anyio la excepción llega sola o dentro de un ExceptionGroup
+    if isinstance(exc, _Served):
+        return True
+    inner = getattr(exc, "exceptions", None)
+    return bool(inner) and all(_only_served(e) for e in inner)
+
+
+def cache_stats() -> Dict[str, Any]:
+    with _CACHE_LOCK:
+        return COMPRESSED_CACHE.stats()
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        c = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return c.compress(data) + c.flush()
+
+    def stream(self) -> StreamCodec:
+        c = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return c.compress, (lambda: c.flush(zlib.Z_SYNC_FLUSH)), c.flush
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        import brotli
+
+        self._brotli = brotli
+        self.quality = quality
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.compress(data, quality=self.quality)
+
+    def stream(self) -> StreamCodec:
+        c = self._brotli.Compressor(quality=self.quality)
+        return c.process, c.flush, c.finish
+
+
+class _Zstd:
+    def __init__(self, level: int):
+        import zstandard
+
+        self._zstd = zstandard
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._lock = threading.Lock()
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        # ZstdCompressor no es thread-safe: uno compartido bajo lock para one-shot
+        with self._lock:
+            return self._compressor.compress(data)
+
+    def stream(self) -> StreamCodec:
+        c = self._zstd.ZstdCompressor(level=self.level).compressobj()
+        flush_block = self._zstd.COMPRESSOBJ_FLUSH_BLOCK
+        return c.compress, (lambda: c.flush(flush_block)), c.flush
+
+
+def available_codecs() -> Dict[str, Any]:
+    codecs: Dict[str, Any] = {"gzip": _Gzip(settings.COMPRESSION_GZIP_LEVEL)}
+    for name, factory, level in (
+        ("br", _Brotli, settings.COMPRESSION_BROTLI_QUALITY),
+        ("zstd", _Zstd, settings.COMPRESSION_ZSTD_LEVEL),
+    ):
+        try:
+            codecs[name] = factory(level)
+        except ImportError:
+            logger.info(f"Compresión '{name}' no disponible (dependencia opcional no instalada)")
+    return codecs
+
+
+def negotiate_encoding(accept_encoding: Optional[str], offered: List[str]) -> Optional[str]:
+    """
+    Encoding a usar según Accept-Encoding (q-values, '*'), o None para identity.
+    """
+    if not accept_encoding:
+        return None
+    q: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        fields = [f.strip() for f in part.split(";")]
+        name = fields[0].lower()
+        if not name:
+            continue
+        weight = 1.0
+        for f in fields[1:]:
+            if f.startswith("q="):
+                try:
+                    weight = float(f[2:])
+                except ValueError:
+                    weight = 0.0
+        q[name] = weight
+
+    best, best_q = None, 0.0
+    for name in PREFERENCE:
+        if name not in offered:
+            continue
+        weight = q.get(name, q.get("*", 0.0))
+        if weight > best_q:
+            best, best_q = name, weight
+    return best
+
+
+def _compressible(content_type: str) -> bool:
+    return any(content_type.startswith(t) for t in COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, min_bytes: int = 1024, flush_bytes: Optional[int] = None):
+        self.app = app
+        self.min_bytes = min_bytes
+        self.flush_bytes = settings.COMPRESSION_STREAM_FLUSH_BYTES if flush_bytes is None else flush_bytes
+        self.codecs = available_codecs()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict((k.lower(), v) for k, v in scope.get("headers", []))
+        encoding = negotiate_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"), list(self.codecs))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, _CompressedSend(self, encoding, send))
+        except BaseException as e:
+            if not _only_served(e):
+                raise
+
+    def cached(self, key: Optional[Tuple]) -> Optional[bytes]:
+        if key is None:
+            return None
+        with _CACHE_LOCK:
+            data = COMPRESSED_CACHE.get(key)
+            if data is not None:
+                COMPRESSED_CACHE.hits += 1
+            else:
+                COMPRESSED_CACHE.misses += 1
+            return data
+
+    def store(self, key: Tuple, data: bytes) -> None:
+        with _CACHE_LOCK:
+            if len(data) <= COMPRESSED_CACHE.maxsize:
+                COMPRESSED_CACHE[key] = data
+            else:
+                COMPRESSED_CACHE.rejected += 1
+
+    def cached_compress(self, key: Optional[Tuple], encoding: str, body: bytes) -> bytes:
+        """
+        Comprime ``body``; con ``key`` (respuesta inmutable) reutiliza/guarda la variante.
+        """
+        data = self.cached(key)
+        if data is None:
+            data = self.codecs[encoding].compress(body)
+            if key is not None:
+                self.store(key, data)
+        return data
+
+
+class _CompressedSend:
+    """
+    Estado de una respuesta: decide en el primer chunk si comprime y cómo.
+    """
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.mw = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Dict[str, Any]] = None
+        self.mode: Optional[str] = None  # "passthrough" | "stream" | "done"
+        self._compress: Optional[Callable[[bytes], bytes]] = None
+        self._flush: Optional[Callable[[], bytes]] = None
+        self._finish: Optional[Callable[[], bytes]] = None
+        self._unflushed = 0
+        self._key: Optional[Tuple] = None
+        self._parts: Optional[List[bytes]] = None
+        self._size = 0
+
+    def _header(self, name: bytes) -> Optional[bytes]:
+        for k, v in self.start["headers"]:
+            if k.lower() == name:
+                return v
+        return None
+
+    def _eligible(self) -> bool:
+        if self.start["status"] in (204, 304) or self.start["status"] < 200:
+            return False
+        if self._header(b"content-encoding") is not None:
+            return False
+        return _compressible((self._header(b"content-type") or b"").decode("latin-1"))
+
+    def _compressed_headers(self, length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        out = []
+        vary = None
+        for k, v in self.start["headers"]:
+            lk = k.lower()
+            if lk == b"content-length":
+                continue
+            if lk == b"etag" and not v.startswith(b"W/"):
+                v = b"W/" + v
+            if lk == b"vary":
+                vary = v
+                continue
+            out.append((k, v))
+        out.append((b"content-encoding", self.encoding.encode()))
+        out.append((b"vary", (vary + b", Accept-Encoding") if vary else b"Accept-Encoding"))
+        if length is not None:
+            out.append((b"content-length", str(length).encode()))
+        return out
+
+    def _cache_key(self) -> Optional[Tuple]:
+        cache_control = (self._header(b"cache-control") or b"").lower()
+        etag = self._header(b"etag")
+        if etag and b"immutable" in cache_control:
+            return (etag, self.encoding, self._header(b"content-type"))
+        return None
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+
+        if self.mode is None:
+            if not self._eligible() or (not more and len(body) < self.mw.min_bytes):
+                self.mode = "passthrough"
+                await self.send(self.start)
+                await self.send(message)
+                return
+
+            if not more:
+                # Cuerpo completo en un solo mensaje
+                data = self.mw.cached_compress(self._cache_key(), self.encoding, body)
+                await self.send({**self.start, "headers": self._compressed_headers(len(data))})
+                await self.send({"type": "http.response.body", "body": data})
+                self.mode = "done"
+                return
+
+            self._key = self._cache_key()
+            data = self.mw.cached(self._key)
+            if data is not None:
+                # Variante ya comprimida: se envía entera y se corta la app, que si no
+                # seguiría generando el resto del cuerpo sólo para descartarlo
+                await self.send({**self.start, "headers": self._compressed_headers(len(data))})
+                await self.send({"type": "http.response.body", "body": data})
+                self.mode = "done"
+                raise _Served()
+
+            self.mode = "stream"
+            self._compress, self._flush, self._finish = self.mw.codecs[self.encoding].stream()
+            self._parts = [] if self._key is not None else None
+            await self.send({**self.start, "headers": self._compressed_headers(None)})
+
+        if self.mode == "passthrough":
+            await self.send(message)
+            return
+
+        if self.mode == "stream":
+            chunk = self._compress(body) if body else b""
+            self._unflushed += len(body)
+            if not more:
+                chunk += self._finish()
+            elif self._unflushed >= self.mw.flush_bytes:
+                chunk += self._flush()
+                self._unflushed = 0
+            if self._parts is not None:
+                self._parts.append(chunk)
+                self._size += len(chunk)
+                if self._size > COMPRESSED_CACHE.maxsize:
+                    self._parts = None  # no entra en el cache: se deja de acumular
+            if chunk or not more:
+                await self.send({"type": "http.response.body", "body": chunk, "more_body": more})
+            if not more and self._parts is not None:
+                self.mw.store(self._key, b"".join(self._parts))
@@ -0,0 +1,60 @@
+"""
+Validadores HTTP (ETag / Cache-Control) y GET condicional.
+
+Los NetCDF de un run/step no cambian una vez publicados: las respuestas derivadas
+llevan un ETag fuerte (hash del ETag del objeto S3 + los parámetros que definen la
+representación) y Cache-Control largo e ``immutable``. Si el cliente envía
+``If-None-Match`` con ese ETag se responde 304 sin decodificar ni serializar nada.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Optional
+
+from fastapi.responses import Response
+
+# Recursos run/step: inmutables una vez publicados
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Recursos que pueden cambiar si se re-publican los archivos fuente
+REVALIDATE_CACHE_CONTROL = "public, max-age=3600, must-revalidate"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    ETag fuerte (entre comillas) a partir de las partes que definen la representación.
+    """
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Comparación débil de If-None-Match (RFC 9110 §13.1.2): acepta listas, '*' y W/.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def apply(response: Optional[Response], etag: str, cache_control: str, vary: Optional[str] = None) -> Optional[Response]:
+    """
+    Agrega ETag/Cache-Control (y Vary) a ``response``. Tolera None (llamadas directas a la función).
+    """
+    if response is not None:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = cache_control
+        if vary:
+            response.headers["Vary"] = vary
+    return response
+
+
+def not_modified(etag: str, cache_control: str, vary: Optional[str] = None) -> Response:
+    return apply(Response(status_code=304), etag, cache_control, vary)
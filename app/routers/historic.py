@@ -1,9 +1,14 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+import json
 import logging
 
-from ..lib.historic.extract import extract_points
+from ..lib.historic.aggregate import PolygonAggregation
+from ..lib.historic.extract import PointExtraction, extract_points
+from ..lib.historic.loader import dataset_signature
+from . import conditional
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -14,53 +19,138 @@ class Point(BaseModel):
 
 class HistoricRequest(BaseModel):
     points: Optional[List[Point]] = None
-    polygon: Optional[List[Point]] = None
+    # A ring of vertices, or a GeoJSON Polygon/MultiPolygon/Feature/FeatureCollection
+    polygon: Optional[Union[List[Point], Dict[str, Any]]] = None
+    # Several GeoJSON geometries: one area-weighted series each
+    polygons: Optional[List[Dict[str, Any]]] = None
     units: Optional[str] = Field("C", pattern="^(C|K)$")
     start: Optional[str] = None
     end: Optional[str] = None
 
+NDJSON = "application/x-ndjson"
+
+
+def _request_geometries(payload: HistoricRequest) -> List[Any]:
+    geometries: List[Any] = []
+    if isinstance(payload.polygon, list) and payload.polygon:
+        ring = [[p.lon, p.lat] for p in payload.polygon]
+        geometries.append({"type": "Polygon", "coordinates": [ring]})
+    elif isinstance(payload.polygon, dict):
+        geometries.append(payload.polygon)
+    geometries.extend(payload.polygons or [])
+    return geometries
+
+
+def _iter_chunked_json(items: Iterable[Dict[str, Any]], head: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+    """
+    {**head, "data": [...]} written one point at a time.
+    """
+    prefix = json.dumps(head)[1:-1] + ", " if head else ""
+    yield ("{" + prefix + '"data": [').encode()
+    for i, item in enumerate(items):
+        yield ((", " if i else "") + json.dumps(item, default=str)).encode()
+    yield b"]}"
+
+
+def _iter_ndjson(items: Iterable[Dict[str, Any]], head: Optional[Dict[str, Any]] = None) -> Iterator[bytes]:
+    if head:
+        yield (json.dumps(head) + "\n").encode()
+    for item in items:
+        yield (json.dumps(item, default=str) + "\n").encode()
+
+
 @router.post("/t2m")
-async def get_historic_t2m(payload: HistoricRequest):
+async def get_historic_t2m(
+    payload: HistoricRequest,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$", description="ndjson: one point per line"),
+    stream: bool = Query(False, description="Stream the JSON body point by point"),
+    layout: str = Query(
+        "rows",
+        pattern="^(rows|columnar)$",
+        description="columnar: 'dates'/'timestamps' once and a 'values' array per point",
+    ),
+):
     """
-    Get historic monthly temperature series for a list of points or a polygon (centroid).
+    Get historic monthly temperature series for a list of points or for polygons.
+
+    Polygons (``polygon`` as a vertex ring or GeoJSON, and/or ``polygons`` as a list of
+    GeoJSON geometries) return one series per geometry: the mean over every grid cell
+    the polygon touches, weighted by covered fraction x cos(latitude).
+
+    The response carries an ETag derived from the source files signature and the request
+    body; a matching If-None-Match returns 304 without touching the dataset.
+
+    Streaming: ``stream=true`` writes the same {"data": [...]} body one point at a time;
+    ``format=ndjson`` (or Accept: application/x-ndjson) writes one point per line.
+    Each point's series is built only when it is sent, so memory stays bounded.
+
+    ``layout=columnar`` returns ``dates`` and ``timestamps`` once (first line in NDJSON)
+    and, per point, a ``values`` array aligned with them instead of per-month dicts.
+
+    ``start``/``end`` (ISO dates, inclusive) restrict the series to that window; the
+    slice is taken before extraction, so cost scales with the window requested.
     """
+    if format is None and accept and NDJSON in accept:
+        format = "ndjson"
+    mode = "ndjson" if format == "ndjson" else ("json" if stream else None)
+
     try:
-        pts = []
-        
-        # 1. Determine points source
-        if payload.polygon and len(payload.polygon) > 0:
-            # Calculate Centroid
-            lats = [p.lat for p in payload.polygon]
-            lons = [p.lon for p in payload.polygon]
-            
-            avg_lat = sum(lats) / len(lats)
-            avg_lon = sum(lons) / len(lons)
-            
-            logger.info(f"Polygon provided. Calculated centroid: ({avg_lat}, {avg_lon})")
-            pts = [{"lat": avg_lat, "lon": avg_lon}]
-            
+        etag = conditional.make_etag("historic-t2m", dataset_signature(), payload.model_dump_json(), mode, layout)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if conditional.etag_matches(if_none_match, etag):
+        return conditional.not_modified(etag, conditional.REVALIDATE_CACHE_CONTROL)
+
+    try:
+        # 1. Determine source: polygons (area-weighted) or points
+        geometries = _request_geometries(payload)
+        if geometries:
+            logger.info(f"{len(geometries)} polygon(s) provided: area-weighted aggregation")
+            extraction = PolygonAggregation(geometries, payload.units, payload.start, payload.end)
         elif payload.points:
-            pts = [p.dict() for p in payload.points]
+            pts = [p.model_dump() for p in payload.points]
+            # The buffered rows layout keeps going through extract_points
+            extraction = PointExtraction(pts, payload.units, payload.start, payload.end) if mode or layout == "columnar" else None
         else:
             raise ValueError("Must provide either 'points' or 'polygon'")
 
         # 2. Extract Data
-        data = extract_points(
-            points=pts,
-            units=payload.units,
-            # date_start=payload.start,
-            # date_end=payload.end
-        )
-        
-        # 3. Request requirement: "El output debe ser imprimirlo por la consola de DEBUG, los datos RAW obtenidos"
-        import json
-        # We try to pretty print it to stdout for the user to see in their terminal
-        print("\n" + "="*40)
-        print("DEBUG: RAW HISTORIC DATA OUTPUT")
-        print("="*40)
-        print(json.dumps(data, default=str, indent=2))
-        print("="*40 + "\n")
+        columnar = layout == "columnar"
+        if mode or columnar:
+            head = extraction.time_columns() if columnar else None
+            items = extraction.iter_columns() if columnar else extraction.iter_rows()
+
+        if mode:
+            chunks = _iter_ndjson(items, head) if mode == "ndjson" else _iter_chunked_json(items, head)
+            return conditional.apply(
+                StreamingResponse(chunks, media_type=NDJSON if mode == "ndjson" else "application/json"),
+                etag,
+                conditional.REVALIDATE_CACHE_CONTROL,
+            )
+
+        if columnar:
+            conditional.apply(response, etag, conditional.REVALIDATE_CACHE_CONTROL)
+            return {**head, "data": list(items)}
+
+        if extraction is not None:
+            data = list(extraction.iter_rows())
+        else:
+            data = extract_points(
+                points=pts,
+                units=payload.units,
+                date_start=payload.start,
+                date_end=payload.end,
+            )
+
+        # Summary only: dumping whole series serializes the payload a second time
+        if logger.isEnabledFor(logging.DEBUG):
+            values = sum(len(item.get("series", ())) for item in data)
+            logger.debug(f"Historic t2m: {len(data)} item(s), {values} value(s)")
 
+        conditional.apply(response, etag, conditional.REVALIDATE_CACHE_CONTROL)
         return {"data": data}
         
     except ValueError as ve:
@@ -1,13 +1,29 @@
 from __future__ import annotations
+import logging
 import numpy as np
-from typing import Dict, Any, List
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import JSONResponse
+from typing import Annotated, Dict, Any, List, Optional
+from fastapi import APIRouter, Body, Header, HTTPException, Path, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
 
 # Use relative imports
-from ..services.sti_service import list_runs, list_steps, load_dataset
+from ..services.sti_service import list_runs, list_steps, subset_sti, STI_CACHE
+from ..services.sti_stats import get_stats
+from ..services import sti_diff, sti_encoding, sti_lod, sti_manifest, sti_points, sti_polygon, sti_service, sti_tiles
+from ..services.sti_warmer import WARMER
+from . import compression, conditional
 
 router = APIRouter(prefix="/sti", tags=["STI"])
+logger = logging.getLogger(__name__)
+
+
+class Point(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=360)
+
+
+class PointsRequest(BaseModel):
+    points: List[Point] = Field(..., min_length=1)
 
 @router.get("/runs")
 def get_runs():
@@ -35,61 +51,255 @@ def get_steps(run: str):
 # --------------------------------------------------------------------
 # Endpoints que abren NetCDF
 # --------------------------------------------------------------------
+_NC_NOT_FOUND = "NetCDF no encontrado en S3 para el run/step especificado"
+
+
+def _step_etag(run: str, step: str, *parts) -> str:
+    """
+    ETag de una representación derivada del NetCDF run/step (HEAD a S3 cacheado, sin decodificar).
+    """
+    try:
+        return conditional.make_etag(sti_service.step_etag(run, step), *parts)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=_NC_NOT_FOUND)
+    except ValueError:
+        # step no numérico: _normalize_step no lo puede llevar a 3 dígitos
+        raise HTTPException(status_code=422, detail=f"step inválido: {step}")
+
+
+def _point_series(run: str, points: List[Dict[str, float]]):
+    try:
+        return sti_points.point_series(run, points)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No se encontraron steps para run={run}")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/{run}/point")
+def get_point(
+    run: str,
+    response: Response,
+    lat: float = Query(..., ge=-90, le=90, description="Latitud (grados)"),
+    lon: float = Query(..., ge=-180, le=360, description="Longitud (grados)"),
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    """
+    Serie de 'sti' en un punto para todos los steps del run, en una sola respuesta.
+    El ETag depende de los ETags de todos los steps: un step nuevo lo invalida.
+    """
+    try:
+        steps, etags = sti_points.run_etags(run)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No se encontraron steps para run={run}")
+    etag = conditional.make_etag(*steps, *etags, "point", lat, lon)
+    cache_control = conditional.REVALIDATE_CACHE_CONTROL
+    if conditional.etag_matches(if_none_match, etag):
+        return conditional.not_modified(etag, cache_control)
+
+    result = _point_series(run, [{"lat": lat, "lon": lon}])
+    conditional.apply(response, etag, cache_control)
+    return result
+
+
+@router.post("/{run}/points")
+def post_points(run: str, payload: PointsRequest):
+    """
+    Variante multi-punto de /{run}/point (un solo cubo por run, cacheado).
+    """
+    return _point_series(run, [p.model_dump() for p in payload.points])
+
+
+@router.get("/diff")
+def get_diff(
+    run_a: str = Query(..., description="Run de referencia (YYYYMMDDHH)"),
+    run_b: str = Query(..., description="Run a comparar (YYYYMMDDHH)"),
+    step: str = Query(..., description="Step común a ambos runs"),
+    lat_min: Optional[float] = Query(None, description="Latitud mínima (grados)"),
+    lat_max: Optional[float] = Query(None, description="Latitud máxima (grados)"),
+    lon_min: Optional[float] = Query(None, description="Longitud mínima (grados)"),
+    lon_max: Optional[float] = Query(None, description="Longitud máxima (grados)"),
+    stats_only: bool = Query(False, description="Sólo las estadísticas del cambio, sin la grilla"),
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    """
+    Diferencia ``run_b - run_a`` de 'sti' para un step (opcionalmente en un bbox),
+    calculada en el servidor desde las grillas decodificadas en cache.
+
+    Responde ``diff_stats`` (media, desvío, min/max, media absoluta, RMSE, medias de
+    cada run y fracción de celdas que cambian de signo) y, salvo ``stats_only``, la
+    grilla de diferencias en layout grid (ejes + matriz, NaN -> null).
+    Si las grillas de los runs no están alineadas se responde 409.
+    """
+    bounds = (lat_min, lat_max, lon_min, lon_max)
+    bbox = None
+    if any(v is not None for v in bounds):
+        if any(v is None for v in bounds):
+            raise HTTPException(status_code=422, detail="El bbox requiere lat_min, lat_max, lon_min y lon_max")
+        if lat_min >= lat_max:
+            raise HTTPException(status_code=422, detail="lat_min must be < lat_max")
+        if lon_min >= lon_max:
+            raise HTTPException(status_code=422, detail="lon_min must be < lon_max")
+        bbox = bounds
+
+    etag = conditional.make_etag(
+        _step_etag(run_a, step), _step_etag(run_b, step), "diff", bbox, stats_only
+    )
+    cache_control = conditional.IMMUTABLE_CACHE_CONTROL
+    if conditional.etag_matches(if_none_match, etag):
+        return conditional.not_modified(etag, cache_control)
+
+    try:
+        diff, stats = sti_diff.diff_runs(run_a, run_b, step, bbox)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=_NC_NOT_FOUND)
+    except sti_diff.GridMismatchError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    header = {"run_a": run_a, "run_b": run_b, "step": step, "diff_stats": stats}
+    if stats_only:
+        return conditional.apply(JSONResponse(header), etag, cache_control)
+    chunks = sti_encoding.iter_grid_json(
+        {**header, "layout": "grid"}, diff["latitude"].values, diff["longitude"].values, diff.values
+    )
+    return conditional.apply(StreamingResponse(chunks, media_type=sti_encoding.JSON), etag, cache_control)
+
+
+@router.get("/warmer")
+def get_warmer_status():
+    """
+    Progreso del warmer en background (runs detectados, steps descargados, bytes).
+    """
+    return WARMER.status()
+
+
+@router.get("/cache")
+def get_cache_stats():
+    """
+    Métricas de los caches (hits/misses/evictions/bytes): NetCDF en disco,
+    grillas decodificadas y tiles renderizados.
+    """
+    return {
+        "manifest": sti_manifest.MANIFEST.status(),
+        "disk": sti_service.DISK_CACHE.stats(),
+        "decoded": STI_CACHE.stats(),
+        "lod": sti_lod.LOD_CACHE.stats(),
+        "tiles": sti_tiles.TILE_CACHE.stats(),
+        "point_cubes": sti_points.POINT_CUBE_CACHE.stats(),
+        "masks": sti_polygon.MASK_CACHE.stats(),
+        "compressed": compression.cache_stats(),
+    }
+
+
+@router.get("/{run}/{step}/tiles/{z}/{x}/{y}.{ext}")
+def get_tile(
+    run: str,
+    step: str,
+    z: int,
+    x: int,
+    y: int,
+    ext: str = Path(..., pattern="^(png|webp|bin)$"),
+    cmap: str = Query(sti_tiles.DEFAULT_COLORMAP, description="Colormap fijo: rdbu | brbg"),
+    encoding: Annotated[
+        str,
+        Query(pattern="^(float|int16)$", description="Data tiles (.bin): float32 o int16 empaquetado"),
+    ] = "float",
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    """
+    Tile raster 256x256 (Web Mercator) de 'sti' para Leaflet.
+    Pixeles sin dato quedan transparentes; los tiles se cachean en memoria y disco.
+    Inmutable por run/step: ETag + Cache-Control largo, 304 con If-None-Match.
+
+    ``.bin`` devuelve el data tile (256x256 row-major LE): float32 con NaN o, con
+    encoding=int16, valores empaquetados (headers X-STI-Scale-Factor, etc.).
+    """
+    if ext != "bin" and encoding != "float":
+        raise HTTPException(status_code=422, detail="encoding sólo aplica a data tiles (.bin)")
+    etag = _step_etag(run, step, "tile", z, x, y, ext, cmap, encoding)
+    cache_control = conditional.IMMUTABLE_CACHE_CONTROL
+    if conditional.etag_matches(if_none_match, etag):
+        return conditional.not_modified(etag, cache_control)
+
+    try:
+        content = sti_tiles.get_tile(run, step, z, x, y, ext, cmap, encoding)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=_NC_NOT_FOUND)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ImportError:
+        raise HTTPException(status_code=406, detail="WebP no disponible (Pillow no instalado)")
+    headers = {"X-STI-Shape": f"{sti_tiles.TILE_SIZE},{sti_tiles.TILE_SIZE}"} if ext == "bin" else {}
+    if encoding == "int16":
+        headers.update(_int16_headers())
+    response = Response(content=content, media_type=sti_tiles.MEDIA_TYPES[ext], headers=headers)
+    return conditional.apply(response, etag, cache_control)
+
+
 @router.get("/{run}/{step}/summary")
-def get_summary(run: str, step: str):
+def get_summary(
+    run: str,
+    step: str,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
     """
     Devuelve estadísticas básicas del dataset:
     - dimensiones
     - variables
-    - min/max/mean de la variable 'sti'
+    - min/max/mean/std, conteo de NaN, percentiles e histograma de la variable 'sti'
+
+    Se sirve desde el sidecar .stats.json publicado junto al NetCDF; sólo si falta
+    (o está obsoleto) se decodifica el NetCDF y se escribe el sidecar.
     """
-    ds = None
+    etag = _step_etag(run, step, "summary")
+    cache_control = conditional.IMMUTABLE_CACHE_CONTROL
+    if conditional.etag_matches(if_none_match, etag):
+        return conditional.not_modified(etag, cache_control)
+
     try:
-        ds = load_dataset(run, step)
+        stats = get_stats(run, step)
     except FileNotFoundError:
-        raise HTTPException(
-            status_code=404,
-            detail="NetCDF no encontrado en S3 para el run/step especificado",
-        )
+        raise HTTPException(status_code=404, detail=_NC_NOT_FOUND)
     except Exception as e:
         # Aquí pueden caer errores de IO, HDF5, netCDF corrupto, etc.
-        import traceback
-        import sys
-        print(f"CRITICAL ERROR LOADING DATASET in get_summary: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
-        
+        logger.exception(f"Error abriendo dataset en get_summary run={run} step={step}: {e}")
         raise HTTPException(
             status_code=500,
             detail=f"Error abriendo NetCDF: {e}",
         )
 
-    try:
-        # La variable ya viene normalizada como 'sti' desde s3_helpers
-        if "sti" not in ds.data_vars:
-             raise HTTPException(
-                status_code=500,
-                detail=f"Variable 'sti' no encontrada. Vars: {list(ds.data_vars)}",
-            )
+    summary: Dict[str, Any] = {
+        "run": run,
+        "step": step,
+        "dims": stats["dims"],
+        "coords": stats["coords"],
+        "vars": stats["vars"],
+        "sti_stats": stats["sti_stats"],
+    }
+    return conditional.apply(JSONResponse(summary), etag, cache_control)
 
-        sti = ds["sti"]
 
-        summary: Dict[str, Any] = {
-            "run": run,
-            "step": step,
-            "dims": {k: int(v) for k, v in ds.dims.items()},
-            "coords": list(ds.coords.keys()),
-            "vars": list(ds.data_vars.keys()),
-            "sti_stats": {
-                "min": float(sti.min().values),
-                "max": float(sti.max().values),
-                "mean": float(sti.mean().values),
-            },
-        }
-        return JSONResponse(summary)
-    finally:
-        # Nos aseguramos de cerrar el Dataset incluso si algo falla
-        if ds:
-            ds.close()
+@router.post("/{run}/{step}/polygon")
+def post_polygon(
+    run: str,
+    step: str,
+    geometry: Dict[str, Any] = Body(..., description="GeoJSON Polygon/MultiPolygon (geometría, Feature o FeatureCollection)"),
+    percentiles: List[float] = Query(list(sti_polygon.DEFAULT_PERCENTILES), description="Percentiles (0-100)"),
+):
+    """
+    Estadísticas de 'sti' dentro de un polígono GeoJSON, ponderadas por área (cos(lat)):
+    media, desvío, min/max, percentiles y conteo de celdas (total, válidas, NaN).
+
+    La máscara rasterizada se cachea por geometría y grilla: repetir la consulta de
+    la misma comuna/región sólo hace la reducción.
+    """
+    try:
+        stats = sti_polygon.polygon_stats(run, step, geometry, percentiles)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=_NC_NOT_FOUND)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"run": run, "step": step, "sti_stats": stats}
 
 
 @router.get("/{run}/{step}/subset")
@@ -100,85 +310,182 @@ def get_subset(
     lat_max: float = Query(..., description="Latitud máxima (grados)"),
     lon_min: float = Query(..., description="Longitud mínima (grados)"),
     lon_max: float = Query(..., description="Longitud máxima (grados)"),
+    format: Annotated[
+        Optional[str],
+        Query(pattern="^(json|f32|arrow|npy|ndjson)$", description="Fuerza el formato (tiene prioridad sobre Accept)"),
+    ] = None,
+    layout: Annotated[
+        Optional[str],
+        Query(pattern="^(flat|grid)$", description="JSON: 'flat' (tripletas lat/lon/sti) o 'grid' (ejes + matriz)"),
+    ] = None,
+    stream: Annotated[
+        bool,
+        Query(description="layout=flat: JSON por chunks (StreamingResponse) en vez de armar el dict completo"),
+    ] = False,
+    max_cells: Annotated[
+        Optional[int],
+        Query(ge=1, description="Máximo de celdas: si el bbox lo supera se devuelve un overview 2x/4x/8x"),
+    ] = None,
+    encoding: Annotated[
+        str,
+        Query(pattern="^(float|int16)$", description="'int16': valores empaquetados (scale_factor/add_offset, NaN -> fill_value)"),
+    ] = "float",
+    accept: Annotated[Optional[str], Header()] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+    response: Response = None,
 ):
     """
     Devuelve un recorte geográfico de la variable 'sti' como JSON.
-    Ojo con el tamaño: para MVP, usar bounding boxes razonables.
+    Para bboxes grandes usar ``max_cells``: si el recorte lo supera se sirve desde
+    la pirámide de overviews (promedio por bloques 2x/4x/8x que ignora NaN) y el
+    factor usado se informa en 'lod_factor' (header X-STI-LOD-Factor).
 
     Nota: asumimos esquema tipo ERA5 con coords "latitude" y "longitude".
     Muchas veces latitude viene de 90 -> -90, por eso usamos slice(lat_max, lat_min).
+
+    La grilla sale del cache en memoria; en un miss con STI_READ_MODE=remote se leen
+    por rangos de bytes sólo los chunks que intersectan el bbox.
+
+    Negociación de contenido (Accept o ?format=): JSON (default), application/octet-stream
+    (grilla float32 con header de ejes), Arrow IPC y .npy. Ver services/sti_encoding.py.
+
+    layout=grid devuelve los ejes 'latitude'/'longitude' una sola vez y 'sti' como matriz
+    row-major (NaN -> null), en vez de las tripletas aplanadas (~1/3 del tamaño).
+
+    Streaming: layout=grid, stream=true (layout flat) y NDJSON (Accept
+    application/x-ndjson o ?format=ndjson) se serializan fila a fila desde el array
+    numpy, sin armar listas Python de toda la grilla.
+
+    encoding=int16 devuelve los valores empaquetados en int16 (ver sti_encoding):
+    enteros en JSON con 'scale_factor'/'add_offset'/'fill_value' en el header, y en
+    los formatos binarios una grilla int16 (headers X-STI-Scale-Factor, etc.).
+
+    El ETag cubre run/step (ETag S3), bbox, layout, encoding y el formato negociado; con
+    If-None-Match coincidente se responde 304 sin leer la grilla.
     """
-    ds = None
+    if lat_min >= lat_max:
+        raise HTTPException(status_code=422, detail="lat_min must be < lat_max")
+    if lon_min >= lon_max:
+        raise HTTPException(status_code=422, detail="lon_min must be < lon_max")
+
+    media_type = sti_encoding.negotiate(accept, format)
+    etag = _step_etag(run, step, "subset", lat_min, lat_max, lon_min, lon_max, media_type, layout or "flat", stream, max_cells, encoding)
+    cache_control = conditional.IMMUTABLE_CACHE_CONTROL
+    vary = "Accept"
+    if conditional.etag_matches(if_none_match, etag):
+        return conditional.not_modified(etag, cache_control, vary)
+
     try:
-        ds = load_dataset(run, step)
+        sub = subset_sti(run, step, lat_min, lat_max, lon_min, lon_max, max_cells=max_cells)
     except FileNotFoundError:
-        raise HTTPException(
-            status_code=404,
-            detail="NetCDF no encontrado en S3 para el run/step especificado",
-        )
+        raise HTTPException(status_code=404, detail=_NC_NOT_FOUND)
     except Exception as e:
-        import traceback
-        import sys
-        
-        # Log error to stderr so uvicorn captures it
-        print(f"CRITICAL ERROR LOADING DATASET in get_subset: {e}", file=sys.stderr)
-        traceback.print_exc(file=sys.stderr)
-        
+        logger.exception(f"Error abriendo dataset en get_subset run={run} step={step}: {e}")
         raise HTTPException(
             status_code=500,
             detail=f"Error abriendo NetCDF: {e}",
         )
 
-    try:
-        # Note: variable normalization (var->sti) is now handled in s3_helpers.load_dataset
+    extra = {} if max_cells is None else {"lod_factor": int(sub.attrs.get("lod_factor", 1))}
+    packed = encoding == "int16"
+    if packed:
+        extra = {**extra, "encoding": "int16", **sti_encoding.int16_attrs()}
 
-        if lat_min >= lat_max:
-            raise HTTPException(status_code=422, detail="lat_min must be < lat_max")
-        if lon_min >= lon_max:
-            raise HTTPException(status_code=422, detail="lon_min must be < lon_max")
+    header = {"run": run, "step": step, **extra}
+    lats, lons = sub["latitude"].values, sub["longitude"].values
+    values = sti_encoding.quantize_int16(sub.values) if packed else sub.values
+
+    if media_type == sti_encoding.NDJSON:
+        return conditional.apply(
+            StreamingResponse(sti_encoding.iter_ndjson(header, lats, lons, values), media_type=media_type),
+            etag, cache_control, vary,
+        )
+
+    if media_type != sti_encoding.JSON:
+        binary = _binary_subset(media_type, run, step, lats, lons, values)
+        if "lod_factor" in extra:
+            binary.headers["X-STI-LOD-Factor"] = str(extra["lod_factor"])
+        if packed:
+            binary.headers.update(_int16_headers())
+        return conditional.apply(binary, etag, cache_control, vary)
+
+    if layout == "grid" or stream:
+        if layout == "grid":
+            chunks = sti_encoding.iter_grid_json({**header, "layout": "grid"}, lats, lons, values)
+        else:
+            chunks = sti_encoding.iter_flat_json(header, lats, lons, values)
+        return conditional.apply(
+            StreamingResponse(chunks, media_type=sti_encoding.JSON), etag, cache_control, vary
+        )
 
-        print(f"DEBUG: Dataset loaded. Dimensions: {ds.dims}, Coords: {ds.coords}")
-
-        # Geographic subset
-        lat_vals = ds["latitude"].values
-        lon_vals = ds["longitude"].values
-        lat_desc = len(lat_vals) > 1 and float(lat_vals[0]) > float(lat_vals[-1])
-        lon_desc = len(lon_vals) > 1 and float(lon_vals[0]) > float(lon_vals[-1])
-
-        lat_slice = slice(lat_max, lat_min) if lat_desc else slice(lat_min, lat_max)
-        lon_slice = slice(lon_max, lon_min) if lon_desc else slice(lon_min, lon_max)
-
-        sub = ds["sti"].sel(latitude=lat_slice, longitude=lon_slice)
-
-        # If subset is empty (bbox out of grid), return empty arrays
-        if sub.size == 0:
-            return {
-                "run": run,
-                "step": step,
-                "latitudes": [],
-                "longitudes": [],
-                "sti": [],
-            }
-        
-        # Flattening logic for frontend (Leaflet Heatmap)
-        lons_in = sub["longitude"].values
-        lats_in = sub["latitude"].values
-        
-        lon_grid, lat_grid = np.meshgrid(lons_in, lats_in)
-
-        flat_lats = lat_grid.flatten().tolist()
-        flat_lons = lon_grid.flatten().tolist()
-        flat_sti = sub.values.flatten().tolist()
-        
-        print(f"DEBUG: Returning {len(flat_sti)} points.")
+    conditional.apply(response, etag, cache_control, vary)
 
+    # If subset is empty (bbox out of grid), return empty arrays
+    if sub.size == 0:
         return {
             "run": run,
             "step": step,
-            "latitudes": flat_lats,
-            "longitudes": flat_lons,
-            "sti": flat_sti,
+            "latitudes": [],
+            "longitudes": [],
+            "sti": [],
+            **extra,
         }
-    finally:
-        if ds:
-            ds.close()
+    
+    # Flattening logic for frontend (Leaflet Heatmap)
+    lons_in = sub["longitude"].values
+    lats_in = sub["latitude"].values
+    
+    lon_grid, lat_grid = np.meshgrid(lons_in, lats_in)
+
+    flat_lats = lat_grid.flatten().tolist()
+    flat_lons = lon_grid.flatten().tolist()
+    flat_sti = values.flatten().tolist()
+    
+    logger.debug(f"Subset run={run} step={step}: {len(flat_sti)} puntos")
+
+    return {
+        "run": run,
+        "step": step,
+        "latitudes": flat_lats,
+        "longitudes": flat_lons,
+        "sti": flat_sti,
+        **extra,
+    }
+
+
+def _int16_headers() -> Dict[str, str]:
+    attrs = sti_encoding.int16_attrs()
+    return {
+        "X-STI-Encoding": "int16",
+        "X-STI-Scale-Factor": repr(attrs["scale_factor"]),
+        "X-STI-Add-Offset": repr(attrs["add_offset"]),
+        "X-STI-Fill-Value": str(attrs["fill_value"]),
+    }
+
+
+def _binary_subset(media_type: str, run: str, step: str, lats, lons, values) -> Response:
+    """
+    Serializa el recorte en uno de los formatos binarios de sti_encoding
+    (``values`` float, o int16 ya empaquetado).
+    """
+    headers = {"X-STI-Shape": f"{lats.size},{lons.size}"}
+    packed = values.dtype == np.int16
+
+    if media_type == sti_encoding.F32:
+        if packed:
+            content = sti_encoding.encode_i16_grid(lats, lons, values)
+        else:
+            content = sti_encoding.encode_f32_grid(lats, lons, values)
+    elif media_type == sti_encoding.NPY:
+        # .npy sólo transporta la grilla: los ejes van como first,last,count
+        for name, axis in (("Latitude", lats), ("Longitude", lons)):
+            if axis.size:
+                headers[f"X-STI-{name}"] = f"{float(axis[0])},{float(axis[-1])},{axis.size}"
+        content = sti_encoding.encode_npy(values)
+    else:
+        try:
+            content = sti_encoding.encode_arrow(lats, lons, values, {"run": run, "step": step})
+        except ImportError:
+            raise HTTPException(status_code=406, detail="Arrow IPC no disponible (pyarrow no instalado)")
+
+    return Response(content=content, media_type=media_type, headers=headers)
@@ -0,0 +1,136 @@
+"""
+Pool de procesos para decodificar NetCDF/HDF5 en paralelo.
+
+La librería HDF5 no es thread-safe, por eso dentro de un proceso toda apertura y
+``.load()`` pasa por ``sti_service._HDF5_LOCK`` y corre en un solo core. Cada
+worker de este pool es un proceso ``spawn`` con su propio estado HDF5, así que N
+run/steps distintos se decodifican en paralelo.
+
+Los datos vuelven por memoria compartida (``multiprocessing.shared_memory``): el
+worker escribe la grilla en un segmento y sólo devuelve su nombre, shape, dtype y
+las coordenadas (pequeñas). El proceso principal copia el segmento (un memcpy, sin
+pickle de la grilla por el pipe) y lo libera.
+
+El segmento pasa a ser del proceso principal en cuanto el worker lo entrega: el
+worker lo saca de su registro en el ``resource_tracker`` (si no, en Python < 3.13
+lo reporta como leak y lo borra) y lo borra él mismo si falla antes de entregarlo.
+Si el llamador abandona el resultado (cancelación, interrupción) el segmento se
+borra cuando el worker termina.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import xarray as xr
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _decode_in_worker(path: str) -> Dict[str, Any]:
+    """
+    Corre en el proceso hijo: decodifica 'sti' y la deja en un segmento de memoria compartida.
+    """
+    from .sti_service import decode_local_file
+
+    ds = decode_local_file(path)
+    try:
+        da = ds["sti"]
+        values = np.ascontiguousarray(da.values)
+        shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        try:
+            np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[...] = values
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        # Desde acá lo libera el proceso principal (decode_file)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        shm.close()
+        return {
+            "shm": shm.name,
+            "shape": values.shape,
+            "dtype": values.dtype.str,
+            "dims": da.dims,
+            "coords": {str(c): (da[c].dims, da[c].values) for c in da.coords},
+            "attrs": dict(da.attrs),
+            "meta": {
+                "dims": {str(k): int(v) for k, v in ds.sizes.items()},
+                "coords": [str(c) for c in ds.coords],
+                "data_vars": [str(v) for v in ds.data_vars],
+            },
+        }
+    finally:
+        ds.close()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            workers = max(1, settings.STI_DECODE_PROCESSES)
+            logger.info(f"Iniciando pool de decodificación con {workers} procesos")
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _POOL
+
+
+def shutdown() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=True, cancel_futures=True)
+            _POOL = None
+
+
+def _release_abandoned(future: Future) -> None:
+    """
+    Borra el segmento de un resultado que nadie va a leer.
+    """
+    if future.cancelled() or future.exception() is not None:
+        return  # el worker no entregó segmento (o ya lo borró al fallar)
+    try:
+        shm = shared_memory.SharedMemory(name=future.result()["shm"])
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def decode_file(path: str) -> Tuple[xr.DataArray, Dict[str, Any]]:
+    """
+    Decodifica ``path`` en un worker. Devuelve el DataArray 'sti' y la metadata del
+    dataset (dims, coords, data_vars) con las mismas keys que DecodedStep.
+    """
+    future = get_pool().submit(_decode_in_worker, path)
+    try:
+        result = future.result()
+    except BaseException:
+        # Resultado abandonado: el segmento se borra cuando el worker lo entregue
+        future.add_done_callback(_release_abandoned)
+        raise
+
+    shm = shared_memory.SharedMemory(name=result["shm"])
+    try:
+        values = np.ndarray(result["shape"], dtype=np.dtype(result["dtype"]), buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    sti = xr.DataArray(
+        values,
+        dims=result["dims"],
+        coords={name: (dims, vals) for name, (dims, vals) in result["coords"].items()},
+        attrs=result["attrs"],
+        name="sti",
+    )
+    return sti, result["meta"]
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import xarray as xr
+
+# Re-exportados: el LRU en bytes vive en lib/ para que lo compartan las librerías
+from ..lib.cache import ByteBudgetLRU, DecodedCache  # noqa: F401
+
+
+@dataclass(frozen=True)
+class DecodedStep:
+    """
+    Grilla 'sti' decodificada de un run/step, compartida en sólo-lectura entre requests.
+    """
+    run: str
+    step: str
+    etag: str
+    sti: xr.DataArray
+    dims: Dict[str, int] = field(default_factory=dict)
+    coords: List[str] = field(default_factory=list)
+    data_vars: List[str] = field(default_factory=list)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.sti.nbytes) + sum(int(self.sti[c].nbytes) for c in self.sti.coords)
+
+
+def freeze(da: xr.DataArray) -> xr.DataArray:
+    """
+    Marca los buffers numpy (datos y coords) como no escribibles.
+    Cualquier intento de mutar in-place un array compartido levanta ValueError.
+    """
+    da.values.setflags(write=False)
+    for c in da.coords:
+        da[c].values.setflags(write=False)
+    return da
@@ -0,0 +1,103 @@
+"""
+Diferencia de 'sti' entre dos runs para el mismo step (``run_b - run_a``).
+
+Ambas grillas salen del cache de grillas decodificadas (una decodificación por
+run como máximo) y se restan vectorizadamente. Antes de restar se verifica que
+las grillas estén alineadas: mismos ejes latitude/longitude (tamaño y valores);
+si no, se levanta ``GridMismatchError`` en vez de interpolar o restar celdas que
+no se corresponden.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import xarray as xr
+
+from . import sti_service
+
+# Tolerancia (grados) para considerar iguales dos valores de eje
+AXIS_ATOL = 1e-6
+
+
+class GridMismatchError(ValueError):
+    """
+    Las grillas de los dos runs no tienen los mismos ejes.
+    """
+
+
+def _grid(run: str, step: str | int) -> xr.DataArray:
+    return sti_service.get_sti(run, step).sti.squeeze(drop=True).transpose("latitude", "longitude")
+
+
+def check_alignment(a: xr.DataArray, b: xr.DataArray) -> None:
+    for axis in ("latitude", "longitude"):
+        va = np.asarray(a[axis].values, dtype="float64")
+        vb = np.asarray(b[axis].values, dtype="float64")
+        if va.shape != vb.shape:
+            raise GridMismatchError(f"Eje '{axis}' con distinto tamaño: {va.size} vs {vb.size}")
+        if not np.allclose(va, vb, rtol=0, atol=AXIS_ATOL):
+            worst = float(np.max(np.abs(va - vb)))
+            raise GridMismatchError(f"Eje '{axis}' desalineado entre runs (diferencia máxima {worst:g}°)")
+
+
+def diff_stats(a: np.ndarray, b: np.ndarray, diff: np.ndarray) -> Dict[str, Any]:
+    """
+    Resumen del cambio sobre las celdas válidas en ambos runs.
+    """
+    valid = np.isfinite(diff)
+    d = diff[valid].astype("float64")
+    out: Dict[str, Any] = {
+        "count": int(valid.sum()),
+        "nan_count": int(diff.size - valid.sum()),
+        "mean": None,
+        "std": None,
+        "min": None,
+        "max": None,
+        "mean_abs": None,
+        "rmse": None,
+        "mean_a": None,
+        "mean_b": None,
+        "sign_change_fraction": None,
+    }
+    if d.size == 0:
+        return out
+    va = a[valid].astype("float64")
+    vb = b[valid].astype("float64")
+    out.update({
+        "mean": float(d.mean()),
+        "std": float(d.std()),
+        "min": float(d.min()),
+        "max": float(d.max()),
+        "mean_abs": float(np.abs(d).mean()),
+        "rmse": float(np.sqrt(np.mean(d * d))),
+        "mean_a": float(va.mean()),
+        "mean_b": float(vb.mean()),
+        # Celdas donde la anomalía cambia de signo entre runs
+        "sign_change_fraction": float(np.mean(np.sign(va) * np.sign(vb) < 0)),
+    })
+    return out
+
+
+def diff_runs(
+    run_a: str,
+    run_b: str,
+    step: str | int,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+) -> Tuple[xr.DataArray, Dict[str, Any]]:
+    """
+    (``run_b - run_a`` como DataArray, estadísticas). ``bbox`` = (lat_min, lat_max, lon_min, lon_max).
+    Levanta GridMismatchError si las grillas no están alineadas.
+    """
+    a = _grid(run_a, step)
+    b = _grid(run_b, step)
+    check_alignment(a, b)
+    if bbox is not None:
+        a = sti_service.select_bbox(a, *bbox)
+        b = sti_service.select_bbox(b, *bbox)
+
+    va = np.asarray(a.values)
+    vb = np.asarray(b.values)
+    diff = vb.astype("float64") - va
+    out = xr.DataArray(diff, dims=("latitude", "longitude"), coords={"latitude": a["latitude"], "longitude": a["longitude"]}, name="sti")
+    return out, diff_stats(va, vb, diff)
@@ -0,0 +1,273 @@
+"""
+Cache en disco de los NetCDF descargados, con presupuesto en bytes y eviction LRU.
+
+Los archivos viven en un directorio propio (STI_DISK_CACHE_DIR, default
+``<tmp>/sti_nc``). El "tiempo de acceso" es el mtime: cada hit hace ``os.utime``,
+así no dependemos de que el filesystem actualice atime (noatime/relatime).
+
+La eviction es segura entre procesos: un archivo sólo se borra tomando su
+``FileLock`` sin esperar (si otro proceso lo está descargando/validando se salta)
+y nunca se borran archivos usados hace menos de ``min_age`` segundos, que cubre
+la ventana entre que ``ensure_local_file`` devuelve la ruta y el lector la abre.
+
+Cada archivo validado lleva un marcador ``<archivo>.ok`` (JSON con tamaño, ETag S3
+y la firma HDF5 verificada). Un hit con marcador vigente no vuelve a abrir el
+archivo con HDF5; sólo se re-valida si el marcador falta o no coincide.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from filelock import FileLock, Timeout
+
+logger = logging.getLogger(__name__)
+
+# .tmp más viejos que esto se consideran descargas abandonadas (proceso muerto)
+STALE_TMP_SECONDS = 3600
+# Archivos usados hace menos de esto no se evictan
+MIN_AGE_SECONDS = 60
+
+MARKER_SUFFIX = ".ok"
+MARKER_VERSION = 1
+
+# Firma del superblock HDF5; puede estar en 0, 512, 1024, 2048, ... (user block)
+HDF5_SIGNATURE = b"\x89HDF\r\n\x1a\n"
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def has_hdf5_signature(path: str) -> bool:
+    """
+    True si ``path`` tiene la firma del superblock HDF5 en alguno de los offsets válidos.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        offset = 0
+        while offset + len(HDF5_SIGNATURE) <= size:
+            f.seek(offset)
+            if f.read(len(HDF5_SIGNATURE)) == HDF5_SIGNATURE:
+                return True
+            offset = 512 if offset == 0 else offset * 2
+    return False
+
+
+def write_marker(path: str, etag: Optional[str]) -> None:
+    """
+    Registra que ``path`` fue validado (escritura atómica).
+    """
+    marker = {
+        "version": MARKER_VERSION,
+        "size": os.path.getsize(path),
+        "etag": etag,
+        "hdf5_signature": has_hdf5_signature(path),
+        "validated_at": time.time(),
+    }
+    tmp_path = f"{path}{MARKER_SUFFIX}.{uuid.uuid4()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(marker, f)
+    os.replace(tmp_path, path + MARKER_SUFFIX)
+
+
+def read_marker(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path + MARKER_SUFFIX) as f:
+            marker = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return marker if isinstance(marker, dict) and marker.get("version") == MARKER_VERSION else None
+
+
+def marker_status(path: str, etag: Optional[str]) -> str:
+    """
+    Estado del marcador de ``path`` frente al ETag actual del objeto:
+
+    - "valid":   tamaño y ETag coinciden; se puede usar sin abrirlo.
+    - "stale":   el objeto en S3 cambió (ETag distinto); hay que re-descargar.
+    - "missing": sin marcador (o ilegible, o tamaño distinto); hay que re-validar.
+    """
+    marker = read_marker(path)
+    if marker is None or not marker.get("hdf5_signature"):
+        return "missing"
+    try:
+        if marker.get("size") != os.path.getsize(path):
+            return "missing"
+    except OSError:
+        return "missing"
+    if etag is not None and marker.get("etag") is not None and marker["etag"] != etag:
+        return "stale"
+    if etag is None or marker.get("etag") is None:
+        # Sin ETag (S3 inaccesible o marcador viejo) no podemos confiar del todo
+        return "missing"
+    return "valid"
+
+
+class DiskCache:
+    """
+    Directorio de archivos ``*.nc`` con presupuesto total en bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, min_age: float = MIN_AGE_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def file_lock(self, path: str, timeout: float = 60) -> FileLock:
+        return FileLock(path + ".lock", timeout=timeout)
+
+    # ------------------------------------------------------------------
+    # Contadores
+    # ------------------------------------------------------------------
+    def record_hit(self, path: str) -> None:
+        """
+        Marca ``path`` como recién usado (mtime) y cuenta el hit.
+        """
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """
+        (mtime, tamaño, ruta) de cada ``*.nc`` del directorio, el menos reciente primero.
+        """
+        out = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return out
+        for name in names:
+            if not name.endswith(".nc"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, path))
+        out.sort()
+        return out
+
+    def usage(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep: Iterable[str] = ()) -> int:
+        """
+        Borra archivos LRU hasta quedar bajo ``max_bytes``. Devuelve los bytes liberados.
+        """
+        keep = set(keep)
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        now = time.time()
+
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path in keep or now - mtime < self.min_age:
+                continue
+            try:
+                with self.file_lock(path, timeout=0):
+                    self._remove_entry(path)
+                    # Como en cleanup_orphans: el .lock se borra mientras se lo tiene tomado
+                    _remove_quietly(path + ".lock")
+            except Timeout:
+                continue  # en uso por otro proceso/hilo
+            except OSError as exc:
+                logger.warning(f"No se pudo evictar {path}: {exc}")
+                continue
+            total -= size
+            freed += size
+            with self._lock:
+                self.evictions += 1
+                self.evicted_bytes += size
+            logger.info(f"Disk cache: evictado {path} ({size} bytes)")
+
+        if total > self.max_bytes:
+            logger.warning(f"Disk cache sobre el presupuesto ({total} > {self.max_bytes} bytes); archivos en uso")
+        return freed
+
+    def _remove_entry(self, path: str) -> None:
+        os.remove(path)
+        _remove_quietly(path + MARKER_SUFFIX)
+
+    # ------------------------------------------------------------------
+    # Limpieza al arranque
+    # ------------------------------------------------------------------
+    def cleanup_orphans(self, stale_seconds: float = STALE_TMP_SECONDS) -> Dict[str, int]:
+        """
+        Borra descargas ``.tmp`` abandonadas y ``.lock``/``.ok`` sin archivo asociado.
+        """
+        removed = {"tmp": 0, "lock": 0, "marker": 0}
+        now = time.time()
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return removed
+
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith(".tmp"):
+                    if now - os.path.getmtime(path) >= stale_seconds:
+                        os.remove(path)
+                        removed["tmp"] += 1
+                elif name.endswith(".lock"):
+                    target = path[: -len(".lock")]
+                    if os.path.exists(target):
+                        continue
+                    # Sólo si nadie lo tiene tomado
+                    with FileLock(path, timeout=0):
+                        os.remove(path)
+                    removed["lock"] += 1
+                elif name.endswith(MARKER_SUFFIX):
+                    if not os.path.exists(path[: -len(MARKER_SUFFIX)]):
+                        os.remove(path)
+                        removed["marker"] += 1
+            except (OSError, Timeout):
+                continue
+
+        if any(removed.values()):
+            logger.info(f"Disk cache: limpieza de huérfanos en {self.directory}: {removed}")
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        entries = self.entries()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "evicted_bytes": self.evicted_bytes,
+                "files": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+            }
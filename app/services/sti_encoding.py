@@ -0,0 +1,316 @@
+"""
+Codificadores binarios para grillas STI (respuestas de /sti/{run}/{step}/subset).
+
+Formatos:
+- ``f32``: ``application/octet-stream``. Header de 16 bytes (little-endian)
+  ``b"STI1" | uint32 version | uint32 ny | uint32 nx`` seguido de
+  ``latitude[ny]``, ``longitude[nx]`` y ``sti[ny*nx]`` (row-major), todo float32 LE.
+  Todos los offsets son múltiplos de 4, por lo que el frontend puede envolver
+  cada bloque con un ``Float32Array`` sin copiar.
+- ``arrow``: Arrow IPC stream con una columna float32 ``sti`` (row-major) y los ejes
+  y el shape en la metadata del schema. Requiere ``pyarrow`` (opcional).
+- ``npy``: la grilla ``(ny, nx)`` float32 LE en formato ``.npy``.
+
+Además ``iter_grid_json`` genera el JSON compacto por ejes (``layout=grid``):
+ejes 1-D una sola vez y ``sti`` como matriz row-major con NaN -> null.
+
+Cuantización int16 (``encoding=int16``): ``round((sti - add_offset) / scale_factor)``
+con ``scale_factor=1e-3``, ``add_offset=0`` y NaN -> ``-32768`` (``_FillValue``), el
+mismo empaquetado CF que usan los productos de ingesta. En JSON los valores van
+como enteros y el header lleva ``scale_factor``/``add_offset``/``fill_value``; en
+``f32`` el payload pasa a la versión 2 (header de 24 bytes con scale/offset
+float32, ejes float32 y la grilla int16); ``npy`` y ``arrow`` transportan int16.
+
+Streaming (``StreamingResponse``, memoria acotada a una fila de la grilla):
+- ``iter_grid_json`` / ``iter_flat_json``: JSON por chunks (layout grid / flat).
+- ``iter_ndjson``: ``application/x-ndjson``; una línea de header con los ejes y
+  luego una línea ``{"latitude": lat, "sti": [...]}`` por fila.
+"""
+from __future__ import annotations
+
+import io
+import json
+import struct
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+JSON = "application/json"
+F32 = "application/octet-stream"
+ARROW = "application/vnd.apache.arrow.stream"
+NPY = "application/x-npy"
+NDJSON = "application/x-ndjson"
+
+FORMATS: Dict[str, str] = {
+    "json": JSON,
+    "f32": F32,
+    "arrow": ARROW,
+    "npy": NPY,
+    "ndjson": NDJSON,
+}
+
+# Formatos de texto (se sirven en streaming); el resto son binarios
+TEXT_FORMATS = (JSON, NDJSON)
+
+F32_MAGIC = b"STI1"
+F32_VERSION = 1
+F32_HEADER = struct.Struct("<4sIII")
+
+I16_VERSION = 2
+I16_HEADER = struct.Struct("<4sIIIff")
+
+# Empaquetado int16 de anomalías estandarizadas: resolución 1e-3, rango ±32.767
+INT16_SCALE = 1e-3
+INT16_OFFSET = 0.0
+INT16_FILL = -32768
+ENCODINGS = ("float", "int16")
+
+
+def _parse_accept(accept: str) -> list[tuple[float, str]]:
+    ranked = []
+    for i, part in enumerate(accept.split(",")):
+        fields = [f.strip() for f in part.split(";")]
+        media = fields[0].lower()
+        if not media:
+            continue
+        q = 1.0
+        for f in fields[1:]:
+            if f.startswith("q="):
+                try:
+                    q = float(f[2:])
+                except ValueError:
+                    q = 0.0
+        # Orden estable: mayor q primero, luego el orden del header
+        ranked.append((-q, i, media))
+    return [(-q, media) for q, _, media in sorted(ranked)]
+
+
+def negotiate(accept: Optional[str], fmt: Optional[str] = None) -> str:
+    """
+    Elige el media type de la respuesta.
+
+    ``fmt`` (query param ``format``) tiene prioridad sobre ``Accept``. Si ningún
+    media type aceptado está soportado se responde JSON (default).
+    """
+    if fmt:
+        return FORMATS[fmt]
+    if not accept:
+        return JSON
+    supported = set(FORMATS.values())
+    for q, media in _parse_accept(accept):
+        if q <= 0:
+            continue
+        if media in supported:
+            return media
+        if media in ("*/*", "application/*"):
+            return JSON
+    return JSON
+
+
+def _f32(values: Any) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype="<f4")
+
+
+def encode_f32_grid(lats: Any, lons: Any, values: Any) -> bytes:
+    lat = _f32(lats).ravel()
+    lon = _f32(lons).ravel()
+    grid = _f32(values).reshape(lat.size, lon.size)
+    header = F32_HEADER.pack(F32_MAGIC, F32_VERSION, lat.size, lon.size)
+    return b"".join((header, lat.tobytes(), lon.tobytes(), grid.tobytes()))
+
+
+def decode_f32_grid(payload: bytes) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    magic, version, ny, nx = F32_HEADER.unpack_from(payload, 0)
+    if magic != F32_MAGIC or version != F32_VERSION:
+        raise ValueError(f"Payload f32 inválido (magic={magic!r}, version={version})")
+    off = F32_HEADER.size
+    lat = np.frombuffer(payload, dtype="<f4", count=ny, offset=off)
+    off += 4 * ny
+    lon = np.frombuffer(payload, dtype="<f4", count=nx, offset=off)
+    off += 4 * nx
+    grid = np.frombuffer(payload, dtype="<f4", count=ny * nx, offset=off).reshape(ny, nx)
+    return lat, lon, grid
+
+
+def int16_attrs() -> Dict[str, Any]:
+    """
+    Parámetros del empaquetado int16 (para headers de respuesta).
+    """
+    return {"scale_factor": INT16_SCALE, "add_offset": INT16_OFFSET, "fill_value": INT16_FILL}
+
+
+def int16_cf_encoding() -> Dict[str, Any]:
+    """
+    ``encoding`` CF de xarray (``to_netcdf``/``to_zarr``) para guardar 'sti' empaquetado en int16.
+    """
+    return {
+        "dtype": "int16",
+        "scale_factor": np.float32(INT16_SCALE),
+        "add_offset": np.float32(INT16_OFFSET),
+        "_FillValue": np.int16(INT16_FILL),
+    }
+
+
+def quantize_int16(values: Any) -> np.ndarray:
+    """
+    float -> int16 empaquetado (NaN/inf -> INT16_FILL; fuera de rango se satura a ±32767).
+    """
+    v = np.asarray(values, dtype="float64")
+    q = np.rint((v - INT16_OFFSET) / INT16_SCALE)
+    valid = np.isfinite(q)
+    out = np.full(v.shape, INT16_FILL, dtype="<i2")
+    out[valid] = np.clip(q[valid], -32767, 32767)
+    return out
+
+
+def dequantize_int16(packed: Any) -> np.ndarray:
+    """
+    int16 empaquetado -> float32 (INT16_FILL -> NaN).
+    """
+    q = np.asarray(packed)
+    out = q.astype(np.float32) * np.float32(INT16_SCALE) + np.float32(INT16_OFFSET)
+    out[q == INT16_FILL] = np.nan
+    return out
+
+
+def encode_i16_grid(lats: Any, lons: Any, values: Any) -> bytes:
+    """
+    Como ``encode_f32_grid`` pero con la grilla empaquetada en int16 (versión 2 del payload).
+    ``values`` puede venir en float o ya empaquetado.
+    """
+    lat = _f32(lats).ravel()
+    lon = _f32(lons).ravel()
+    arr = np.asarray(values)
+    packed = np.ascontiguousarray(arr, dtype="<i2") if arr.dtype == np.int16 else quantize_int16(arr)
+    grid = packed.reshape(lat.size, lon.size)
+    header = I16_HEADER.pack(F32_MAGIC, I16_VERSION, lat.size, lon.size, INT16_SCALE, INT16_OFFSET)
+    return b"".join((header, lat.tobytes(), lon.tobytes(), grid.tobytes()))
+
+
+def decode_i16_grid(payload: bytes) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decodifica un payload versión 2; la grilla vuelve como float32 con NaN.
+    """
+    magic, version, ny, nx, scale, offset = I16_HEADER.unpack_from(payload, 0)
+    if magic != F32_MAGIC or version != I16_VERSION:
+        raise ValueError(f"Payload int16 inválido (magic={magic!r}, version={version})")
+    off = I16_HEADER.size
+    lat = np.frombuffer(payload, dtype="<f4", count=ny, offset=off)
+    off += 4 * ny
+    lon = np.frombuffer(payload, dtype="<f4", count=nx, offset=off)
+    off += 4 * nx
+    packed = np.frombuffer(payload, dtype="<i2", count=ny * nx, offset=off).reshape(ny, nx)
+    grid = packed.astype(np.float32) * np.float32(scale) + np.float32(offset)
+    grid[packed == INT16_FILL] = np.nan
+    return lat, lon, grid
+
+
+def encode_npy(values: Any) -> bytes:
+    """
+    ``.npy`` float32, o int16 si ``values`` ya viene empaquetado.
+    """
+    arr = np.asarray(values)
+    arr = np.ascontiguousarray(arr, dtype="<i2") if arr.dtype == np.int16 else _f32(arr)
+    buf = io.BytesIO()
+    np.lib.format.write_array(buf, arr, allow_pickle=False)
+    return buf.getvalue()
+
+
+def encode_arrow(lats: Any, lons: Any, values: Any, metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    Arrow IPC stream. Levanta ImportError si pyarrow no está instalado.
+    """
+    import pyarrow as pa
+
+    lat = _f32(lats).ravel()
+    lon = _f32(lons).ravel()
+    packed = np.asarray(values).dtype == np.int16
+    grid = (np.asarray(values, dtype="<i2") if packed else _f32(values)).reshape(lat.size, lon.size)
+
+    meta = {
+        "shape": json.dumps([int(lat.size), int(lon.size)]),
+        "latitude": json.dumps(lat.tolist()),
+        "longitude": json.dumps(lon.tolist()),
+    }
+    for k, v in (metadata or {}).items():
+        meta[k] = str(v)
+
+    # NaN se mantiene como NaN (sin bitmap de validez) para que el cliente lea el buffer tal cual
+    if packed:
+        meta.update({k: str(v) for k, v in int16_attrs().items()})
+    kind = pa.int16() if packed else pa.float32()
+    col = pa.array(grid.ravel(), type=kind)
+    schema = pa.schema([pa.field("sti", kind)], metadata=meta)
+    batch = pa.record_batch([col], schema=schema)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def _json_floats(values: Any) -> str:
+    arr = np.asarray(values)
+    if arr.dtype.kind in "iu":
+        # Grilla empaquetada (int16): enteros tal cual, el fill value ya marca los NaN
+        return json.dumps(arr.tolist())
+    # json.dumps escribe NaN como el token NaN (no es JSON válido): lo pasamos a null
+    return json.dumps(arr.astype(float).tolist()).replace("NaN", "null")
+
+
+def iter_grid_json(header: Dict[str, Any], lats: Any, lons: Any, values: Any) -> Iterator[bytes]:
+    """
+    Serializa ``{**header, "latitude": [...], "longitude": [...], "sti": [[...], ...]}``
+    fila a fila, sin armar listas Python de toda la grilla.
+    """
+    grid = np.asarray(values).reshape(np.size(lats), np.size(lons))
+    head = json.dumps(header)[:-1]
+    sep = ", " if header else ""
+    yield (
+        f'{head}{sep}"latitude": {_json_floats(lats)}, '
+        f'"longitude": {_json_floats(lons)}, "sti": ['
+    ).encode()
+    for i, row in enumerate(grid):
+        yield ((", " if i else "") + _json_floats(row)).encode()
+    yield b"]}"
+
+
+def iter_flat_json(header: Dict[str, Any], lats: Any, lons: Any, values: Any) -> Iterator[bytes]:
+    """
+    Serializa el layout plano ``{**header, "latitudes": [...], "longitudes": [...], "sti": [...]}``
+    (tripletas por celda, row-major) fila a fila.
+    """
+    lat = np.asarray(lats, dtype=float).ravel()
+    lon = np.asarray(lons, dtype=float).ravel()
+    grid = np.asarray(values).reshape(lat.size, lon.size)
+    head = json.dumps(header)[:-1]
+    sep = ", " if header else ""
+
+    def array(rows: Iterator[Any]) -> Iterator[bytes]:
+        first = True
+        for row in rows:
+            if row.size:
+                yield ((", " if not first else "") + _json_floats(row)[1:-1]).encode()
+                first = False
+
+    yield f'{head}{sep}"latitudes": ['.encode()
+    yield from array(np.full(lon.size, v) for v in lat)
+    yield b'], "longitudes": ['
+    yield from array(lon for _ in lat)
+    yield b'], "sti": ['
+    yield from array(iter(grid))
+    yield b"]}"
+
+
+def iter_ndjson(header: Dict[str, Any], lats: Any, lons: Any, values: Any) -> Iterator[bytes]:
+    """
+    NDJSON: ``{**header, "longitude": [...], "rows": ny}`` y luego una línea por fila
+    ``{"latitude": lat, "sti": [...]}`` (NaN -> null).
+    """
+    lat = np.asarray(lats, dtype=float).ravel()
+    grid = np.asarray(values).reshape(lat.size, np.size(lons))
+    head = json.dumps(header)[:-1]
+    sep = ", " if header else ""
+    yield f'{head}{sep}"longitude": {_json_floats(lons)}, "rows": {lat.size}}}\n'.encode()
+    for la, row in zip(lat.tolist(), grid):
+        yield f'{{"latitude": {json.dumps(la)}, "sti": {_json_floats(row)}}}\n'.encode()
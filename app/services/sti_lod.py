@@ -0,0 +1,184 @@
+"""
+Niveles de detalle (LOD) de 'sti' para bboxes grandes.
+
+Por run/step se arma una vez una pirámide de overviews 2x, 4x y 8x con promedio
+por bloques que ignora NaN (cada celda gruesa es el promedio de las celdas finas
+válidas; NaN sólo si el bloque entero es NaN). Los niveles se construyen en
+cascada propagando sumas y conteos, así el 8x es exactamente el promedio de los
+64 pixeles originales y no un promedio de promedios.
+
+``subset_lod`` elige el nivel más fino cuyo recorte no supera ``max_cells``:
+una vista de todo Chile cuesta lo mismo que la de una ciudad.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+import xarray as xr
+
+from ..config import settings
+from . import sti_service
+from .sti_cache import DecodedCache, freeze
+
+logger = logging.getLogger(__name__)
+
+LEVELS = (2, 4, 8)
+
+
+@dataclass(frozen=True)
+class Pyramid:
+    """
+    Overviews de un run/step, keyed por factor de reducción.
+    """
+    run: str
+    step: str
+    etag: str
+    levels: Dict[int, xr.DataArray]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(int(da.nbytes) + int(da["latitude"].nbytes) + int(da["longitude"].nbytes) for da in self.levels.values())
+
+
+# Pirámides por (run, step, etag)
+LOD_CACHE = DecodedCache(settings.STI_LOD_CACHE_MAX_BYTES)
+
+
+def _pad_to(values: np.ndarray, factor: int, fill: float) -> np.ndarray:
+    ny, nx = values.shape
+    py, px = (-ny) % factor, (-nx) % factor
+    if not py and not px:
+        return values
+    return np.pad(values, ((0, py), (0, px)), constant_values=fill)
+
+
+def _block_sum(values: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Suma por bloques ``factor x factor`` (el borde incompleto se rellena con 0).
+    """
+    v = _pad_to(values, factor, 0)
+    ny, nx = v.shape
+    return v.reshape(ny // factor, factor, nx // factor, factor).sum(axis=(1, 3))
+
+
+def _coarse_axis(axis: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Centro de cada bloque: promedio de las coordenadas de las celdas del bloque.
+    """
+    n = axis.size
+    pad = (-n) % factor
+    sums = np.add.reduceat(axis.astype("float64"), np.arange(0, n, factor))
+    counts = np.full(sums.size, factor, dtype="float64")
+    if pad:
+        counts[-1] = factor - pad
+    return sums / counts
+
+
+def block_mean(values: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Promedio por bloques ignorando NaN (NaN si el bloque no tiene celdas válidas).
+    """
+    valid = np.isfinite(values)
+    sums = _block_sum(np.where(valid, values, 0.0).astype("float64"), factor)
+    counts = _block_sum(valid.astype("int64"), factor)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def build_pyramid(run: str, step: str, etag: str, sti: xr.DataArray) -> Pyramid:
+    grid = sti.squeeze(drop=True).transpose("latitude", "longitude")
+    lat = np.asarray(grid["latitude"].values)
+    lon = np.asarray(grid["longitude"].values)
+    values = np.asarray(grid.values, dtype="float64")
+
+    valid = np.isfinite(values)
+    sums = np.where(valid, values, 0.0)
+    counts = valid.astype("int64")
+
+    levels: Dict[int, xr.DataArray] = {}
+    prev = 1
+    for factor in LEVELS:
+        step_factor = factor // prev
+        sums = _block_sum(sums, step_factor)
+        counts = _block_sum(counts, step_factor)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(counts > 0, sums / counts, np.nan).astype(np.float32)
+        levels[factor] = freeze(xr.DataArray(
+            mean,
+            dims=("latitude", "longitude"),
+            coords={"latitude": _coarse_axis(lat, factor), "longitude": _coarse_axis(lon, factor)},
+            name="sti",
+        ))
+        prev = factor
+
+    logger.info(f"Pirámide LOD run={run} step={step}: " + ", ".join(f"{f}x={levels[f].shape}" for f in LEVELS))
+    return Pyramid(run=run, step=step, etag=etag, levels=levels)
+
+
+def get_pyramid(run: str, step: str | int) -> Pyramid:
+    decoded = sti_service.get_sti(run, step)
+    key = (decoded.run, decoded.step, decoded.etag)
+    return LOD_CACHE.get_or_load(key, lambda: build_pyramid(decoded.run, decoded.step, decoded.etag, decoded.sti))
+
+
+def _index_window(axis: np.ndarray, lo: float, hi: float) -> slice:
+    """
+    Índices de las celdas del eje cuyo centro cae en [lo, hi] (lo que recorta ``select_bbox``).
+    """
+    idx = np.nonzero((axis >= lo) & (axis <= hi))[0]
+    return slice(int(idx[0]), int(idx[-1]) + 1) if idx.size else slice(0, 0)
+
+
+def block_window(window: slice, factor: int) -> slice:
+    """
+    Bloques de ``factor`` celdas que contienen alguna celda de ``window``.
+    """
+    if window.stop <= window.start:
+        return slice(0, 0)
+    return slice(window.start // factor, (window.stop - 1) // factor + 1)
+
+
+def choose_factor(rows: slice, cols: slice, max_cells: int) -> int:
+    """
+    Factor más chico (1, 2, 4, 8) cuyos bloques que cubren el recorte ``rows`` x ``cols``
+    no superan ``max_cells``; si ninguno alcanza, el mayor.
+    """
+    for factor in (1,) + LEVELS:
+        by, bx = block_window(rows, factor), block_window(cols, factor)
+        if (by.stop - by.start) * (bx.stop - bx.start) <= max_cells:
+            return factor
+    return LEVELS[-1]
+
+
+def subset_lod(
+    run: str,
+    step: str | int,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    max_cells: int,
+) -> xr.DataArray:
+    """
+    Recorte con a lo sumo ~``max_cells`` celdas. ``attrs["lod_factor"]`` indica el nivel usado.
+
+    En los niveles gruesos se toman los bloques que contienen alguna celda fina del
+    recorte (no los centros de bloque dentro del bbox): un bbox chico nunca queda vacío.
+    """
+    sti = sti_service.get_sti(run, step).sti
+    grid = sti.squeeze(drop=True)
+    rows = _index_window(np.asarray(grid["latitude"].values), lat_min, lat_max)
+    cols = _index_window(np.asarray(grid["longitude"].values), lon_min, lon_max)
+    factor = choose_factor(rows, cols, max_cells)
+
+    if factor == 1:
+        sub = sti_service.select_bbox(sti, lat_min, lat_max, lon_min, lon_max)
+    else:
+        coarse = get_pyramid(run, step).levels[factor]
+        sub = coarse.isel(latitude=block_window(rows, factor), longitude=block_window(cols, factor))
+    sub = sub.copy(deep=False)
+    sub.attrs["lod_factor"] = factor
+    return sub
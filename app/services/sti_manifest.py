@@ -0,0 +1,271 @@
+"""
+Manifest de runs/steps publicado en ``indices/sti/manifest.json``.
+
+Lo mantiene el publicador (``scripts/publish_sti_manifest.py``) y reemplaza el
+listado recursivo de prefijos en S3::
+
+    {
+      "version": 1,
+      "generated_at": "2025-01-01T06:10:00+00:00",
+      "runs": {
+        "2025010100": {
+          "published_at": "...",
+          "steps": {
+            "000": {"key": "...", "size": 123, "etag": "...", "last_modified": "...",
+                    "stats": {"min": ..., "max": ..., "mean": ..., "std": ..., "count": ..., "nan_count": ...}}
+          }
+        }
+      }
+    }
+
+Escritura: un PUT es atómico para los lectores; entre publicadores concurrentes se
+usa escritura condicional (If-Match / If-None-Match) con reintentos.
+
+Lectura (``MANIFEST``): stale-while-revalidate. Sólo la primera lectura espera el
+GET; después se sirve la copia en memoria y, pasado STI_MANIFEST_TTL_SECONDS, se
+revalida en un hilo de fondo (GET condicional, 304 si no cambió). Sin manifest,
+``list_runs``/``list_steps`` vuelven al listado de S3.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..config import settings
+from . import sti_service
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+MANIFEST_KEY = "indices/sti/manifest.json"
+MAX_WRITE_ATTEMPTS = 5
+
+_NC_KEY_RE = re.compile(r"run=(\d{10})/step=(\d{3})/[^/]+\.nc$")
+_STATS_FIELDS = ("count", "nan_count", "min", "max", "mean", "std")
+
+
+def _error_code(exc: Exception) -> Optional[str]:
+    return getattr(exc, "response", {}).get("Error", {}).get("Code")
+
+
+def _isoformat(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).isoformat()
+    return str(value)
+
+
+# ----------------------------------------------------------------------
+# Publicación
+# ----------------------------------------------------------------------
+def _step_stats(run: str, step: str, etag: str) -> Optional[Dict[str, Any]]:
+    from .sti_stats import read_stats
+
+    stats = read_stats(run, step)
+    if not stats or stats.get("etag") != etag:
+        return None
+    return {k: stats["sti_stats"].get(k) for k in _STATS_FIELDS}
+
+
+def scan_runs(runs: Optional[Iterable[str]] = None, with_stats: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Entradas del manifest listando S3 (todos los runs, o sólo ``runs``).
+    """
+    s3 = sti_service.s3_client
+    prefixes = [f"{sti_service.BASE_PREFIX}run={r}/" for r in runs] if runs else [sti_service.BASE_PREFIX]
+    out: Dict[str, Dict[str, Any]] = {}
+
+    paginator = s3.get_paginator("list_objects_v2")
+    for prefix in prefixes:
+        for page in paginator.paginate(Bucket=sti_service.BUCKET, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                m = _NC_KEY_RE.search(obj["Key"])
+                if not m:
+                    continue
+                run, step = m.groups()
+                etag = str(obj["ETag"]).strip('"')
+                entry = {
+                    "key": obj["Key"],
+                    "size": int(obj["Size"]),
+                    "etag": etag,
+                    "last_modified": _isoformat(obj["LastModified"]),
+                    "stats": _step_stats(run, step, etag) if with_stats else None,
+                }
+                out.setdefault(run, {"steps": {}})["steps"][step] = entry
+
+    for info in out.values():
+        info["steps"] = dict(sorted(info["steps"].items()))
+        info["published_at"] = max(s["last_modified"] for s in info["steps"].values())
+    return out
+
+
+def read_manifest(if_none_match: Optional[str] = None) -> tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    GET del manifest. Devuelve (manifest, etag); (None, etag) en un 304 y (None, None) si no existe.
+    """
+    kwargs = {"IfNoneMatch": if_none_match} if if_none_match else {}
+    try:
+        resp = sti_service.s3_client.get_object(Bucket=sti_service.BUCKET, Key=MANIFEST_KEY, **kwargs)
+    except Exception as exc:
+        code = _error_code(exc)
+        if code in ("304", "NotModified"):
+            return None, if_none_match
+        if code in ("404", "NoSuchKey", "NotFound"):
+            return None, None
+        raise
+    manifest = json.loads(resp["Body"].read())
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Manifest con versión no soportada: {manifest.get('version') if isinstance(manifest, dict) else manifest!r}")
+    return manifest, str(resp["ETag"])
+
+
+def publish_manifest(runs: Optional[Iterable[str]] = None, with_stats: bool = True) -> Dict[str, Any]:
+    """
+    Reescribe el manifest. Sin ``runs`` lo reconstruye completo; con ``runs`` sólo
+    re-lista esos runs y los mezcla con el manifest actual (runs sin steps se quitan).
+    Ambos escriben condicionado al ETag leído y reintentan si otro publicador ganó;
+    la reconstrucción completa vuelve a listar en cada intento.
+    """
+    runs = list(runs) if runs else None
+    scanned = None if runs is None else scan_runs(runs, with_stats=with_stats)
+
+    for _ in range(MAX_WRITE_ATTEMPTS):
+        current, etag = read_manifest()
+        if runs is None:
+            # ETag leído antes del listado: un publish que entre entre ambos hace fallar el PUT
+            merged = scan_runs(None, with_stats=with_stats)
+        else:
+            merged = dict(current["runs"]) if current else {}
+            for run in runs:
+                merged.pop(run, None)
+            merged.update(scanned)
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "runs": dict(sorted(merged.items())),
+        }
+        body = json.dumps(manifest, separators=(",", ":")).encode("utf-8")
+        condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+        try:
+            sti_service.s3_client.put_object(
+                Bucket=sti_service.BUCKET,
+                Key=MANIFEST_KEY,
+                Body=body,
+                ContentType="application/json",
+                CacheControl="no-cache",
+                **condition,
+            )
+        except Exception as exc:
+            if _error_code(exc) in ("PreconditionFailed", "ConditionalRequestConflict", "412"):
+                logger.info("Manifest modificado por otro publicador; reintentando")
+                continue
+            raise
+        return manifest
+
+    raise RuntimeError(f"No se pudo publicar {MANIFEST_KEY} tras {MAX_WRITE_ATTEMPTS} intentos concurrentes")
+
+
+# ----------------------------------------------------------------------
+# Lectura (stale-while-revalidate)
+# ----------------------------------------------------------------------
+class ManifestReader:
+    """
+    Copia en memoria del manifest; nunca bloquea un request salvo en la primera lectura.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._etag: Optional[str] = None
+        self._fetched_at: Optional[float] = None
+        self._lock = threading.Lock()
+        # Avisa el fin de cada lectura a quienes esperan la primera
+        self._fetched = threading.Condition(self._lock)
+        self._refreshing = False
+        self.refreshes = 0
+        self.errors = 0
+
+    def _fetch(self) -> None:
+        try:
+            manifest, etag = read_manifest(if_none_match=self._etag if self._manifest else None)
+            with self._lock:
+                if manifest is not None or etag is None:
+                    # Nuevo contenido, o el manifest ya no existe
+                    self._manifest, self._etag = manifest, etag
+                self._fetched_at = time.monotonic()
+                self.refreshes += 1
+        except Exception as exc:
+            logger.warning(f"No se pudo leer {MANIFEST_KEY}: {exc}")
+            with self._lock:
+                # Se conserva la copia anterior; se reintenta en el próximo TTL
+                self._fetched_at = time.monotonic()
+                self.errors += 1
+        finally:
+            with self._fetched:
+                self._refreshing = False
+                self._fetched.notify_all()
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            fetched_at = self._fetched_at
+            stale = fetched_at is None or time.monotonic() - fetched_at >= self.ttl
+            start_refresh = stale and not self._refreshing
+            if start_refresh:
+                self._refreshing = True
+
+        if fetched_at is None:
+            if start_refresh:
+                self._fetch()
+            else:
+                # Otro hilo hace la primera lectura: se espera a que termine
+                with self._fetched:
+                    self._fetched.wait_for(lambda: not self._refreshing)
+        elif start_refresh:
+            threading.Thread(target=self._fetch, name="sti-manifest", daemon=True).start()
+
+        with self._lock:
+            return self._manifest
+
+    def clear(self) -> None:
+        with self._lock:
+            self._manifest = None
+            self._etag = None
+            self._fetched_at = None
+
+    # Helpers ----------------------------------------------------------
+    def runs(self) -> Optional[List[str]]:
+        manifest = self.get()
+        return sorted(manifest["runs"]) if manifest else None
+
+    def steps(self, run: str) -> Optional[List[str]]:
+        manifest = self.get()
+        if not manifest or run not in manifest["runs"]:
+            return None
+        return sorted(manifest["runs"][run]["steps"])
+
+    def etag_for(self, key: str) -> Optional[str]:
+        manifest = self.get()
+        m = _NC_KEY_RE.search(key)
+        if not manifest or not m:
+            return None
+        entry = manifest["runs"].get(m.group(1), {}).get("steps", {}).get(m.group(2))
+        return entry["etag"] if entry and entry.get("key") == key else None
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "present": self._manifest is not None,
+                "etag": self._etag,
+                "generated_at": self._manifest.get("generated_at") if self._manifest else None,
+                "age_seconds": None if self._fetched_at is None else time.monotonic() - self._fetched_at,
+                "refreshes": self.refreshes,
+                "errors": self.errors,
+            }
+
+
+MANIFEST = ManifestReader(ttl=settings.STI_MANIFEST_TTL_SECONDS)
@@ -0,0 +1,130 @@
+"""
+Series de 'sti' en puntos a lo largo de todos los steps de un run.
+
+Se arma un cubo (step, latitude, longitude) por run decodificando los steps en
+paralelo (pool acotado por STI_POINT_WORKERS) y se cachea en memoria. Cada punto
+se resuelve con un lookup aritmético sobre los ejes regulares (O(1)) y la serie
+completa es un fancy-index sobre el cubo.
+"""
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from ..config import settings
+from ..lib.geo import nearest_index
+from . import sti_service
+from .sti_cache import DecodedCache
+
+logger = logging.getLogger(__name__)
+
+MAX_POINTS = 1000
+
+
+@dataclass(frozen=True)
+class PointCube:
+    """
+    Todos los steps de un run apilados en un único array float32 de sólo lectura.
+    """
+    run: str
+    steps: List[str]
+    latitude: np.ndarray
+    longitude: np.ndarray
+    values: np.ndarray  # (step, latitude, longitude)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.values.nbytes + self.latitude.nbytes + self.longitude.nbytes)
+
+
+# Cubos por run, keyed por (run, steps, etags)
+POINT_CUBE_CACHE = DecodedCache(settings.STI_POINT_CACHE_MAX_BYTES)
+
+
+def _step_grid(run: str, step: str) -> Any:
+    return sti_service.get_sti(run, step).sti.squeeze(drop=True).transpose("latitude", "longitude")
+
+
+def _build_cube(run: str, steps: Sequence[str]) -> PointCube:
+    logger.info(f"Armando cubo de puntos para run={run} ({len(steps)} steps)")
+    with ThreadPoolExecutor(max_workers=settings.STI_POINT_WORKERS, thread_name_prefix="sti-points") as pool:
+        grids = list(pool.map(lambda s: _step_grid(run, s), steps))
+
+    lat = np.asarray(grids[0]["latitude"].values)
+    lon = np.asarray(grids[0]["longitude"].values)
+    for step, g in zip(steps, grids):
+        if not (np.array_equal(g["latitude"].values, lat) and np.array_equal(g["longitude"].values, lon)):
+            raise ValueError(f"La grilla del step {step} no coincide con la del step {steps[0]} (run={run})")
+
+    values = np.stack([np.asarray(g.values, dtype=np.float32) for g in grids])
+    for arr in (values, lat, lon):
+        arr.setflags(write=False)
+    return PointCube(run=run, steps=list(steps), latitude=lat, longitude=lon, values=values)
+
+
+def run_etags(run: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    Steps del run y el ETag S3 de cada uno (HEADs en paralelo, cacheados por sti_service).
+    """
+    steps = tuple(sti_service.list_steps(run))
+    if not steps:
+        raise FileNotFoundError(f"No hay steps para run={run}")
+
+    with ThreadPoolExecutor(max_workers=settings.STI_POINT_WORKERS, thread_name_prefix="sti-etag") as pool:
+        etags = tuple(pool.map(lambda s: sti_service.step_etag(run, s), steps))
+    return steps, etags
+
+
+def load_run_cube(run: str) -> PointCube:
+    """
+    Cubo (step, lat, lon) del run desde cache; en un miss decodifica todos los steps en paralelo.
+    """
+    steps, etags = run_etags(run)
+    key = (run, steps, etags)
+    return POINT_CUBE_CACHE.get_or_load(key, lambda: _build_cube(run, steps))
+
+
+def point_series(run: str, points: Sequence[Dict[str, float]]) -> Dict[str, Any]:
+    """
+    Serie de 'sti' por step para cada punto ({"lat", "lon"}).
+    Puntos fuera de la grilla devuelven un campo 'error' en vez de 'sti'.
+    """
+    if len(points) > MAX_POINTS:
+        raise ValueError(f"Too many points requested. Max is {MAX_POINTS}")
+
+    cube = load_run_cube(run)
+    lats = np.array([p["lat"] for p in points], dtype="float64")
+    lons = np.array([p["lon"] for p in points], dtype="float64")
+    if cube.longitude.size and float(cube.longitude.max()) > 180.0:
+        lons = lons % 360.0
+    else:
+        lons = ((lons + 180.0) % 360.0) - 180.0
+
+    iy = nearest_index(cube.latitude, lats)
+    ix = nearest_index(cube.longitude, lons)
+    ok = (iy >= 0) & (ix >= 0)
+
+    # (points, steps) en un solo fancy-index
+    series = cube.values[:, np.where(ok, iy, 0), np.where(ok, ix, 0)].T
+
+    results = []
+    for k, p in enumerate(points):
+        if not ok[k]:
+            results.append({
+                "lat_requested": p["lat"], "lon_requested": p["lon"],
+                "error": "Point out of bounds (no grid cell near enough)",
+            })
+            continue
+        results.append({
+            "lat_requested": p["lat"],
+            "lon_requested": p["lon"],
+            "lat_used": float(cube.latitude[iy[k]]),
+            "lon_used": float(cube.longitude[ix[k]]),
+            "sti": [None if v != v else v for v in series[k].tolist()],  # NaN -> None
+        })
+
+    return {"run": run, "steps": cube.steps, "points": results}
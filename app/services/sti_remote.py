@@ -0,0 +1,173 @@
+"""
+Lecturas remotas de 'sti' sin I/O de red bajo ``_HDF5_LOCK``.
+
+HDF5 no es thread-safe, así que todo acceso pasa por el lock global; pero con el
+archivo abierto sobre S3 cada chunk que HDF5 lee es un GET por rango. Para no
+bloquear al resto del proceso durante esos round-trips, ``load_subset`` lee en
+tres pasos:
+
+1. bajo el lock: metadatos, selección y ``chunk_ranges`` (offsets de los chunks
+   del recorte, sacados del índice de chunks sin leer datos);
+2. sin el lock: ``PrefetchedFile.prefetch`` baja esos rangos a memoria;
+3. bajo el lock: HDF5 decodifica, y sus lecturas de datos se sirven de memoria.
+"""
+from __future__ import annotations
+
+import bisect
+import io
+import itertools
+import logging
+from typing import List, Sequence, Tuple
+
+import h5py
+import numpy as np
+import xarray as xr
+
+logger = logging.getLogger(__name__)
+
+ByteRange = Tuple[int, int]
+
+
+class PrefetchedFile(io.RawIOBase):
+    """
+    File-like sobre un archivo remoto (fsspec) que sirve de memoria los rangos
+    precargados con ``prefetch`` y delega el resto al archivo original.
+    """
+
+    def __init__(self, f):
+        super().__init__()
+        self._f = f
+        self._pos = 0
+        self._starts: List[int] = []
+        self._parts: List[bytes] = []
+
+    @property
+    def size(self) -> int:
+        return self._f.size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = self._f.size + offset
+        return self._pos
+
+    def _cached(self, start: int, n: int) -> bytes | None:
+        i = bisect.bisect_right(self._starts, start) - 1
+        if i < 0:
+            return None
+        offset = start - self._starts[i]
+        part = self._parts[i]
+        if offset + n > len(part):
+            return None
+        return part[offset:offset + n]
+
+    def readinto(self, b) -> int:
+        view = memoryview(b).cast("B")
+        n = min(len(view), max(self._f.size - self._pos, 0))
+        data = self._cached(self._pos, n)
+        if data is None:
+            self._f.seek(self._pos)
+            data = self._f.read(n)
+        view[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def prefetch(self, ranges: Sequence[ByteRange]) -> int:
+        """
+        Baja ``ranges`` (start, end) a memoria. Devuelve los bytes leídos.
+        """
+        total = 0
+        for start, end in ranges:
+            self._f.seek(start)
+            data = self._f.read(end - start)
+            i = bisect.bisect_left(self._starts, start)
+            self._starts.insert(i, start)
+            self._parts.insert(i, data)
+            total += len(data)
+        return total
+
+    def close(self) -> None:
+        self._starts, self._parts = [], []
+        self._f.close()
+        super().close()
+
+
+def merge_ranges(ranges: Sequence[ByteRange]) -> List[ByteRange]:
+    """
+    Une rangos solapados o contiguos (chunks vecinos suelen estar contiguos en el archivo).
+    """
+    merged: List[ByteRange] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def chunk_ranges(dset: h5py.Dataset, window: Sequence[slice]) -> List[ByteRange]:
+    """
+    Rangos de bytes del archivo que HDF5 leerá para ``dset[window]``.
+
+    Chunked: los chunks que intersectan la ventana (los no escritos no ocupan bytes).
+    Contiguo: el tramo entre el primer y el último elemento de la ventana.
+    Sin datos en disco propios (compact, o HDF5 sin índice de chunks): [].
+    """
+    if any(s.start >= s.stop for s in window):
+        return []
+
+    if dset.chunks is None:
+        offset = dset.id.get_offset()
+        if offset is None:
+            return []
+        first = np.ravel_multi_index([s.start for s in window], dset.shape)
+        last = np.ravel_multi_index([s.stop - 1 for s in window], dset.shape)
+        itemsize = dset.dtype.itemsize
+        return [(offset + int(first) * itemsize, offset + (int(last) + 1) * itemsize)]
+
+    grid = [range(s.start - s.start % c, s.stop, c) for s, c in zip(window, dset.chunks)]
+    ranges = []
+    try:
+        for coord in itertools.product(*grid):
+            info = dset.id.get_chunk_info_by_coord(coord)
+            if info.byte_offset is not None:
+                ranges.append((info.byte_offset, info.byte_offset + info.size))
+    except (AttributeError, RuntimeError):
+        # h5py/HDF5 sin consulta de chunks: HDF5 leerá los chunks por su cuenta
+        logger.debug("Índice de chunks no disponible; lectura remota sin prefetch")
+        return []
+    return merge_ranges(ranges)
+
+
+def positional_window(da: xr.DataArray, sub: xr.DataArray) -> List[slice]:
+    """
+    Ventana posicional (por dimensión de ``da``) que cubre el recorte ``sub`` de ``da``.
+    """
+    window = []
+    for dim, n in zip(da.dims, da.shape):
+        if dim in da.indexes and dim in sub.indexes and sub.sizes[dim]:
+            pos = da.indexes[dim].get_indexer(sub.indexes[dim])
+            window.append(slice(int(pos.min()), int(pos.max()) + 1))
+        else:
+            window.append(slice(0, n if sub.sizes.get(dim, n) else 0))
+    return window
+
+
+def window_ranges(f: PrefetchedFile, variable: str, window: Sequence[slice]) -> List[ByteRange]:
+    """
+    ``chunk_ranges`` de ``variable`` abriendo el HDF5 sobre ``f`` (llamar bajo el lock).
+    """
+    with h5py.File(f, "r") as h5:
+        return chunk_ranges(h5[variable], window)
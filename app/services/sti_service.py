@@ -6,14 +6,17 @@ import logging
 import threading
 import tempfile
 import uuid
-from typing import List, Set, Any
+from typing import Callable, List, Set, Any
 
 import xarray as xr
 from cachetools import cached, TTLCache
-from filelock import FileLock
+from cachetools.keys import hashkey
 
 from ..config import settings
 from ..integrations.s3 import get_s3_client, get_s3_fs
+from . import decode_pool, sti_lod, sti_manifest, sti_remote, sti_zarr
+from .sti_cache import DecodedCache, DecodedStep, freeze
+from .sti_disk_cache import MARKER_SUFFIX, DiskCache, has_hdf5_signature, marker_status, write_marker
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +29,18 @@ REGION_NAME = "chile"
 # Metadata Cache (TTL 5 mins)
 METADATA_CACHE = TTLCache(maxsize=128, ttl=300)
 
+# ETags de objetos S3 (TTL 5 mins)
+ETAG_CACHE = TTLCache(maxsize=1024, ttl=300)
+
+# Grillas 'sti' decodificadas, keyed por (run, step, etag)
+STI_CACHE = DecodedCache(settings.STI_CACHE_MAX_BYTES)
+
+# NetCDF descargados (LRU en disco, presupuesto en bytes)
+DISK_CACHE = DiskCache(
+    settings.STI_DISK_CACHE_DIR or os.path.join(tempfile.gettempdir(), "sti_nc"),
+    settings.STI_DISK_CACHE_MAX_BYTES,
+)
+
 # Global lock para HDF5 (Library-level safety)
 _HDF5_LOCK = threading.Lock()
 
@@ -53,11 +68,23 @@ def _object_exists(key: str) -> bool:
         return False
 
 
-@cached(METADATA_CACHE)
-def list_runs() -> List[str]:
+def list_runs(use_cache: bool = True) -> List[str]:
     """
-    Lista los 'run=YYYYMMDDHH' leyendo las sub-carpetas (CommonPrefixes).
+    Lista los 'run=YYYYMMDDHH' desde el manifest; sin manifest, leyendo las
+    sub-carpetas (CommonPrefixes).
+
+    El manifest ya se revalida solo (stale-while-revalidate): sólo el listado de S3
+    pasa por METADATA_CACHE (salvo ``use_cache=False``), así un run publicado aparece
+    en la próxima revalidación del manifest.
     """
+    runs = sti_manifest.MANIFEST.runs()
+    if runs is not None:
+        return runs
+    return _list_runs_s3() if use_cache else _list_runs_s3.__wrapped__()
+
+
+@cached(METADATA_CACHE, key=lambda: hashkey("runs"))
+def _list_runs_s3() -> List[str]:
     paginator = s3_client.get_paginator("list_objects_v2")
     runs: Set[str] = set()
 
@@ -71,11 +98,24 @@ def list_runs() -> List[str]:
     return sorted(runs)
 
 
-@cached(METADATA_CACHE)
-def list_steps(run: str) -> List[str]:
+def list_steps(run: str, use_cache: bool = True) -> List[str]:
     """
-    Lista los 'step=XXX' leyendo las sub-carpetas (CommonPrefixes) dentro de un run.
+    Lista los 'step=XXX' desde el manifest; sin manifest, leyendo las sub-carpetas
+    (CommonPrefixes) del run (cacheado en METADATA_CACHE salvo ``use_cache=False``).
+    Con STI_ZARR_ENABLED se suman los steps del store Zarr: un store parcial no
+    oculta steps que sólo existen como NetCDF.
     """
+    steps = sti_manifest.MANIFEST.steps(run)
+    if steps is None:
+        steps = _list_steps_s3(run) if use_cache else _list_steps_s3.__wrapped__(run)
+
+    if settings.STI_ZARR_ENABLED:
+        steps = sorted(set(steps) | set(sti_zarr.store_steps(run)))
+    return steps
+
+
+@cached(METADATA_CACHE, key=lambda run: hashkey("steps", run))
+def _list_steps_s3(run: str) -> List[str]:
     prefix_path = f"{BASE_PREFIX}run={run}/"
     paginator = s3_client.get_paginator("list_objects_v2")
     steps: Set[str] = set()
@@ -126,48 +166,68 @@ def pick_data_var(ds: xr.Dataset, preferred: str = "sti") -> str:
     raise KeyError(f"Variable '{preferred}' no encontrada y no se pudo deducir una única variable. Disponibles: {list(ds.data_vars)}")
 
 
-def load_dataset(run: str, step: str | int) -> xr.Dataset:
+def local_path(run: str, step: str | int) -> str:
     """
-    Descarga robusta y thread-safe de NetCDF desde S3 y lo carga en memoria.
+    Ruta del NetCDF en el cache local (DISK_CACHE).
+    """
+    return DISK_CACHE.path(f"sti_{run}_{_normalize_step(step)}.nc")
+
+
+def ensure_local_file(run: str, step: str | int, callback: Callable[[int], None] | None = None) -> str:
+    """
+    Descarga robusta y thread-safe (FileLock entre procesos) del NetCDF al cache local.
+    Valida el archivo antes de publicarlo y devuelve su ruta. Tras una descarga se
+    evictan los archivos menos usados si el cache supera STI_DISK_CACHE_MAX_BYTES.
+
+    La validación (firma HDF5 + apertura con h5netcdf) se registra en un marcador
+    ``.ok`` con tamaño y ETag: los hits con marcador vigente no abren el archivo,
+    y un ETag distinto en S3 fuerza la re-descarga.
+
+    ``callback`` se pasa a boto3 (recibe los bytes transferidos en cada bloque).
     """
     key = build_nc_key(run, step)
     step_str = _normalize_step(step)
     local_filename = f"sti_{run}_{step_str}.nc"
-    temp_dir = tempfile.gettempdir()
-    final_path = os.path.join(temp_dir, local_filename)
-    lock_path = final_path + ".lock"
-
-    lock = FileLock(lock_path, timeout=60)
+    final_path = local_path(run, step_str)
+    downloaded = False
 
-    with lock:
+    with DISK_CACHE.file_lock(final_path):
         if os.path.exists(final_path):
-            try:
-                with _HDF5_LOCK:
-                    with xr.open_dataset(final_path, engine="h5netcdf", cache=False) as ds_check:
-                        pass
-                logger.info(f"Cache HIT y fichero válido: {final_path}")
-            except Exception as e:
-                logger.warning(f"Cache corrupto detectado en {final_path} ({e}). Borrando para re-descargar.")
+            etag = _etag_or_none(key)
+            status = marker_status(final_path, etag)
+            if status == "valid":
+                logger.info(f"Cache HIT (marcador vigente): {final_path}")
+                DISK_CACHE.record_hit(final_path)
+            elif status == "stale":
+                logger.info(f"Objeto re-publicado en S3 (ETag {etag}); descartando {final_path}")
+                _remove_quietly(final_path)
+            else:
                 try:
-                    os.remove(final_path)
-                except OSError:
-                    pass
+                    _validate_netcdf(final_path)
+                    write_marker(final_path, etag)
+                    logger.info(f"Cache HIT y fichero válido: {final_path}")
+                    DISK_CACHE.record_hit(final_path)
+                except Exception as e:
+                    logger.warning(f"Cache corrupto detectado en {final_path} ({e}). Borrando para re-descargar.")
+                    _remove_quietly(final_path)
 
         if not os.path.exists(final_path):
-            tmp_download_path = os.path.join(temp_dir, f"{local_filename}.{uuid.uuid4()}.tmp")
+            DISK_CACHE.record_miss()
+            tmp_download_path = DISK_CACHE.path(f"{local_filename}.{uuid.uuid4()}.tmp")
             logger.info(f"Iniciando descarga: {key} -> {tmp_download_path}")
             try:
-                s3_client.download_file(BUCKET, key, tmp_download_path)
+                etag = _etag_or_none(key)
+                s3_client.download_file(BUCKET, key, tmp_download_path, Callback=callback)
 
                 if os.path.getsize(tmp_download_path) < 100:
                     raise ValueError("El archivo descargado es demasiado pequeño (<100B).")
 
-                with _HDF5_LOCK:
-                    with xr.open_dataset(tmp_download_path, engine="h5netcdf", cache=False) as ds_test:
-                        pass
+                _validate_netcdf(tmp_download_path)
 
                 os.replace(tmp_download_path, final_path)
+                write_marker(final_path, etag)
                 logger.info(f"Descarga validada y publicada en: {final_path}")
+                downloaded = True
 
             except Exception as e:
                 logger.error(f"Fallo en descarga/validación de {key}: {e}")
@@ -178,22 +238,259 @@ def load_dataset(run: str, step: str | int) -> xr.Dataset:
                         pass
                 raise
 
+    if downloaded:
+        DISK_CACHE.evict(keep=[final_path])
+    return final_path
+
+
+def _validate_netcdf(path: str) -> None:
+    """
+    Validación completa: firma HDF5 y apertura con h5netcdf (bajo _HDF5_LOCK).
+    """
+    if not has_hdf5_signature(path):
+        raise ValueError("Sin firma de superblock HDF5")
+    with _HDF5_LOCK:
+        with xr.open_dataset(path, engine="h5netcdf", cache=False):
+            pass
+
+
+def _etag_or_none(key: str) -> str | None:
+    """
+    ETag actual del objeto, o None si S3 no responde (se cae a la validación completa).
+    """
+    try:
+        return object_etag(key)
+    except FileNotFoundError:
+        raise
+    except Exception as exc:
+        logger.warning(f"No se pudo obtener el ETag de {key}: {exc}")
+        return None
+
+
+def _remove_quietly(path: str) -> None:
+    for p in (path, path + MARKER_SUFFIX):
+        try:
+            os.remove(p)
+        except OSError:
+            pass
+
+
+def decode_local_file(path: str) -> xr.Dataset:
+    """
+    Abre un NetCDF local, normaliza la variable a 'sti' y lo carga en memoria.
+    No toma locks: el llamador serializa el acceso a HDF5 (o corre en otro proceso).
+    """
+    logger.info(f"Opening dataset {path} with h5netcdf")
+    ds = xr.open_dataset(path, engine="h5netcdf", cache=False)
+
+    target_var = pick_data_var(ds, preferred="sti")
+    if target_var != "sti":
+        logger.info(f"Renombrando variable '{target_var}' -> 'sti'")
+        ds = ds.rename({target_var: "sti"})
+
+    logger.info(f"Starting eager load for {path}")
+    ds.load()
+    logger.info(f"Finished eager load for {path}")
+    return ds
+
+
+def load_dataset(run: str, step: str | int) -> xr.Dataset:
+    """
+    Descarga robusta y thread-safe de NetCDF desde S3 y lo carga en memoria.
+    """
+    final_path = ensure_local_file(run, step)
+
     try:
         with _HDF5_LOCK:
-            logger.info(f"Opening dataset {final_path} with h5netcdf")
-            ds = xr.open_dataset(final_path, engine="h5netcdf", cache=False)
+            return decode_local_file(final_path)
 
+    except Exception as e:
+        logger.error(f"Error fatal abriendo/cargando dataset {final_path}: {e}")
+        raise
+
+
+def bbox_slices(lat_vals, lon_vals, lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> tuple[slice, slice]:
+    """
+    Construye los slices de lat/lon respetando el orden de los ejes.
+    Muchas veces latitude viene de 90 -> -90, por eso usamos slice(lat_max, lat_min).
+    """
+    lat_desc = len(lat_vals) > 1 and float(lat_vals[0]) > float(lat_vals[-1])
+    lon_desc = len(lon_vals) > 1 and float(lon_vals[0]) > float(lon_vals[-1])
+
+    lat_slice = slice(lat_max, lat_min) if lat_desc else slice(lat_min, lat_max)
+    lon_slice = slice(lon_max, lon_min) if lon_desc else slice(lon_min, lon_max)
+    return lat_slice, lon_slice
+
+
+def select_bbox(da: xr.DataArray, lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> xr.DataArray:
+    """
+    Recorte geográfico de un DataArray con coords "latitude" y "longitude".
+    """
+    lat_slice, lon_slice = bbox_slices(
+        da["latitude"].values, da["longitude"].values, lat_min, lat_max, lon_min, lon_max
+    )
+    return da.sel(latitude=lat_slice, longitude=lon_slice)
+
+
+def open_remote_dataset(run: str, step: str | int):
+    """
+    Abre el NetCDF directamente sobre S3 (lecturas por rangos de bytes) sin descargarlo.
+
+    Devuelve (file_obj, ds). El dataset es lazy: sólo se leen los chunks HDF5
+    que se materialicen. El llamador debe cerrar ambos (ds primero).
+    """
+    f, ds, _ = _open_remote(run, step)
+    return f, ds
+
+
+def _open_remote(run: str, step: str | int):
+    """
+    ``open_remote_dataset`` + el nombre original de la variable 'sti' en el HDF5.
+    """
+    key = build_nc_key(run, step)
+    path = f"{BUCKET}/{key}"
+    f = sti_remote.PrefetchedFile(s3_fs.open(
+        path,
+        "rb",
+        block_size=settings.STI_REMOTE_BLOCK_SIZE,
+        cache_type="blockcache",
+    ))
+    try:
+        with _HDF5_LOCK:
+            ds = xr.open_dataset(f, engine="h5netcdf", cache=False)
             target_var = pick_data_var(ds, preferred="sti")
             if target_var != "sti":
                 logger.info(f"Renombrando variable '{target_var}' -> 'sti'")
                 ds = ds.rename({target_var: "sti"})
+    except Exception:
+        f.close()
+        raise
+    return f, ds, target_var
 
-            logger.info(f"Starting eager load for {final_path}")
-            ds.load()
-            logger.info(f"Finished eager load for {final_path}")
 
-        return ds
+def load_subset(
+    run: str,
+    step: str | int,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+) -> xr.DataArray:
+    """
+    Lee desde S3 sólo los chunks de 'sti' que intersectan el bbox.
 
-    except Exception as e:
-        logger.error(f"Error fatal abriendo/cargando dataset {final_path}: {e}")
+    El costo (bytes y latencia) escala con el tamaño del bbox y no con el del archivo:
+    se leen los metadatos HDF5 y luego únicamente los chunks del recorte.
+
+    Los chunks se bajan sin _HDF5_LOCK (ver sti_remote): el lock sólo cubre
+    metadatos, selección y la decodificación desde memoria.
+    """
+    f, ds, target_var = _open_remote(run, step)
+    try:
+        with _HDF5_LOCK:
+            sub = select_bbox(ds["sti"], lat_min, lat_max, lon_min, lon_max)
+            window = sti_remote.positional_window(ds["sti"], sub)
+            ranges = sti_remote.window_ranges(f, target_var, window)
+        logger.info(f"Remote read de {sub.size} celdas para run={run} step={_normalize_step(step)}")
+        f.prefetch(ranges)
+        with _HDF5_LOCK:
+            sub = sub.load()
+        return sub
+    finally:
+        ds.close()
+        f.close()
+
+
+@cached(ETAG_CACHE)
+def object_etag(key: str) -> str:
+    """
+    ETag del objeto en S3 (sin comillas), desde el manifest o con un HEAD.
+    Levanta FileNotFoundError si no existe.
+    """
+    etag = sti_manifest.MANIFEST.etag_for(key)
+    if etag:
+        return etag
+    try:
+        head = s3_client.head_object(Bucket=BUCKET, Key=key)
+    except Exception as exc:
+        code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+        if code in ("404", "NoSuchKey", "NotFound"):
+            raise FileNotFoundError(f"s3://{BUCKET}/{key}") from exc
         raise
+    return str(head["ETag"]).strip('"')
+
+
+def step_etag(run: str, step: str | int) -> str:
+    """
+    ETag S3 del NetCDF de un run/step.
+    """
+    return object_etag(build_nc_key(run, step))
+
+
+def _sti_cache_key(run: str, step: str | int) -> tuple[str, str, str]:
+    step_str = _normalize_step(step)
+    return (run, step_str, object_etag(build_nc_key(run, step_str)))
+
+
+def _decode_step(run: str, step_str: str, etag: str) -> DecodedStep:
+    if settings.STI_DECODE_PROCESSES > 0:
+        # Decodificación en un proceso hijo (estado HDF5 propio): no toma _HDF5_LOCK
+        sti, meta = decode_pool.decode_file(ensure_local_file(run, step_str))
+        return DecodedStep(run=run, step=step_str, etag=etag, sti=freeze(sti), **meta)
+
+    ds = load_dataset(run, step_str)
+    try:
+        sti = freeze(ds["sti"].copy(deep=False))
+        return DecodedStep(
+            run=run,
+            step=step_str,
+            etag=etag,
+            sti=sti,
+            dims={k: int(v) for k, v in ds.sizes.items()},
+            coords=[str(c) for c in ds.coords],
+            data_vars=[str(v) for v in ds.data_vars],
+        )
+    finally:
+        ds.close()
+
+
+def get_sti(run: str, step: str | int) -> DecodedStep:
+    """
+    Grilla 'sti' decodificada desde el cache en memoria; decodifica sólo en un miss.
+
+    El resultado es compartido entre requests: sus arrays son de sólo lectura.
+    """
+    key = _sti_cache_key(run, step)
+    return STI_CACHE.get_or_load(key, lambda: _decode_step(*key))
+
+
+def is_cached(run: str, step: str | int) -> bool:
+    return _sti_cache_key(run, step) in STI_CACHE
+
+
+def subset_sti(
+    run: str,
+    step: str | int,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    max_cells: int | None = None,
+) -> xr.DataArray:
+    """
+    Recorte de 'sti' para el bbox: desde el cache si está caliente; si no, desde el
+    store Zarr del run (si STI_ZARR_ENABLED y existe) o según STI_READ_MODE.
+
+    Con ``max_cells`` el recorte sale del nivel de detalle (sti_lod) más fino que
+    no lo supera; el factor usado queda en ``attrs["lod_factor"]``.
+    """
+    if max_cells is not None:
+        return sti_lod.subset_lod(run, step, lat_min, lat_max, lon_min, lon_max, max_cells)
+    if is_cached(run, step):
+        return select_bbox(get_sti(run, step).sti, lat_min, lat_max, lon_min, lon_max)
+    if settings.STI_ZARR_ENABLED and sti_zarr.has_step(run, step, step_etag(run, step)):
+        # Sólo si el store salió del NetCDF publicado: el ETag de la respuesta es el de éste
+        return sti_zarr.subset_from_store(run, step, lat_min, lat_max, lon_min, lon_max)
+    if settings.STI_READ_MODE == "remote":
+        return load_subset(run, step, lat_min, lat_max, lon_min, lon_max)
+    return select_bbox(get_sti(run, step).sti, lat_min, lat_max, lon_min, lon_max)
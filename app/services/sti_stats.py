@@ -0,0 +1,149 @@
+"""
+Sidecar de estadísticas por run/step para que /summary no abra el NetCDF.
+
+El sidecar vive junto al NetCDF en S3:
+    indices/sti/run=YYYYMMDDHH/step=XXX/sti_chile_run=YYYYMMDDHH_step=XXX.stats.json
+
+Se genera al publicar (``publish_stats``, ver scripts/publish_sti_stats.py) o, en un
+miss, la primera vez que se pide el summary. Guarda el ETag del NetCDF del que se
+calculó: si el objeto se re-publica, el sidecar queda obsoleto y se recalcula.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+from cachetools import LRUCache
+
+from . import sti_service
+from .sti_cache import DecodedStep
+
+logger = logging.getLogger(__name__)
+
+STATS_VERSION = 1
+STATS_SUFFIX = ".stats.json"
+HISTOGRAM_BINS = 20
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+# Sidecars ya leídos/calculados, keyed por (run, step, etag)
+STATS_CACHE = LRUCache(maxsize=1024)
+STATS_CACHE_LOCK = threading.Lock()
+
+
+def build_stats_key(run: str, step: str | int) -> str:
+    """
+    Key del sidecar: mismo prefijo y nombre que el NetCDF, con sufijo .stats.json.
+    """
+    nc_key = sti_service.build_nc_key(run, step)
+    return nc_key[: -len(".nc")] + STATS_SUFFIX
+
+
+def sti_value_stats(values: Any) -> Dict[str, Any]:
+    """
+    min/max/mean/std, conteos, percentiles e histograma ignorando NaN.
+    """
+    arr = np.asarray(values, dtype="float64").ravel()
+    finite = arr[np.isfinite(arr)]
+    out: Dict[str, Any] = {
+        "count": int(finite.size),
+        "nan_count": int(arr.size - finite.size),
+    }
+    if finite.size == 0:
+        out.update({"min": None, "max": None, "mean": None, "std": None, "percentiles": {}, "histogram": None})
+        return out
+
+    counts, edges = np.histogram(finite, bins=HISTOGRAM_BINS)
+    pct = np.percentile(finite, PERCENTILES)
+    out.update({
+        "min": float(finite.min()),
+        "max": float(finite.max()),
+        "mean": float(finite.mean()),
+        "std": float(finite.std()),
+        "percentiles": {f"p{p:02d}": float(v) for p, v in zip(PERCENTILES, pct)},
+        "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+    })
+    return out
+
+
+def compute_stats(decoded: DecodedStep) -> Dict[str, Any]:
+    """
+    Contenido completo del sidecar para un run/step decodificado.
+    """
+    return {
+        "version": STATS_VERSION,
+        "run": decoded.run,
+        "step": decoded.step,
+        "etag": decoded.etag,
+        "dims": decoded.dims,
+        "coords": decoded.coords,
+        "vars": decoded.data_vars,
+        "sti_stats": sti_value_stats(decoded.sti.values),
+    }
+
+
+def read_stats(run: str, step: str | int) -> Optional[Dict[str, Any]]:
+    """
+    Lee el sidecar desde S3. Devuelve None si no existe o no se puede parsear.
+    """
+    key = build_stats_key(run, step)
+    try:
+        resp = sti_service.s3_client.get_object(Bucket=sti_service.BUCKET, Key=key)
+        stats = json.loads(resp["Body"].read())
+    except Exception as exc:
+        logger.info(f"Sidecar de stats no disponible en {key}: {exc}")
+        return None
+    if not isinstance(stats, dict) or stats.get("version") != STATS_VERSION:
+        return None
+    return stats
+
+
+def write_stats(run: str, step: str | int, stats: Dict[str, Any]) -> None:
+    key = build_stats_key(run, step)
+    sti_service.s3_client.put_object(
+        Bucket=sti_service.BUCKET,
+        Key=key,
+        Body=json.dumps(stats).encode("utf-8"),
+        ContentType="application/json",
+    )
+    logger.info(f"Sidecar de stats publicado en {key}")
+
+
+def publish_stats(run: str, step: str | int) -> Dict[str, Any]:
+    """
+    Calcula y publica el sidecar (uso en ingesta, tras subir el NetCDF).
+    """
+    stats = compute_stats(sti_service.get_sti(run, step))
+    write_stats(run, step, stats)
+    return stats
+
+
+def get_stats(run: str, step: str | int) -> Dict[str, Any]:
+    """
+    Stats del run/step: memoria -> sidecar en S3 -> cálculo (y escritura del sidecar).
+
+    Sólo el último caso decodifica el NetCDF. Un fallo al escribir el sidecar
+    (p.ej. IAM de sólo lectura) se loguea y no afecta la respuesta.
+    """
+    step_str = sti_service._normalize_step(step)
+    etag = sti_service.object_etag(sti_service.build_nc_key(run, step_str))
+    cache_key = (run, step_str, etag)
+
+    with STATS_CACHE_LOCK:
+        if cache_key in STATS_CACHE:
+            return STATS_CACHE[cache_key]
+
+    stats = read_stats(run, step_str)
+    if stats is None or stats.get("etag") != etag:
+        logger.info(f"Stats miss para run={run} step={step_str}: calculando desde el NetCDF")
+        stats = compute_stats(sti_service.get_sti(run, step_str))
+        try:
+            write_stats(run, step_str, stats)
+        except Exception as exc:
+            logger.warning(f"No se pudo escribir el sidecar de stats para run={run} step={step_str}: {exc}")
+
+    with STATS_CACHE_LOCK:
+        STATS_CACHE[cache_key] = stats
+    return stats
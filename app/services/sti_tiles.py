@@ -0,0 +1,363 @@
+"""
+Tiles raster (slippy map, Web Mercator 256x256) de 'sti' con cache en dos niveles.
+
+- Render: cada pixel toma la celda más cercana de la grilla decodificada
+  (lookup aritmético en ejes regulares) y se colorea con una LUT fija.
+- Data tiles (``.bin``): los mismos 256x256 valores muestreados, sin colorear,
+  como float32 LE row-major o empaquetados en int16 (``encoding=int16``, ver
+  sti_encoding) para colorear/consultar en el cliente.
+- Cache: LRU en memoria (presupuesto en bytes) + disco bajo STI_TILE_CACHE_DIR,
+  keyed por run/step/etag/colormap/z/x/y/formato. Un hit no decodifica el NetCDF.
+  El nivel en disco también tiene presupuesto (STI_TILE_DISK_MAX_BYTES): se evictan
+  los tiles usados hace más tiempo (mtime, refrescado en cada hit) y los
+  directorios que quedan vacíos, así tiles de runs/ETags viejos no se acumulan.
+"""
+from __future__ import annotations
+
+import io
+import logging
+import os
+import struct
+import tempfile
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import xarray as xr
+
+from ..config import settings
+from ..lib.geo import nearest_index
+from . import sti_encoding, sti_service
+from .sti_cache import ByteBudgetLRU
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+MAX_ZOOM = 18
+
+# Rango fijo de la escala de color (anomalías estandarizadas)
+VMIN = -3.0
+VMAX = 3.0
+
+# Anclas (posición 0..1, RGB) de cada colormap; la LUT se interpola a 256 colores
+_COLORMAP_ANCHORS: Dict[str, Tuple[Tuple[float, Tuple[int, int, int]], ...]] = {
+    "rdbu": (
+        (0.0, (5, 48, 97)),
+        (0.25, (67, 147, 195)),
+        (0.5, (247, 247, 247)),
+        (0.75, (214, 96, 77)),
+        (1.0, (103, 0, 31)),
+    ),
+    "brbg": (
+        (0.0, (84, 48, 5)),
+        (0.25, (191, 129, 45)),
+        (0.5, (245, 245, 245)),
+        (0.75, (53, 151, 143)),
+        (1.0, (0, 60, 48)),
+    ),
+}
+DEFAULT_COLORMAP = "rdbu"
+
+MEDIA_TYPES = {"png": "image/png", "webp": "image/webp", "bin": "application/octet-stream"}
+
+
+def _build_lut(anchors) -> np.ndarray:
+    pos = np.array([a[0] for a in anchors])
+    rgb = np.array([a[1] for a in anchors], dtype="float64")
+    x = np.linspace(0.0, 1.0, 256)
+    lut = np.empty((256, 4), dtype=np.uint8)
+    for c in range(3):
+        lut[:, c] = np.rint(np.interp(x, pos, rgb[:, c]))
+    lut[:, 3] = 255
+    return lut
+
+
+COLORMAPS: Dict[str, np.ndarray] = {name: _build_lut(a) for name, a in _COLORMAP_ANCHORS.items()}
+
+
+def tile_pixel_centers(z: int, x: int, y: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Latitudes (filas) y longitudes (columnas) de los centros de pixel del tile z/x/y.
+    """
+    world = TILE_SIZE * (2 ** z)
+    px = x * TILE_SIZE + np.arange(TILE_SIZE) + 0.5
+    py = y * TILE_SIZE + np.arange(TILE_SIZE) + 0.5
+    lons = px / world * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * py / world))))
+    return lats, lons
+
+
+def sample_tile(sti: xr.DataArray, z: int, x: int, y: int) -> np.ndarray:
+    """
+    Valores float32 (256, 256) de la celda más cercana a cada pixel; NaN fuera de la grilla.
+    """
+    grid = sti.squeeze(drop=True).transpose("latitude", "longitude")
+    lat_axis = grid["latitude"].values
+    lon_axis = grid["longitude"].values
+
+    lats, lons = tile_pixel_centers(z, x, y)
+    if lon_axis.size and float(np.max(lon_axis)) > 180.0:
+        lons = lons % 360.0
+
+    iy = nearest_index(lat_axis, lats)
+    ix = nearest_index(lon_axis, lons)
+
+    out = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+    if (iy < 0).all() or (ix < 0).all():
+        return out
+
+    vals = grid.values[np.clip(iy, 0, None)[:, None], np.clip(ix, 0, None)[None, :]]
+    inside = (iy >= 0)[:, None] & (ix >= 0)[None, :]
+    out[inside] = vals[inside]
+    return out
+
+
+def render_tile(sti: xr.DataArray, z: int, x: int, y: int, colormap: str = DEFAULT_COLORMAP) -> np.ndarray:
+    """
+    RGBA uint8 (256, 256, 4). Pixeles fuera de la grilla o NaN quedan transparentes.
+    """
+    vals = sample_tile(sti, z, x, y)
+    rgba = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+    valid = np.isfinite(vals)
+    if not valid.any():
+        return rgba
+    norm = (np.where(valid, vals, VMIN) - VMIN) / (VMAX - VMIN)
+    lut_idx = np.clip(np.rint(norm * 255.0), 0, 255).astype(np.uint8)
+    rgba[valid] = COLORMAPS[colormap][lut_idx[valid]]
+    return rgba
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """
+    PNG RGBA 8-bit sin dependencias (zlib + filtro 'None' por fila).
+    """
+    h, w, _ = rgba.shape
+    raw = np.zeros((h, w * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(h, w * 4)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0)),
+        chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)),
+        chunk(b"IEND", b""),
+    ))
+
+
+def encode_webp(rgba: np.ndarray) -> bytes:
+    """
+    WebP lossless. Levanta ImportError si Pillow no está instalado.
+    """
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.fromarray(rgba, "RGBA").save(buf, format="WEBP", lossless=True)
+    return buf.getvalue()
+
+
+class TileCache:
+    """
+    Cache de tiles codificados: LRU en memoria respaldado por un directorio en disco.
+
+    El disco lleva un índice LRU (ruta -> bytes) sembrado al arrancar con los tiles
+    existentes ordenados por mtime; al pasar ``disk_max_bytes`` se borran los más
+    viejos. Cada proceso evicta según su índice; un archivo ya borrado por otro
+    proceso simplemente se descarta del índice.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, disk_max_bytes: int = 0):
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self._mem = ByteBudgetLRU(max_bytes, getsizeof=len)
+        self._lock = threading.Lock()
+        self._disk: Optional["OrderedDict[str, int]"] = None
+        self._disk_bytes = 0
+        self.disk_hits = 0
+        self.disk_evictions = 0
+
+    def _path(self, key: Tuple) -> str:
+        run, step, etag, colormap, z, x, y, ext = key
+        return os.path.join(self.directory, run, step, etag, colormap, str(z), str(x), f"{y}.{ext}")
+
+    def _disk_index(self) -> "OrderedDict[str, int]":
+        """
+        Índice del disco (llamar con ``_lock``); la primera vez recorre el directorio.
+        """
+        if self._disk is None:
+            found = []
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    found.append((st.st_mtime, path, st.st_size))
+            found.sort()
+            self._disk = OrderedDict((path, size) for _, path, size in found)
+            self._disk_bytes = sum(self._disk.values())
+        return self._disk
+
+    def _touch(self, path: str, size: int) -> None:
+        with self._lock:
+            index = self._disk_index()
+            self._disk_bytes += size - index.pop(path, 0)
+            index[path] = size
+
+    def _remove_empty_dirs(self, path: str) -> None:
+        parent = os.path.dirname(path)
+        while parent != self.directory and parent.startswith(self.directory):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break  # no vacío (u otro proceso escribiendo)
+            parent = os.path.dirname(parent)
+
+    def evict_disk(self) -> int:
+        """
+        Borra tiles LRU hasta quedar bajo ``disk_max_bytes``. Devuelve los bytes liberados.
+        """
+        if self.disk_max_bytes <= 0:
+            return 0
+        victims = []
+        with self._lock:
+            index = self._disk_index()
+            while self._disk_bytes > self.disk_max_bytes and index:
+                path, size = index.popitem(last=False)
+                self._disk_bytes -= size
+                victims.append((path, size))
+        freed = 0
+        for path, size in victims:
+            try:
+                os.remove(path)
+                freed += size
+            except OSError:
+                pass  # ya borrado por otro proceso
+            self._remove_empty_dirs(path)
+        if victims:
+            with self._lock:
+                self.disk_evictions += len(victims)
+            logger.info(f"Tile cache: evictados {len(victims)} tiles de disco ({freed} bytes)")
+        return freed
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        with self._lock:
+            data = self._mem.get(key)
+            if data is not None:
+                self._mem.hits += 1
+                return data
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self._mem.misses += 1
+            return None
+
+        self._touch(path, len(data))
+        with self._lock:
+            self.disk_hits += 1
+            self._mem[key] = data
+        return data
+
+    def put(self, key: Tuple, data: bytes) -> None:
+        with self._lock:
+            if len(data) <= self._mem.maxsize:
+                self._mem[key] = data
+
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning(f"No se pudo escribir el tile en disco {path}: {exc}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._touch(path, len(data))
+        self.evict_disk()
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._mem.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = self._mem.stats()
+            out["disk_hits"] = self.disk_hits
+            out["disk_evictions"] = self.disk_evictions
+            out["disk_bytes"] = self._disk_bytes
+            out["disk_max_bytes"] = self.disk_max_bytes
+            return out
+
+
+TILE_CACHE = TileCache(
+    settings.STI_TILE_CACHE_DIR or os.path.join(tempfile.gettempdir(), "sti_tiles"),
+    settings.STI_TILE_CACHE_MAX_BYTES,
+    settings.STI_TILE_DISK_MAX_BYTES,
+)
+
+
+def encode_data_tile(values: np.ndarray, encoding: str = "float") -> bytes:
+    """
+    Data tile: 256x256 row-major little-endian, float32 (NaN) o int16 empaquetado.
+    """
+    if encoding == "int16":
+        return sti_encoding.quantize_int16(values).tobytes()
+    return np.ascontiguousarray(values, dtype="<f4").tobytes()
+
+
+def get_tile(
+    run: str,
+    step: str | int,
+    z: int,
+    x: int,
+    y: int,
+    ext: str = "png",
+    colormap: str = DEFAULT_COLORMAP,
+    encoding: str = "float",
+) -> bytes:
+    """
+    Tile codificado (png/webp) o data tile (bin, float/int16 según ``encoding``).
+    Sólo decodifica la grilla si el tile no está en cache.
+    """
+    if not 0 <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise ValueError(f"Tile fuera de rango: z={z} x={x} y={y}")
+    if ext == "bin":
+        if encoding not in sti_encoding.ENCODINGS:
+            raise ValueError(f"Encoding desconocido '{encoding}'. Disponibles: {list(sti_encoding.ENCODINGS)}")
+    elif colormap not in COLORMAPS:
+        raise ValueError(f"Colormap desconocido '{colormap}'. Disponibles: {sorted(COLORMAPS)}")
+
+    step_str = sti_service._normalize_step(step)
+    etag = sti_service.object_etag(sti_service.build_nc_key(run, step_str))
+    # Los data tiles no tienen colormap: ese nivel de la clave lleva el encoding
+    key = (run, step_str, etag, encoding if ext == "bin" else colormap, z, x, y, ext)
+
+    data = TILE_CACHE.get(key)
+    if data is not None:
+        return data
+
+    sti = sti_service.get_sti(run, step_str).sti
+    if ext == "bin":
+        data = encode_data_tile(sample_tile(sti, z, x, y), encoding)
+    else:
+        rgba = render_tile(sti, z, x, y, colormap)
+        data = encode_webp(rgba) if ext == "webp" else encode_png(rgba)
+    TILE_CACHE.put(key, data)
+    return data
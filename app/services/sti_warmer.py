@@ -0,0 +1,214 @@
+"""
+Warmer en background: detecta runs nuevos en ``indices/sti/`` y pre-descarga
+(y valida) todos sus steps al cache local, para que los primeros usuarios de un
+run no paguen la descarga.
+
+Se arranca desde el lifespan de FastAPI cuando STI_WARMER_ENABLED=true.
+Concurrencia y ancho de banda se limitan con STI_WARMER_CONCURRENCY y
+STI_WARMER_MAX_BYTES_PER_SEC (0 = sin límite).
+
+Por run se recuerdan los steps ya calentados: en cada poll se vuelven a listar
+los steps de los runs abiertos y se calientan los que faltan (publicados después
+o que fallaron antes). Un run se cierra (no se vuelve a listar) cuando todos sus
+steps están calentados y ya existe un run más nuevo.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set
+
+from ..config import settings
+from . import sti_service
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Limitador de ancho de banda compartido entre descargas (bytes/seg).
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n: int) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= n
+            deficit = -self._tokens
+        if deficit > 0:
+            time.sleep(deficit / self.rate)
+
+
+class RunWarmer:
+    """
+    Pollea la lista de runs y pre-descarga los steps de cada run nuevo.
+    """
+
+    def __init__(
+        self,
+        poll_seconds: float,
+        concurrency: int,
+        max_bytes_per_sec: float = 0,
+        initial_runs: int = 1,
+    ):
+        self.poll_seconds = poll_seconds
+        self.concurrency = max(1, concurrency)
+        self.initial_runs = initial_runs
+        self._bucket = TokenBucket(max_bytes_per_sec)
+        # Runs cerrados (completos o históricos) y, por run abierto, steps ya calentados
+        self._seen: Set[str] = set()
+        self._warmed: Dict[str, Set[str]] = {}
+        self._first_poll = True
+        self._progress: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_poll: Optional[float] = None
+        self._last_error: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="sti-warmer", daemon=True)
+        self._thread.start()
+        logger.info("STI warmer iniciado")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as exc:
+                self._last_error = str(exc)
+                logger.error(f"STI warmer: fallo en poll: {exc}")
+            self._stop.wait(self.poll_seconds)
+
+    # ------------------------------------------------------------------
+    # Trabajo
+    # ------------------------------------------------------------------
+    def poll_once(self) -> List[str]:
+        """
+        Un ciclo: lista runs (sin cache) y calienta los steps pendientes de cada run
+        abierto. Devuelve los runs en los que hubo algo que calentar.
+        """
+        runs = sti_service.list_runs(use_cache=False)
+        self._last_poll = time.time()
+        open_runs = [r for r in runs if r not in self._seen]
+
+        if self._first_poll:
+            # En el arranque sólo los runs más recientes; el histórico no se descarga
+            self._first_poll = False
+            skipped = open_runs[:-self.initial_runs] if self.initial_runs > 0 else open_runs
+            self._seen.update(skipped)
+            open_runs = [r for r in open_runs if r not in self._seen]
+
+        latest = max(runs) if runs else None
+        warmed = []
+        for run in open_runs:
+            if self._stop.is_set():
+                break
+            steps = sti_service.list_steps(run, use_cache=False)
+            with self._lock:
+                done = set(self._warmed.get(run, ()))
+            if any(s not in done for s in steps):
+                self.warm_run(run, steps)
+                warmed.append(run)
+                with self._lock:
+                    done = set(self._warmed.get(run, ()))
+            if run != latest and steps and done.issuperset(steps):
+                # Completo y ya hay un run más nuevo: no se vuelve a listar
+                with self._lock:
+                    self._seen.add(run)
+                    self._warmed.pop(run, None)
+        return warmed
+
+    def warm_run(self, run: str, steps: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Calienta los steps de ``run`` que todavía no se calentaron (los fallidos se
+        reintentan en la próxima llamada).
+        """
+        if steps is None:
+            steps = sti_service.list_steps(run, use_cache=False)
+        with self._lock:
+            done = self._warmed.setdefault(run, set())
+            pending = [s for s in steps if s not in done]
+            progress = self._progress.setdefault(run, {
+                "steps_total": 0,
+                "steps_done": 0,
+                "steps_failed": 0,
+                "bytes": 0,
+                "attempts": 0,
+                "started_at": None,
+                "finished_at": None,
+            })
+            progress.update({
+                "steps_total": len(done | set(steps)),
+                "steps_done": len(done),
+                "steps_failed": 0,
+                "started_at": time.time(),
+                "finished_at": None,
+            })
+            progress["attempts"] += 1
+        logger.info(f"STI warmer: calentando run={run} ({len(pending)} de {len(steps)} steps pendientes)")
+
+        def on_bytes(n: int) -> None:
+            with self._lock:
+                progress["bytes"] += n
+            self._bucket.consume(n)
+
+        def warm_step(step: str) -> None:
+            try:
+                sti_service.ensure_local_file(run, step, callback=on_bytes)
+            except Exception as exc:
+                logger.warning(f"STI warmer: fallo run={run} step={step}: {exc}")
+                with self._lock:
+                    progress["steps_failed"] += 1
+                return
+            with self._lock:
+                done.add(step)
+                progress["steps_done"] = len(done)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="sti-warm") as pool:
+            wait([pool.submit(warm_step, s) for s in pending])
+
+        with self._lock:
+            progress["finished_at"] = time.time()
+        return progress
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "last_poll": self._last_poll,
+                "last_error": self._last_error,
+                "runs": {run: dict(p) for run, p in self._progress.items()},
+            }
+
+
+WARMER = RunWarmer(
+    poll_seconds=settings.STI_WARMER_POLL_SECONDS,
+    concurrency=settings.STI_WARMER_CONCURRENCY,
+    max_bytes_per_sec=settings.STI_WARMER_MAX_BYTES_PER_SEC,
+    initial_runs=settings.STI_WARMER_INITIAL_RUNS,
+)
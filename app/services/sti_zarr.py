@@ -0,0 +1,213 @@
+"""
+Stores Zarr de STI: un store por run con todos los steps apilados en la dimensión
+``step``, chunked y comprimido, con metadata consolidada.
+
+Layout en S3 (prefijo paralelo a los NetCDF)::
+
+    indices/sti_zarr/run=YYYYMMDDHH/sti_chile_run=YYYYMMDDHH.zarr
+
+Los stores los genera el job de ingesta (``scripts/convert_sti_zarr.py``) a partir
+de los NetCDF publicados; cada ejecución agrega los steps que falten y reescribe
+los que se republicaron. El atributo ``source_etags`` del store guarda el ETag del
+NetCDF del que salió cada step: sólo se sirve desde el store un step cuyo ETag
+coincide con el publicado (si no, se lee el NetCDF). Con
+STI_ZARR_INT16=true 'sti' se guarda empaquetado en int16 (mismo empaquetado CF que
+``encoding=int16``, ver sti_encoding); xarray lo desempaqueta al leer. Con
+STI_ZARR_ENABLED=true el servicio los prefiere cuando existen:
+
+- un recorte sólo trae los chunks que intersectan el bbox, en paralelo (dask);
+- los steps del store se suman al listado del run (un store parcial no oculta steps).
+
+``zarr`` es una dependencia opcional: si no está instalada todo cae al NetCDF.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import warnings
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import xarray as xr
+from cachetools import TTLCache
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+ZARR_PREFIX = "indices/sti_zarr/"
+STEP_DIM = "step"
+SOURCE_ETAGS_ATTR = "source_etags"
+
+# Stores abiertos (lazy) por run; None = no hay store (o zarr no instalado)
+STORE_CACHE = TTLCache(maxsize=32, ttl=300)
+_STORE_LOCK = threading.Lock()
+
+
+def build_zarr_key(run: str) -> str:
+    from .sti_service import INDEX_NAME, REGION_NAME
+
+    return f"{ZARR_PREFIX}run={run}/{INDEX_NAME}_{REGION_NAME}_run={run}.zarr"
+
+
+def _store(run: str) -> Any:
+    """
+    Mapping (fsspec) del store del run en S3.
+    """
+    from . import sti_service
+
+    return sti_service.s3_fs.get_mapper(f"{sti_service.BUCKET}/{build_zarr_key(run)}")
+
+
+def _zarr_available() -> bool:
+    try:
+        import zarr  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def open_run_store(run: str) -> Optional[xr.Dataset]:
+    """
+    Dataset lazy (dask) del store del run, o None si no existe o zarr no está instalado.
+    """
+    with _STORE_LOCK:
+        if run in STORE_CACHE:
+            return STORE_CACHE[run]
+
+    ds = None
+    if _zarr_available():
+        try:
+            ds = xr.open_zarr(_store(run), consolidated=True)
+        except Exception as exc:
+            logger.debug(f"Sin store Zarr para run={run}: {exc}")
+            ds = None
+
+    with _STORE_LOCK:
+        STORE_CACHE[run] = ds
+    return ds
+
+
+def store_steps(run: str) -> List[str]:
+    """
+    Steps presentes en el store del run ('XXX'), o [] si no hay store.
+    """
+    ds = open_run_store(run)
+    if ds is None:
+        return []
+    return [f"{int(s):03d}" for s in sorted(ds[STEP_DIM].values.tolist())]
+
+
+def store_etag(run: str, step: str | int) -> Optional[str]:
+    """
+    ETag del NetCDF del que salió el step del store, o None si no está (o no se registró).
+    """
+    ds = open_run_store(run)
+    if ds is None or int(step) not in ds[STEP_DIM].values:
+        return None
+    return ds.attrs.get(SOURCE_ETAGS_ATTR, {}).get(f"{int(step):03d}")
+
+
+def has_step(run: str, step: str | int, etag: str) -> bool:
+    """
+    True si el store tiene el step y salió del NetCDF con ese ETag (no está desactualizado).
+    """
+    return store_etag(run, step) == etag
+
+
+def subset_from_store(
+    run: str,
+    step: str | int,
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+) -> xr.DataArray:
+    """
+    Recorte de 'sti' leyendo sólo los chunks del bbox. Levanta KeyError si el step no está.
+    """
+    from .sti_service import select_bbox
+
+    ds = open_run_store(run)
+    if ds is None:
+        raise KeyError(f"Sin store Zarr para run={run}")
+    da = ds["sti"].sel({STEP_DIM: int(step)}, drop=True)
+    return select_bbox(da, lat_min, lat_max, lon_min, lon_max).load()
+
+
+# ----------------------------------------------------------------------
+# Ingesta
+# ----------------------------------------------------------------------
+def _step_dataset(run: str, step: str) -> tuple[xr.Dataset, str]:
+    """
+    Step listo para escribir en el store, con el ETag del NetCDF decodificado.
+    """
+    from . import sti_service
+
+    decoded = sti_service.get_sti(run, step)
+    grid = decoded.sti.squeeze(drop=True).transpose("latitude", "longitude").astype(np.float32)
+    return grid.expand_dims({STEP_DIM: [int(step)]}).to_dataset(name="sti"), decoded.etag
+
+
+def _write_source_etags(store: Any, etags: Dict[str, str]) -> None:
+    import zarr
+
+    group = zarr.open_group(store, mode="r+")
+    group.attrs[SOURCE_ETAGS_ATTR] = dict(sorted(etags.items()))
+    zarr.consolidate_metadata(store)
+
+
+def convert_run(run: str, steps: Optional[Sequence[str]] = None, store: Any = None) -> List[str]:
+    """
+    Agrega al store del run los steps que falten (todos los publicados por default)
+    y reescribe en su lugar los que se republicaron (ETag distinto al registrado).
+    Devuelve los steps escritos. Levanta ImportError si zarr no está instalado.
+    """
+    import zarr  # noqa: F401  (dependencia opcional)
+    from . import sti_service
+    from .sti_encoding import int16_cf_encoding
+
+    store = store if store is not None else _store(run)
+    steps = [sti_service._normalize_step(s) for s in (steps or sti_service.list_steps(run))]
+
+    try:
+        current = xr.open_zarr(store, consolidated=True)
+        positions = {int(s): i for i, s in enumerate(current[STEP_DIM].values.tolist())}
+        etags: Dict[str, str] = dict(current.attrs.get(SOURCE_ETAGS_ATTR, {}))
+    except Exception:
+        positions, etags = {}, {}
+
+    pending = [
+        s for s in steps
+        if int(s) not in positions or etags.get(s) != sti_service.step_etag(run, s)
+    ]
+    chunk = settings.STI_ZARR_CHUNK
+    with warnings.catch_warnings():
+        # zarr v3 avisa que la metadata consolidada no es parte del spec (la seguimos usando)
+        warnings.filterwarnings("ignore", message=".*[Cc]onsolidated metadata.*")
+        for step in pending:
+            ds, etags[step] = _step_dataset(run, step)
+            if not positions:
+                ny, nx = ds["sti"].shape[1:]
+                encoding = {"sti": {"chunks": (1, min(chunk, ny), min(chunk, nx))}}
+                if settings.STI_ZARR_INT16:
+                    encoding["sti"].update(int16_cf_encoding())
+                ds.to_zarr(store, mode="w", consolidated=True, encoding=encoding)
+                positions[int(step)] = 0
+            elif int(step) in positions:
+                # Republicado: se reescribe su posición en el store
+                i = positions[int(step)]
+                ds.drop_vars(["latitude", "longitude"]).to_zarr(
+                    store, mode="r+", region={STEP_DIM: slice(i, i + 1)}, consolidated=True,
+                )
+            else:
+                ds.to_zarr(store, mode="a", append_dim=STEP_DIM, consolidated=True)
+                positions[int(step)] = len(positions)
+            logger.info(f"Zarr: run={run} step={step} escrito")
+        if pending:
+            # Después de los datos: un corte a mitad deja steps sin ETag, que no se sirven
+            _write_source_etags(store, etags)
+
+    with _STORE_LOCK:
+        STORE_CACHE.pop(run, None)
+    return pending
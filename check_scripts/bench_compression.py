@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark of response compression (app.routers.compression codecs).
+
+Compares CPU time vs. bytes saved for gzip, brotli and zstd at several levels on
+representative payloads: a grid JSON subset, the same subset as f32, and a
+historic-like JSON time series. brotli/zstd are skipped if not installed.
+
+    python check_scripts/bench_compression.py --repeat 3
+"""
+import os
+import sys
+import time
+import json
+import gzip
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import sti_encoding
+
+
+def make_grid(ny, nx):
+    lats = np.linspace(-17.0, -17.0 - 0.25 * (ny - 1), ny)
+    lons = np.linspace(-76.0, -76.0 + 0.25 * (nx - 1), nx)
+    values = np.round(np.random.default_rng(0).standard_normal((ny, nx)), 3)
+    values[::7, ::5] = np.nan
+    return lats, lons, values
+
+
+def historic_json(n_points, n_times):
+    rng = np.random.default_rng(0)
+    times = (np.datetime64("1991-01-01") + np.arange(n_times)).astype(str).tolist()
+    out = []
+    for i in range(n_points):
+        out.append({
+            "lat": -33.0 - i * 0.1,
+            "lon": -71.0,
+            "series": [{"time": t, "value": round(float(v), 3)} for t, v in zip(times, rng.standard_normal(n_times))],
+        })
+    return json.dumps(out).encode()
+
+
+def codecs():
+    out = {f"gzip-{lvl}": (lambda d, lvl=lvl: gzip.compress(d, compresslevel=lvl)) for lvl in (1, 6, 9)}
+    try:
+        import brotli
+        out.update({f"br-{q}": (lambda d, q=q: brotli.compress(d, quality=q)) for q in (1, 5, 11)})
+    except ImportError:
+        print("brotli no instalado: se omite br")
+    try:
+        import zstandard
+        out.update({f"zstd-{lvl}": zstandard.ZstdCompressor(level=lvl).compress for lvl in (1, 3, 9, 19)})
+    except ImportError:
+        print("zstandard no instalado: se omite zstd")
+    return out
+
+
+def bench(fn, data, repeat):
+    best = None
+    size = 0
+    for _ in range(repeat):
+        t0 = time.process_time()
+        size = len(fn(data))
+        dt = time.process_time() - t0
+        best = dt if best is None else min(best, dt)
+    return size, best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    lats, lons, values = make_grid(157, 41)
+    big = make_grid(400, 400)
+    payloads = {
+        "subset json 157x41": b"".join(sti_encoding.iter_grid_json({}, lats, lons, values)),
+        "subset json 400x400": b"".join(sti_encoding.iter_grid_json({}, *big)),
+        "subset f32 400x400": sti_encoding.encode_f32_grid(*big),
+        "historic json 50x365": historic_json(50, 365),
+    }
+
+    print(f"{'payload':>22} {'codec':>8} {'bytes':>12} {'ratio':>7} {'cpu ms':>9} {'MB/s':>8}")
+    for pname, data in payloads.items():
+        print(f"{pname:>22} {'identity':>8} {len(data):>12,d} {1.0:>7.2f} {0.0:>9.2f} {'-':>8}")
+        for cname, fn in codecs().items():
+            size, cpu = bench(fn, data, args.repeat)
+            mbps = len(data) / 1e6 / cpu if cpu else float("inf")
+            print(f"{pname:>22} {cname:>8} {size:>12,d} {size / len(data):>7.2f} {cpu * 1000:>9.2f} {mbps:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Contention benchmark for NetCDF decoding (based on debug_stress.py).
+
+Writes N synthetic STI steps to a temp dir and decodes them concurrently from a
+ThreadPoolExecutor, like concurrent requests would:
+
+- "thread+lock": in-thread decode serialized by sti_service._HDF5_LOCK
+  (the STI_DECODE_PROCESSES=0 path).
+- "processes":   decode_pool workers (STI_DECODE_PROCESSES=N), arrays returned
+  through shared memory.
+
+    python check_scripts/bench_decode_contention.py --steps 8 --size 1500 --procs 4
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import logging
+import concurrent.futures
+
+import numpy as np
+import xarray as xr
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.config import settings
+from app.services import sti_service, decode_pool
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(threadName)s - %(message)s')
+
+
+def make_steps(directory, n, size):
+    paths = []
+    rng = np.random.default_rng(0)
+    for i in range(n):
+        ds = xr.Dataset(
+            {"sti": (("latitude", "longitude"), rng.standard_normal((size, size)).astype(np.float32))},
+            coords={"latitude": np.linspace(-17, -56, size), "longitude": np.linspace(-76, -66, size)},
+        )
+        path = os.path.join(directory, f"sti_bench_{i:03d}.nc")
+        # Compressed + chunked like the published products, so decode is CPU-bound
+        ds.to_netcdf(path, engine="h5netcdf", encoding={"sti": {"zlib": True, "complevel": 4, "chunksizes": (100, 100)}})
+        paths.append(path)
+    return paths
+
+
+def thread_worker(path):
+    with sti_service._HDF5_LOCK:
+        ds = sti_service.decode_local_file(path)
+    val = float(ds["sti"].values[0, 0])
+    ds.close()
+    return val
+
+
+def process_worker(path):
+    sti, _ = decode_pool.decode_file(path)
+    return float(sti.values[0, 0])
+
+
+def run(label, worker, paths, threads):
+    t0 = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(worker, paths))
+    dt = time.perf_counter() - t0
+    print(f"{label:>14}: {dt:7.2f} s  ({len(results)} steps, {len(paths) / dt:5.1f} steps/s)")
+    return dt
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=8)
+    parser.add_argument("--size", type=int, default=1500)
+    parser.add_argument("--procs", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--threads", type=int, default=10)
+    args = parser.parse_args()
+
+    settings.STI_DECODE_PROCESSES = args.procs
+    directory = tempfile.mkdtemp(prefix="sti_bench_")
+    try:
+        print(f"--- Writing {args.steps} steps of {args.size}x{args.size} float32 ---")
+        paths = make_steps(directory, args.steps, args.size)
+
+        # Warm the pool (spawn + imports) outside the measurement
+        list(decode_pool.get_pool().map(int, range(args.procs)))
+
+        print(f"--- Decoding concurrently ({args.threads} request threads, {args.procs} processes) ---")
+        base = run("thread+lock", thread_worker, paths, args.threads)
+        pooled = run("processes", process_worker, paths, args.threads)
+        print(f"speed-up: {base / pooled:.2f}x")
+    finally:
+        decode_pool.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark of app.lib.historic.extract.extract_points at 1, 200 and 5000 points.
+
+Compares the vectorized extraction (one pointwise gather into a points x time
+block) against the previous per-point loop (.sel(method="nearest") +
+.to_pandas() + row-by-row dicts), and the columnar layout (shared
+dates/timestamps + one values list per point), on a synthetic monthly ERA5-like cube over
+Chile (420 months, 0.25 deg), in RAM and dask-backed.
+
+    python check_scripts/bench_historic_extract.py --legacy-max 200
+"""
+import os
+import sys
+import time
+import argparse
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.lib.historic import extract
+
+
+def make_dataset(months, chunked):
+    times = pd.date_range("1991-01-01", periods=months, freq="MS")
+    lats = np.arange(-17.0, -56.25, -0.25)
+    lons = np.arange(-76.0, -65.75, 0.25)
+    data = 285.0 + np.random.default_rng(0).standard_normal((months, lats.size, lons.size)).astype(np.float32)
+    ds = xr.Dataset(
+        {"t2m": (["valid_time", "latitude", "longitude"], data, {"units": "K"})},
+        coords={"valid_time": times, "latitude": lats, "longitude": lons},
+    )
+    return ds.chunk({"valid_time": 120, "latitude": 80, "longitude": 41}) if chunked else ds
+
+
+def legacy_extract(ds, points, units="C"):
+    """The per-point loop extract_points used before vectorization."""
+    out = []
+    for pt in points:
+        selection = ds["t2m"].sel(latitude=pt["lat"], longitude=pt["lon"], method="nearest")
+        series = selection.to_pandas()
+        if units == "C":
+            series = series - 273.15
+        series = series.where(pd.notnull(series), other=None)
+        ts_list = []
+        for date, val in series.items():
+            ts_date = pd.to_datetime(date, errors="coerce")
+            ts_list.append({
+                "date": ts_date.strftime("%Y-%m-%d"),
+                "timestamp": int(ts_date.timestamp() * 1000),
+                "value": None if val is None else float(val),
+            })
+        out.append({"lat_used": float(selection.latitude), "lon_used": float(selection.longitude), "series": ts_list})
+    return out
+
+
+def bench(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--months", type=int, default=420)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy-max", type=int, default=200, help="Skip the legacy loop above this many points")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    print(f"{'backend':>8} {'points':>7} {'vectorized ms':>14} {'columnar ms':>12} {'legacy ms':>11} {'speedup':>8}")
+    for chunked in (False, True):
+        ds = make_dataset(args.months, chunked)
+        for n in (1, 200, 5000):
+            points = [{"lat": float(a), "lon": float(b)} for a, b in zip(rng.uniform(-55, -18, n), rng.uniform(-75, -67, n))]
+            with patch.object(extract, "load_merged_dataset", return_value=ds):
+                vec = bench(lambda: extract.extract_points(points, units="C"), args.repeat)
+                col = bench(lambda: extract.extract_points_columnar(points, units="C"), args.repeat)
+            legacy = bench(lambda: legacy_extract(ds, points), 1) if n <= args.legacy_max else None
+            leg_txt = f"{legacy * 1000:>11.1f}" if legacy else f"{'-':>11}"
+            speed = f"{legacy / vec:>7.1f}x" if legacy else f"{'-':>8}"
+            print(f"{'dask' if chunked else 'numpy':>8} {n:>7} {vec * 1000:>14.1f} {col * 1000:>12.1f} {leg_txt} {speed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark of /sti/{run}/{step}/subset payload formats.
+
+Compares payload bytes and server CPU time (serialization only) for the
+flattened JSON triplets vs. the binary formats in app.services.sti_encoding,
+on synthetic grids with a 0.25 deg spacing.
+
+    python check_scripts/bench_subset_formats.py --repeat 5
+"""
+import os
+import sys
+import time
+import json
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import sti_encoding
+
+
+def json_flat(lats, lons, values):
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+    payload = {
+        "latitudes": lat_grid.flatten().tolist(),
+        "longitudes": lon_grid.flatten().tolist(),
+        "sti": values.flatten().tolist(),
+    }
+    return json.dumps(payload).encode()
+
+
+def make_grid(ny, nx):
+    lats = np.linspace(-17.0, -17.0 - 0.25 * (ny - 1), ny)
+    lons = np.linspace(-76.0, -76.0 + 0.25 * (nx - 1), nx)
+    values = np.random.default_rng(0).standard_normal((ny, nx))
+    return lats, lons, values
+
+
+def bench(fn, repeat):
+    best = None
+    size = 0
+    for _ in range(repeat):
+        t0 = time.process_time()
+        out = fn()
+        dt = time.process_time() - t0
+        size = len(out)
+        best = dt if best is None else min(best, dt)
+    return size, best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    encoders = {
+        "json (flat)": json_flat,
+        "json (grid)": lambda lats, lons, v: b"".join(sti_encoding.iter_grid_json({}, lats, lons, v)),
+        "f32": sti_encoding.encode_f32_grid,
+        "npy": lambda lats, lons, v: sti_encoding.encode_npy(v),
+        "json int16": lambda lats, lons, v: b"".join(
+            sti_encoding.iter_grid_json({}, lats, lons, sti_encoding.quantize_int16(v))
+        ),
+        "f32 int16": sti_encoding.encode_i16_grid,
+    }
+    try:
+        import pyarrow  # noqa: F401
+        encoders["arrow"] = sti_encoding.encode_arrow
+    except ImportError:
+        print("pyarrow no instalado: se omite Arrow IPC")
+
+    print(f"{'grid':>10} {'format':>12} {'bytes':>12} {'cpu ms':>9} {'vs json':>8}")
+    for ny, nx in [(20, 20), (100, 100), (157, 41), (400, 400)]:
+        lats, lons, values = make_grid(ny, nx)
+        base = None
+        for name, enc in encoders.items():
+            size, cpu = bench(lambda: enc(lats, lons, values), args.repeat)
+            base = base or size
+            print(f"{ny:>4}x{nx:<5} {name:>12} {size:>12,d} {cpu * 1000:>9.2f} {size / base:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
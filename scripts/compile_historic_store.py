@@ -0,0 +1,39 @@
+import sys
+import os
+import argparse
+import logging
+
+# Add the current directory to sys.path to import app.*
+sys.path.append(os.getcwd())
+
+from app.lib.historic import catalog, loader, store
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compile the merged historic t2m NetCDFs into the memory-mapped (lat, lon, time) store."
+    )
+    parser.add_argument("--out", default=str(catalog.COMPILED_DIR), help="Output directory")
+    parser.add_argument("--force", action="store_true", help="Recompile even if the store is up to date")
+    args = parser.parse_args()
+
+    sources = catalog.get_ordered_sources()
+    if not sources:
+        print(f"ERROR: No historic NetCDF files found in {catalog.HISTORIC_DIR}")
+        sys.exit(1)
+
+    signature = loader.dataset_signature()
+    if not args.force and store.open_store(signature, args.out) is not None:
+        print(f"OK  store in {args.out} is up to date ({', '.join(p.name for p in sources)})")
+        return
+
+    ds = loader.merge_sources(sources)
+    header = store.compile_store(ds, signature, args.out)
+    shape = "x".join(str(n) for n in ds[loader.VAR_NAME].shape)
+    print(f"OK  {shape} ({', '.join(ds[loader.VAR_NAME].dims)}) -> {header.parent}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import sys
+import os
+import argparse
+import logging
+
+# Add the current directory to sys.path to import app.*
+sys.path.append(os.getcwd())
+
+from app.services import sti_service, sti_zarr
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert the STI NetCDFs of a run into its chunked Zarr store (appends missing steps)."
+    )
+    parser.add_argument("run", help="Run YYYYMMDDHH")
+    parser.add_argument("steps", nargs="*", help="Steps to convert (default: every step of the run)")
+    args = parser.parse_args()
+
+    steps = args.steps or sti_service.list_steps(args.run, use_cache=False)
+    if not steps:
+        print(f"ERROR: No steps found for run={args.run}")
+        sys.exit(1)
+
+    try:
+        written = sti_zarr.convert_run(args.run, steps)
+    except ImportError:
+        print("ERROR: zarr is not installed (pip install zarr)")
+        sys.exit(1)
+
+    uri = f"s3://{sti_service.BUCKET}/{sti_zarr.build_zarr_key(args.run)}"
+    print(f"OK  {len(written)} new step(s) -> {uri}: {', '.join(written) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
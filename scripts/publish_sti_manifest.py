@@ -0,0 +1,29 @@
+import sys
+import os
+import argparse
+import logging
+
+# Add the current directory to sys.path to import app.*
+sys.path.append(os.getcwd())
+
+from app.services import sti_service
+from app.services.sti_manifest import MANIFEST_KEY, publish_manifest
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Publish indices/sti/manifest.json (run after uploading a run/step and its stats sidecar)."
+    )
+    parser.add_argument("runs", nargs="*", help="Runs to refresh in the manifest (default: rebuild it from scratch)")
+    parser.add_argument("--no-stats", action="store_true", help="Do not read the .stats.json sidecars")
+    args = parser.parse_args()
+
+    manifest = publish_manifest(args.runs or None, with_stats=not args.no_stats)
+    n_steps = sum(len(r["steps"]) for r in manifest["runs"].values())
+    print(f"OK  s3://{sti_service.BUCKET}/{MANIFEST_KEY}: {len(manifest['runs'])} runs, {n_steps} steps")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import sys
+import os
+import argparse
+import logging
+
+# Add the current directory to sys.path to import app.*
+sys.path.append(os.getcwd())
+
+from app.services import sti_service
+from app.services.sti_stats import publish_stats, build_stats_key
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Publish the .stats.json sidecar next to each STI NetCDF (run after uploading a run/step)."
+    )
+    parser.add_argument("run", help="Run YYYYMMDDHH")
+    parser.add_argument("steps", nargs="*", help="Steps to publish (default: every step of the run)")
+    args = parser.parse_args()
+
+    steps = args.steps or sti_service.list_steps(args.run)
+    if not steps:
+        print(f"ERROR: No steps found for run={args.run}")
+        sys.exit(1)
+
+    failed = 0
+    for step in steps:
+        try:
+            stats = publish_stats(args.run, step)
+            s = stats["sti_stats"]
+            print(f"OK  step={step} -> s3://{sti_service.BUCKET}/{build_stats_key(args.run, step)} "
+                  f"(min={s['min']}, max={s['max']}, nan={s['nan_count']})")
+        except Exception as e:
+            failed += 1
+            print(f"ERR step={step}: {e}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
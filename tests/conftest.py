@@ -0,0 +1,59 @@
+from contextlib import ExitStack
+from typing import Optional, Sequence
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import xarray as xr
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import compression
+
+# El bbox no importa: subset_sti está parcheado, pero forma parte del ETag
+SUBSET_URL = "/sti/2025010100/000/subset?lat_min=-34&lat_max=-32&lon_min=-72&lon_max=-70"
+
+
+def make_grid(
+    values,
+    lats: Optional[Sequence[float]] = None,
+    lons: Optional[Sequence[float]] = None,
+) -> xr.DataArray:
+    """
+    Grilla 'sti' (latitude, longitude); sin ejes, pasos de 0.25° desde (-33, -71).
+    """
+    values = np.asarray(values, dtype="float64")
+    ny, nx = values.shape
+    lats = [-33.0 - 0.25 * i for i in range(ny)] if lats is None else lats
+    lons = [-71.0 + 0.25 * j for j in range(nx)] if lons is None else lons
+    return xr.DataArray(values, dims=("latitude", "longitude"), coords={"latitude": lats, "longitude": lons})
+
+
+@pytest.fixture
+def client() -> TestClient:
+    return TestClient(app)
+
+
+@pytest.fixture
+def subset_url() -> str:
+    return SUBSET_URL
+
+
+@pytest.fixture
+def serve_subset():
+    """
+    ``serve_subset(values, lats=None, lons=None, etag="etag-1")``: /subset devuelve esa
+    grilla con ese ETag de step. Devuelve (mock de step_etag, mock de subset_sti).
+
+    Vacía las variantes comprimidas antes y después: distintos tests sirven
+    contenido distinto con el mismo ETag.
+    """
+    compression.COMPRESSED_CACHE.clear()
+    with ExitStack() as stack:
+        def serve(values, lats=None, lons=None, etag: str = "etag-1"):
+            etag_mock = stack.enter_context(patch("app.services.sti_service.step_etag", return_value=etag))
+            subset = stack.enter_context(patch("app.routers.sti.subset_sti", return_value=make_grid(values, lats, lons)))
+            return etag_mock, subset
+
+        yield serve
+    compression.COMPRESSED_CACHE.clear()
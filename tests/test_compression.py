@@ -0,0 +1,159 @@
+import asyncio
+import gzip
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app.routers import compression
+
+
+@pytest.fixture(autouse=True)
+def patched_subset(serve_subset):
+    # Todo Chile a 0.25°: lo bastante grande para que valga la pena comprimir
+    lats = np.arange(-17.0, -56.25, -0.25)
+    lons = np.arange(-76.0, -65.75, 0.25)
+    values = np.round(np.random.default_rng(0).standard_normal((lats.size, lons.size)), 3)
+    return serve_subset(values, lats, lons)
+
+
+def _raw(client, url: str, encoding: str, **kwargs):
+    with client.stream("GET", url, headers={"Accept-Encoding": encoding, **kwargs.get("headers", {})}) as r:
+        return r, b"".join(r.iter_raw())
+
+
+def _chunked_app(chunks, produced):
+    """
+    App ASGI inmutable que envía ``chunks`` en streaming y anota cuántos generó.
+    """
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"etag", b'"chunked"'),
+                (b"cache-control", b"public, max-age=60, immutable"),
+            ],
+        })
+        for i, chunk in enumerate(chunks):
+            produced.append(i)
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+def _call(mw) -> list:
+    sent = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(mw(scope, receive, send))
+    return [m for m in sent if m["type"] == "http.response.body"]
+
+
+def test_negotiate_encoding():
+    offered = ["gzip", "br", "zstd"]
+    assert compression.negotiate_encoding("gzip, br, zstd", offered) == "zstd"
+    assert compression.negotiate_encoding("gzip;q=1, br;q=0.5", offered) == "gzip"
+    assert compression.negotiate_encoding("br;q=0, *;q=0.1", offered) == "zstd"
+    assert compression.negotiate_encoding("identity", offered) is None
+    assert compression.negotiate_encoding("br", ["gzip"]) is None
+    assert compression.negotiate_encoding(None, offered) is None
+
+
+def test_gzip_roundtrip_and_headers(client, subset_url):
+    plain, plain_body = _raw(client, subset_url + "&layout=grid", "identity")
+    response, body = _raw(client, subset_url + "&layout=grid", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.headers["etag"] == "W/" + plain.headers["etag"]
+    assert gzip.decompress(body) == plain_body
+    assert len(body) * 2 < len(plain_body)
+
+
+@pytest.mark.parametrize("encoding", ["br", "zstd"])
+def test_optional_encodings(encoding, client, subset_url):
+    if encoding not in compression.available_codecs():
+        pytest.skip(f"{encoding} no instalado")
+    _, plain_body = _raw(client, subset_url + "&format=f32", "identity")
+    response, body = _raw(client, subset_url + "&format=f32", encoding)
+    assert response.headers["content-encoding"] == encoding
+    if encoding == "br":
+        import brotli
+        assert brotli.decompress(body) == plain_body
+    else:
+        import zstandard
+        assert zstandard.ZstdDecompressor().decompress(body) == plain_body
+
+
+def test_streaming_response_is_compressed_incrementally(client, subset_url):
+    _, plain_body = _raw(client, subset_url + "&format=ndjson", "identity")
+    response, body = _raw(client, subset_url + "&format=ndjson", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(body) == plain_body
+
+
+def test_small_and_precompressed_bodies_pass_through(client):
+    response, _ = _raw(client, "/health", "gzip")
+    assert "content-encoding" not in response.headers
+
+    with patch("app.services.sti_tiles.get_tile", return_value=b"\x89PNG" + b"\0" * 4096):
+        response, body = _raw(client, "/sti/2025010100/000/tiles/3/2/4.png", "gzip")
+    assert "content-encoding" not in response.headers
+    assert len(body) == 4100
+
+
+def test_immutable_variants_are_compressed_once(client, subset_url):
+    with patch.object(compression._Gzip, "compress", autospec=True, side_effect=lambda self, d: gzip.compress(d)) as c:
+        _, body1 = _raw(client, subset_url + "&format=f32", "gzip")
+        _, body2 = _raw(client, subset_url + "&format=f32", "gzip")
+    assert body1 == body2
+    assert c.call_count == 1
+    assert compression.cache_stats()["hits"] == 1
+
+
+def test_immutable_stream_is_served_from_cache(client, subset_url):
+    _, plain_body = _raw(client, subset_url + "&layout=grid", "identity")
+    _, body1 = _raw(client, subset_url + "&layout=grid", "gzip")
+    with patch.object(compression._Gzip, "stream") as stream:
+        response, body2 = _raw(client, subset_url + "&layout=grid", "gzip")
+    stream.assert_not_called()
+    assert body1 == body2
+    assert response.headers["content-length"] == str(len(body2))
+    assert gzip.decompress(body2) == plain_body
+
+
+def test_weak_etag_revalidates(client, subset_url):
+    etag = client.get(subset_url + "&format=f32", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    assert etag.startswith("W/")
+    response = client.get(subset_url + "&format=f32", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_cached_stream_stops_the_app():
+    chunks = [(b"%04d" % i) * 512 for i in range(8)]
+    produced = []
+    mw = compression.CompressionMiddleware(_chunked_app(chunks, produced))
+    first = _call(mw)
+    assert len(produced) == len(chunks)
+
+    produced.clear()
+    second = _call(mw)
+    assert produced == [0]  # servido desde el cache: la app no genera el resto
+    assert len(second) == 1
+    assert gzip.decompress(second[0]["body"]) == b"".join(chunks)
+    assert second[0]["body"] == b"".join(m["body"] for m in first)
+
+
+def test_stream_flushes_by_size_not_per_chunk():
+    chunks = [b'{"row": %d}\n' % i * 20 for i in range(200)]
+    mw = compression.CompressionMiddleware(_chunked_app(chunks, []), flush_bytes=16 * 1024)
+    bodies = [m["body"] for m in _call(mw) if m["body"]]
+    assert 1 < len(bodies) < len(chunks) // 10
+    assert gzip.decompress(b"".join(bodies)) == b"".join(chunks)
@@ -0,0 +1,98 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app.routers import conditional
+
+
+@pytest.fixture
+def step_etag(serve_subset):
+    return serve_subset(np.array([[0.1, 0.2], [0.3, 0.4]]))
+
+
+def test_etag_matches():
+    etag = conditional.make_etag("a", 1)
+    assert conditional.etag_matches(etag, etag)
+    assert conditional.etag_matches(f'"other", W/{etag}', etag)
+    assert conditional.etag_matches("*", etag)
+    assert not conditional.etag_matches(None, etag)
+    assert not conditional.etag_matches('"other"', etag)
+    assert conditional.make_etag("a", 1) != conditional.make_etag("a", 2)
+
+
+def test_subset_sends_validators_and_revalidates(step_etag, client, subset_url):
+    _, subset = step_etag
+    first = client.get(subset_url)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == conditional.IMMUTABLE_CACHE_CONTROL
+    assert "Accept" in first.headers["vary"]
+
+    second = client.get(subset_url, headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+    assert subset.call_count == 1  # el 304 no toca la grilla
+
+
+def test_subset_etag_depends_on_representation(step_etag, client, subset_url):
+    json_etag = client.get(subset_url).headers["etag"]
+    f32 = client.get(subset_url, headers={"Accept": "application/octet-stream", "If-None-Match": json_etag})
+    assert f32.status_code == 200
+    assert f32.headers["etag"] != json_etag
+    assert client.get(subset_url + "&layout=grid").headers["etag"] != json_etag
+    assert client.get(subset_url.replace("lat_min=-34", "lat_min=-35")).headers["etag"] != json_etag
+
+
+def test_new_object_etag_invalidates(step_etag, client, subset_url):
+    etag_mock, _ = step_etag
+    old = client.get(subset_url).headers["etag"]
+    etag_mock.return_value = "etag-2"
+    response = client.get(subset_url, headers={"If-None-Match": old})
+    assert response.status_code == 200
+    assert response.headers["etag"] != old
+
+
+def test_missing_step_is_404_before_decode(client, subset_url):
+    with patch("app.services.sti_service.step_etag", side_effect=FileNotFoundError("x")), \
+            patch("app.routers.sti.subset_sti") as subset:
+        response = client.get(subset_url)
+    assert response.status_code == 404
+    subset.assert_not_called()
+
+
+def test_non_numeric_step_is_422(client):
+    with patch("app.routers.sti.subset_sti") as subset:
+        response = client.get("/sti/2025010100/abc/subset?lat_min=-34&lat_max=-32&lon_min=-72&lon_max=-70")
+    assert response.status_code == 422
+    subset.assert_not_called()
+
+
+def test_summary_not_modified_skips_stats(client):
+    stats = {"dims": {}, "coords": [], "vars": ["sti"], "sti_stats": {}}
+    with patch("app.services.sti_service.step_etag", return_value="etag-1"), \
+            patch("app.routers.sti.get_stats", return_value=stats) as get_stats:
+        url = "/sti/2025010100/000/summary"
+        etag = client.get(url).headers["etag"]
+        response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert get_stats.call_count == 1
+
+
+def test_historic_etag_tracks_sources_and_payload(client):
+    body = {"points": [{"lat": -33.4, "lon": -70.6}]}
+    with patch("app.routers.historic.dataset_signature", return_value=(("a.nc", 1, 10),)), \
+            patch("app.routers.historic.extract_points", return_value=[]) as extract:
+        first = client.post("/historic/t2m", json=body)
+        etag = first.headers["etag"]
+        assert first.headers["cache-control"] == conditional.REVALIDATE_CACHE_CONTROL
+        assert client.post("/historic/t2m", json=body, headers={"If-None-Match": etag}).status_code == 304
+        assert extract.call_count == 1
+
+        other = client.post("/historic/t2m", json={**body, "units": "K"}, headers={"If-None-Match": etag})
+        assert other.status_code == 200
+
+    with patch("app.routers.historic.dataset_signature", return_value=(("a.nc", 2, 10),)), \
+            patch("app.routers.historic.extract_points", return_value=[]):
+        assert client.post("/historic/t2m", json=body, headers={"If-None-Match": etag}).status_code == 200
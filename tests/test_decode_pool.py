@@ -0,0 +1,79 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from app.config import settings
+from app.services import decode_pool, sti_service
+
+
+@pytest.fixture
+def process_pool(monkeypatch: Any) -> Any:
+    monkeypatch.setattr(settings, "STI_DECODE_PROCESSES", 2)
+    decode_pool.shutdown()
+    yield
+    decode_pool.shutdown()
+
+
+def _write_step(path: Path, seed: int, var: str = "sti") -> xr.Dataset:
+    rng = np.random.default_rng(seed)
+    ds = xr.Dataset(
+        {var: (("latitude", "longitude"), rng.standard_normal((20, 30)).astype(np.float32))},
+        coords={"latitude": np.linspace(-17, -56, 20), "longitude": np.linspace(-76, -66, 30)},
+    )
+    ds.to_netcdf(str(path), engine="h5netcdf")
+    return ds
+
+
+def test_decode_file_roundtrips_through_shared_memory(process_pool: Any, tmp_path: Path) -> None:
+    paths = [tmp_path / f"step_{i}.nc" for i in range(4)]
+    expected = [_write_step(p, i, var="var" if i == 3 else "sti") for i, p in enumerate(paths)]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda p: decode_pool.decode_file(str(p)), paths))
+
+    for (sti, meta), ds in zip(results, expected):
+        src = ds[list(ds.data_vars)[0]]
+        np.testing.assert_array_equal(sti.values, src.values)
+        np.testing.assert_allclose(sti["latitude"].values, ds["latitude"].values)
+        assert meta["dims"] == {"latitude": 20, "longitude": 30}
+        assert meta["data_vars"] == ["sti"]
+
+
+def test_get_sti_uses_process_pool(process_pool: Any, tmp_path: Path) -> None:
+    path = tmp_path / "step.nc"
+    ds = _write_step(path, 7)
+    sti_service.STI_CACHE.clear()
+    with patch.object(sti_service, "object_etag", return_value="etag-pool"), \
+         patch.object(sti_service, "ensure_local_file", return_value=str(path)), \
+         patch.object(sti_service, "load_dataset", side_effect=AssertionError("in-thread decode")):
+        decoded = sti_service.get_sti("2025010100", 0)
+    sti_service.STI_CACHE.clear()
+
+    np.testing.assert_array_equal(decoded.sti.values, ds["sti"].values)
+    assert not decoded.sti.values.flags.writeable
+
+
+def test_abandoned_result_releases_the_segment(tmp_path: Path) -> None:
+    path = tmp_path / "step.nc"
+    _write_step(path, 3)
+    future: Future = Future()
+    future.set_result(decode_pool._decode_in_worker(str(path)))
+
+    decode_pool._release_abandoned(future)
+
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=future.result()["shm"])
+
+
+def test_failed_decode_has_no_segment_to_release() -> None:
+    future: Future = Future()
+    future.set_exception(OSError("HDF5 corrupto"))
+    with patch.object(decode_pool.shared_memory, "SharedMemory") as attach:
+        decode_pool._release_abandoned(future)
+    attach.assert_not_called()
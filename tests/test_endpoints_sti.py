@@ -7,65 +7,56 @@ import os
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
 
-# Import imported get_subset. Since we are patching "app.routers.sti.load_dataset", 
-# we don't worry about previous imports of s3_helpers.
+import xarray as xr
+
+# get_subset reads through sti_service.get_sti, so we patch the service-level
+# loader/ETag lookup and clear the decoded cache around each test.
 from app.routers.sti import get_subset
+from app.services import sti_service
 
 class TestSTIEndpoint(unittest.TestCase):
-    @patch("app.routers.sti.load_dataset")
+    def setUp(self):
+        sti_service.STI_CACHE.clear()
+        sti_service.ETAG_CACHE.clear()
+
+    def tearDown(self):
+        sti_service.STI_CACHE.clear()
+        sti_service.ETAG_CACHE.clear()
 
-    def test_get_subset_flattened_structure(self, mock_load_dataset):
+    @patch("app.services.sti_service.object_etag", return_value="etag-1")
+    @patch("app.services.sti_service.load_dataset")
+    def test_get_subset_flattened_structure(self, mock_load_dataset, mock_etag):
         """
         Verify that get_subset returns flattened 1D arrays
         for latitudes, longitudes, and sti, and that they have equal length.
         """
-        # 1. Setup Mock Dataset
-        mock_ds = MagicMock()
-        mock_sub = MagicMock()
-        
+        # 1. Setup Dataset
         # Simulate a 2x2 grid
         # Lats: [-33.0, -33.25]
         # Lons: [-71.0, -70.75]
         lats_input = np.array([-33.0, -33.25])
         lons_input = np.array([-71.0, -70.75])
         sti_values = np.array([[0.1, 0.2], [0.3, 0.4]])
-        
-        mock_ds.data_vars = ["sti"]
 
-        # Setup mock_sub behavior
-        mock_sub.values = sti_values
-        mock_sub.__getitem__.side_effect = lambda key: MagicMock(values=lats_input) if key == "latitude" else MagicMock(values=lons_input)
-        mock_sub.sel.return_value = mock_sub  # For simplicity, sel returns itself in this mock
-        
-        # Mock ds['sti'], ds['latitude'], ds['longitude']
-        def ds_getitem(key):
-            if key == "sti":
-                return mock_sub
-            if key == "latitude":
-                return MagicMock(values=lats_input)
-            if key == "longitude":
-                return MagicMock(values=lons_input)
-            return MagicMock()
-            
-        mock_ds.__getitem__.side_effect = ds_getitem
-        mock_ds.data_vars = ["sti"]
-        mock_ds.dims = {"latitude": 2, "longitude": 2}
-        mock_ds.coords = {"latitude": lats_input, "longitude": lons_input}
+        ds = xr.Dataset(
+            {"sti": (("latitude", "longitude"), sti_values)},
+            coords={"latitude": lats_input, "longitude": lons_input},
+        )
 
-        
         # Configure the patch
-        # Note: get_subset calls load_dataset(run, step)
-        mock_load_dataset.return_value = mock_ds
+        # Note: get_sti calls load_dataset(run, step)
+        mock_load_dataset.return_value = ds
     
         # 2. Call Function directly
-        data = get_subset(
-            run="2025010100",
-            step="000",
-            lat_min=-34.0, 
-            lat_max=-32.0,
-            lon_min=-72.0, 
-            lon_max=-70.0
-        )
+        with patch.object(xr.Dataset, "close") as mock_close:
+            data = get_subset(
+                run="2025010100",
+                step="000",
+                lat_min=-34.0, 
+                lat_max=-32.0,
+                lon_min=-72.0, 
+                lon_max=-70.0
+            )
         
         # 3. Verify Response
         self.assertIn("latitudes", data)
@@ -94,7 +85,37 @@ class TestSTIEndpoint(unittest.TestCase):
 
         # Verify load_dataset was called
         mock_load_dataset.assert_called_with("2025010100", "000")
-        mock_ds.close.assert_called()
+        mock_close.assert_called()
+
+    @patch("app.services.sti_service.object_etag", return_value="etag-1")
+    @patch("app.services.sti_service.load_dataset")
+    def test_get_subset_repeat_hits_decoded_cache(self, mock_load_dataset, mock_etag):
+        """
+        Repeated subsets of the same run/step/etag decode the NetCDF only once
+        and share a read-only grid.
+        """
+        ds = xr.Dataset(
+            {"sti": (("latitude", "longitude"), np.zeros((2, 2)))},
+            coords={"latitude": [-33.0, -33.25], "longitude": [-71.0, -70.75]},
+        )
+        mock_load_dataset.return_value = ds
+
+        for _ in range(3):
+            get_subset(run="2025010100", step="000", lat_min=-34.0, lat_max=-32.0, lon_min=-72.0, lon_max=-70.0)
+
+        self.assertEqual(mock_load_dataset.call_count, 1)
+        stats = sti_service.STI_CACHE.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 2)
+
+        decoded = sti_service.get_sti("2025010100", 0)
+        with self.assertRaises(ValueError):
+            decoded.sti.values[0, 0] = 1.0
+
+        # A new ETag (object republished) is a different cache entry
+        mock_etag.return_value = "etag-2"
+        sti_service.get_sti("2025010100", 0)
+        self.assertEqual(mock_load_dataset.call_count, 2)
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,185 @@
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from fastapi.testclient import TestClient
+
+from app.lib.historic import extract, loader
+from app.main import app
+
+client = TestClient(app)
+
+LATS = np.arange(-17.0, -56.25, -0.25)
+LONS = np.arange(-76.0, -65.75, 0.25)
+TIMES = pd.date_range("1991-01-01", periods=24, freq="MS")
+
+
+def _dataset(chunked: bool = False) -> xr.Dataset:
+    rng = np.random.default_rng(0)
+    data = 280.0 + rng.standard_normal((TIMES.size, LATS.size, LONS.size))
+    data[3, 10, 5] = np.nan
+    ds = xr.Dataset(
+        {"t2m": (["valid_time", "latitude", "longitude"], data, {"units": "K"})},
+        coords={"valid_time": TIMES, "latitude": LATS, "longitude": LONS},
+    )
+    return ds.chunk({"valid_time": 12, "latitude": 50, "longitude": 20}) if chunked else ds
+
+
+def _reference(ds: xr.Dataset, pt, units: str):
+    """Per-point .sel(method="nearest") result, as the original loop built it."""
+    sel = ds["t2m"].sel(latitude=pt["lat"], longitude=pt["lon"], method="nearest")
+    series = sel.to_pandas()
+    if units == "C":
+        series = series - 273.15
+    return [
+        {"date": d.strftime("%Y-%m-%d"), "timestamp": int(d.timestamp() * 1000), "value": None if np.isnan(v) else float(v)}
+        for d, v in series.items()
+    ]
+
+
+POINTS = [
+    {"lat": -33.45, "lon": -70.66},
+    {"lat": -19.5, "lon": -75.0},
+    {"lat": -33.45, "lon": -70.66},     # duplicate
+    {"lat": -19.5, "lon": 285.0},       # 0..360 input
+    {"lat": 10.0, "lon": -70.0},        # out of the grid
+    {"lat": 95.0, "lon": -70.0},        # invalid latitude
+]
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_vectorized_matches_per_point_selection(chunked):
+    ds = _dataset(chunked)
+    with patch("app.lib.historic.extract.load_merged_dataset", return_value=ds):
+        out = extract.extract_points(POINTS, units="C")
+
+    assert len(out) == len(POINTS)
+    for pt, item in zip(POINTS[:4], out[:4]):
+        assert item["units"] == "C"
+        expected = _reference(ds, {"lat": pt["lat"], "lon": ((pt["lon"] + 180) % 360) - 180}, "C")
+        assert [s["date"] for s in item["series"]] == [e["date"] for e in expected]
+        assert [s["timestamp"] for s in item["series"]] == [e["timestamp"] for e in expected]
+        np.testing.assert_allclose(
+            [np.nan if s["value"] is None else s["value"] for s in item["series"]],
+            [np.nan if e["value"] is None else e["value"] for e in expected],
+            equal_nan=True,
+        )
+    assert out[0]["lat_used"] == -33.5 and out[0]["lon_used"] == -70.75
+    assert out[4]["error"].startswith("Point out of bounds")
+    assert out[4]["nearest_grid"] == {"lat": -17.0, "lon": -70.0}
+    assert out[5]["error"] == "Invalid latitude"
+
+
+def test_nan_becomes_none():
+    ds = _dataset()
+    with patch("app.lib.historic.extract.load_merged_dataset", return_value=ds):
+        (item,) = extract.extract_points([{"lat": float(LATS[10]), "lon": float(LONS[5])}], units="K")
+    assert item["series"][3]["value"] is None
+    assert item["series"][0]["value"] == pytest.approx(float(ds["t2m"].values[0, 10, 5]))
+
+
+def test_thousands_of_points_in_one_request():
+    ds = _dataset()
+    rng = np.random.default_rng(1)
+    points = [{"lat": float(la), "lon": float(lo)} for la, lo in zip(rng.uniform(-55, -18, 3000), rng.uniform(-75, -67, 3000))]
+    with patch("app.lib.historic.extract.load_merged_dataset", return_value=ds):
+        out = extract.extract_points(points)
+    assert len(out) == 3000
+    assert all(len(item["series"]) == TIMES.size for item in out)
+
+
+def test_too_many_points():
+    with pytest.raises(ValueError):
+        extract.extract_points([{"lat": 0.0, "lon": 0.0}] * (extract.MAX_POINTS + 1))
+
+
+def test_columnar_matches_rows_and_time_axis_is_shared():
+    ds = _dataset()
+    points = POINTS[:2] + POINTS[4:5]
+    loader.CACHE.clear()
+    loader.CACHE["sources"] = loader.MergedDataset(ds)
+    with patch("app.lib.historic.extract.load_merged_dataset", return_value=ds), \
+            patch("app.lib.historic.loader.build_time_axis", wraps=loader.build_time_axis) as build:
+        rows = extract.extract_points(points, units="C")
+        columnar = extract.extract_points_columnar(points, units="C")
+        extract.extract_points(points[:1], units="K")
+        assert build.call_count == 1
+        loader.CACHE.clear()
+        # Evicted with its dataset: nothing keeps the old axis around
+        extract.extract_points(points[:1], units="K")
+    assert build.call_count == 2
+
+    assert columnar["dates"] == [s["date"] for s in rows[0]["series"]]
+    assert columnar["timestamps"] == [s["timestamp"] for s in rows[0]["series"]]
+    for row, col in zip(rows[:2], columnar["data"][:2]):
+        assert col["values"] == [s["value"] for s in row["series"]]
+        assert {k: v for k, v in col.items() if k != "values"} == {k: v for k, v in row.items() if k != "series"}
+    assert columnar["data"][2] == rows[2]
+
+
+def test_columnar_endpoint_layouts():
+    ds = _dataset()
+    body = {"points": POINTS[:2]}
+    with patch("app.lib.historic.extract.load_merged_dataset", return_value=ds), \
+            patch("app.routers.historic.dataset_signature", return_value=(("a.nc", 1, 1),)):
+        buffered = client.post("/historic/t2m?layout=columnar", json=body)
+        streamed = client.post("/historic/t2m?layout=columnar&stream=true", json=body)
+        ndjson = client.post("/historic/t2m?layout=columnar&format=ndjson", json=body)
+        rows = client.post("/historic/t2m", json=body)
+
+    data = buffered.json()
+    assert len(data["dates"]) == TIMES.size
+    assert data["data"][0]["values"][0] == pytest.approx(rows.json()["data"][0]["series"][0]["value"])
+    assert streamed.json() == data
+    lines = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert lines[0] == {"dates": data["dates"], "timestamps": data["timestamps"]}
+    assert lines[1:] == data["data"]
+    assert buffered.headers["etag"] != rows.headers["etag"]
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_time_window_matches_sel_slice(chunked):
+    ds = _dataset(chunked)
+    pt = POINTS[0]
+    with patch("app.lib.historic.extract.load_merged_dataset", return_value=ds):
+        out = extract.extract_points([pt], units="C", date_start="1991-03-01", date_end="1991-08-15")
+        columnar = extract.extract_points_columnar([pt], units="C", date_start="1992-06", date_end=None)
+
+    expected = _reference(ds.sel(valid_time=slice("1991-03-01", "1991-08-15")), pt, "C")
+    assert out[0]["series"][0]["date"] == "1991-03-01"
+    assert [s["date"] for s in out[0]["series"]] == [e["date"] for e in expected]
+    assert [s["value"] for s in out[0]["series"]] == pytest.approx([e["value"] for e in expected])
+    assert columnar["dates"][0] == "1992-06-01" and columnar["dates"][-1] == "1992-12-01"
+    assert len(columnar["data"][0]["values"]) == 7
+
+
+def test_time_window_edges_and_errors():
+    axis = loader.build_time_axis(_dataset())
+    assert axis.window() is axis
+    assert axis.window("1991-01-01", "1991-01-01").dates == ["1991-01-01"]
+    assert axis.window("1980-01-01", "1990-12-31").dates == []
+    assert axis.window("1992-12-01T00:00:00Z").dates == ["1992-12-01"]
+    assert axis.window(end="1991-02-28").indexer == slice(0, 2)
+    with pytest.raises(ValueError):
+        axis.window("not-a-date")
+    with pytest.raises(ValueError):
+        axis.window("1992-01-01", "1991-01-01")
+
+
+def test_time_window_endpoint():
+    ds = _dataset()
+    body = {"points": POINTS[:1], "start": "1991-06-01", "end": "1991-12-31"}
+    with patch("app.lib.historic.extract.load_merged_dataset", return_value=ds), \
+            patch("app.routers.historic.dataset_signature", return_value=(("a.nc", 1, 1),)):
+        windowed = client.post("/historic/t2m", json=body)
+        full = client.post("/historic/t2m", json={"points": POINTS[:1]})
+        bad = client.post("/historic/t2m", json={**body, "start": "soon"})
+
+    series = windowed.json()["data"][0]["series"]
+    assert [s["date"] for s in series] == [d.strftime("%Y-%m-%d") for d in TIMES[5:12]]
+    assert series == full.json()["data"][0]["series"][5:12]
+    assert windowed.headers["etag"] != full.headers["etag"]
+    assert bad.status_code == 422
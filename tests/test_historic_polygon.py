@@ -0,0 +1,130 @@
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+from fastapi.testclient import TestClient
+
+from app.lib.geo import mask as geo_mask
+from app.lib.historic import aggregate
+from app.main import app
+
+client = TestClient(app)
+
+LATS = np.arange(-30.0, -34.25, -0.25)
+LONS = np.arange(-72.0, -69.75, 0.25)
+TIMES = pd.date_range("2000-01-01", periods=6, freq="MS")
+
+
+def _dataset() -> xr.Dataset:
+    data = 280.0 + np.random.default_rng(7).standard_normal((TIMES.size, LATS.size, LONS.size))
+    data[2, 4, 4] = np.nan
+    return xr.Dataset(
+        {"t2m": (["valid_time", "latitude", "longitude"], data, {"units": "K"})},
+        coords={"valid_time": TIMES, "latitude": LATS, "longitude": LONS},
+    )
+
+
+def _box(lon0, lat0, lon1, lat1):
+    return {"type": "Polygon", "coordinates": [[[lon0, lat0], [lon1, lat0], [lon1, lat1], [lon0, lat1], [lon0, lat0]]]}
+
+
+def _cells(ds, lats, lons):
+    return ds["t2m"].sel(latitude=lats, longitude=lons).transpose("valid_time", "latitude", "longitude").values
+
+
+@pytest.fixture
+def ds():
+    geo_mask.MASK_CACHE.clear()
+    data = _dataset()
+    with patch("app.lib.historic.aggregate.load_merged_dataset", return_value=data):
+        yield data
+
+
+def _rows(geometries, **kwargs):
+    return list(aggregate.PolygonAggregation(geometries, units="K", **kwargs).iter_rows())
+
+
+def test_cell_aligned_box_is_cos_weighted_mean(ds):
+    # Edges on cell boundaries: cells (-31.0, -31.25) x (-71.0, -70.75), full coverage
+    out = _rows([_box(-71.125, -31.375, -70.625, -30.875)])[0]
+    assert out["cells"] == 4
+    block = _cells(ds, [-31.0, -31.25], [-71.0, -70.75])
+    w = np.cos(np.deg2rad([-31.0, -31.25]))[None, :, None] * np.ones((1, 2, 2))
+    expected = (block * w).sum(axis=(1, 2)) / w.sum()
+    values = [s["value"] for s in out["series"]]
+    # Month 2 has a NaN cell (covered by the NaN test)
+    assert values[:2] + values[3:] == pytest.approx(expected[:2].tolist() + expected[3:].tolist())
+    assert out["series"][0]["date"] == "2000-01-01"
+
+
+def test_partial_cells_weigh_by_coverage(ds):
+    # Full cell at lon -71.25 plus the western half of the cell at -71.0
+    out = _rows([_box(-71.375, -31.125, -71.0, -30.875)])[0]
+    assert out["cells"] == 2
+    a = _cells(ds, [-31.0], [-71.25]).ravel()
+    b = _cells(ds, [-31.0], [-71.0]).ravel()
+    values = [s["value"] for s in out["series"]]
+    assert values[2] == pytest.approx(a[2])
+    assert values[:2] + values[3:] == pytest.approx(((a + 0.5 * b) / 1.5)[[0, 1, 3, 4, 5]].tolist())
+
+
+def test_nan_cells_drop_out_of_that_month(ds):
+    # Cell (4, 4) is (-31.0, -71.0), NaN in month 2
+    out = _rows([_box(-71.125, -31.125, -70.625, -30.875)])[0]
+    a = _cells(ds, [-31.0], [-71.0]).ravel()
+    b = _cells(ds, [-31.0], [-70.75]).ravel()
+    values = [s["value"] for s in out["series"]]
+    assert values[2] == pytest.approx(b[2])
+    assert values[0] == pytest.approx((a[0] + b[0]) / 2)
+
+
+def test_tiny_multi_and_outside_polygons(ds):
+    tiny = _box(-70.76, -31.26, -70.74, -31.24)
+    multi = {"type": "MultiPolygon", "coordinates": [tiny["coordinates"], _box(-71.125, -31.125, -70.875, -30.875)["coordinates"]]}
+    outside = _box(10.0, 10.0, 11.0, 11.0)
+    tiny_out, multi_out, outside_out = _rows([tiny, multi, outside])
+
+    assert tiny_out["cells"] == 1
+    assert [s["value"] for s in tiny_out["series"]] == pytest.approx(_cells(ds, [-31.25], [-70.75]).ravel().tolist())
+    assert multi_out["cells"] == 2
+    assert "error" in outside_out and outside_out["polygon"] == 2
+
+
+def test_masks_are_cached_and_layouts_agree(ds):
+    box = _box(-71.125, -31.375, -70.625, -30.875)
+    with patch.object(geo_mask, "build_mask", wraps=geo_mask.build_mask) as build:
+        rows = _rows([box, box], date_start="2000-02-01", date_end="2000-04-01")
+        columns = list(aggregate.PolygonAggregation([box], units="K").iter_columns())
+    assert build.call_count == 1
+    stats = geo_mask.MASK_CACHE.stats()
+    assert stats["entries"] == 1 and stats["bytes"] > 0
+    assert [s["date"] for s in rows[0]["series"]] == ["2000-02-01", "2000-03-01", "2000-04-01"]
+    assert [s["value"] for s in rows[0]["series"]] == pytest.approx(columns[0]["values"][1:4])
+
+
+def test_cell_major_layout_gives_same_series(ds):
+    box = _box(-71.3, -31.6, -70.4, -30.7)
+    expected = _rows([box])[0]["series"]
+    with patch("app.lib.historic.aggregate.load_merged_dataset", return_value=ds.transpose("latitude", "longitude", "valid_time")):
+        assert _rows([box])[0]["series"] == pytest.approx(expected)
+
+
+def test_endpoint_polygon_forms(ds):
+    ring = [{"lat": -30.875, "lon": -71.125}, {"lat": -30.875, "lon": -70.625}, {"lat": -31.375, "lon": -70.625}, {"lat": -31.375, "lon": -71.125}]
+    box = _box(-71.125, -31.375, -70.625, -30.875)
+    with patch("app.routers.historic.dataset_signature", return_value=(("a.nc", 1, 1),)):
+        legacy = client.post("/historic/t2m", json={"polygon": ring, "units": "K"})
+        geojson = client.post("/historic/t2m", json={"polygon": box, "units": "K"})
+        many = client.post("/historic/t2m?layout=columnar", json={"polygons": [box, {"type": "Feature", "geometry": box}], "units": "K"})
+        bad = client.post("/historic/t2m", json={"polygon": {"type": "Point", "coordinates": [0, 0]}})
+        too_many = client.post("/historic/t2m", json={"polygons": [box] * (aggregate.MAX_POLYGONS + 1)})
+
+    assert legacy.status_code == 200
+    assert legacy.json()["data"][0]["cells"] == 4
+    assert legacy.json() == geojson.json()
+    data = many.json()
+    assert len(data["data"]) == 2 and data["data"][0]["values"] == data["data"][1]["values"]
+    assert data["data"][0]["values"] == pytest.approx([s["value"] for s in geojson.json()["data"][0]["series"]])
+    assert bad.status_code == 422 and too_many.status_code == 422
@@ -0,0 +1,78 @@
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from app.lib.historic import extract, loader, store
+
+TIMES = pd.date_range("1991-01-01", periods=30, freq="MS")
+LATS = np.arange(-17.0, -30.25, -0.25)
+LONS = np.arange(-76.0, -65.75, 0.25)
+SIGNATURE = (("a.nc", 1, 100), ("b.nc", 2, 200))
+
+
+def _dataset() -> xr.Dataset:
+    data = 280.0 + np.random.default_rng(3).standard_normal((TIMES.size, LATS.size, LONS.size)).astype(np.float32)
+    data[4, 2, 3] = np.nan
+    return xr.Dataset(
+        {"t2m": (["valid_time", "latitude", "longitude"], data, {"units": "K"})},
+        coords={"valid_time": TIMES, "latitude": LATS, "longitude": LONS},
+    )
+
+
+def test_compile_and_map_roundtrip(tmp_path):
+    ds = _dataset()
+    store.compile_store(ds, SIGNATURE, tmp_path)
+    mapped = store.open_store(SIGNATURE, tmp_path)
+
+    assert mapped["t2m"].dims == ("latitude", "longitude", "valid_time")
+    raw = mapped["t2m"].variable._data
+    assert isinstance(raw, np.memmap) and not raw.flags.writeable
+    assert raw[5, 7].flags.c_contiguous  # one cell's series is contiguous
+    np.testing.assert_array_equal(mapped["t2m"].transpose(*ds["t2m"].dims).values, ds["t2m"].values)
+    np.testing.assert_array_equal(mapped["valid_time"].values, ds["valid_time"].values)
+    assert mapped["t2m"].attrs["units"] == "K"
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_missing_or_stale_store_is_ignored(tmp_path):
+    assert store.open_store(SIGNATURE, tmp_path) is None
+    store.compile_store(_dataset(), SIGNATURE, tmp_path)
+    assert store.open_store((("a.nc", 1, 100),), tmp_path) is None
+
+
+def test_extraction_from_store_matches_netcdf_layout(tmp_path):
+    ds = _dataset()
+    store.compile_store(ds, SIGNATURE, tmp_path)
+    mapped = store.open_store(SIGNATURE, tmp_path)
+    points = [{"lat": -20.1, "lon": -70.3}, {"lat": -17.5, "lon": 284.0}, {"lat": 0.0, "lon": -70.0}]
+
+    with patch("app.lib.historic.extract.load_merged_dataset", return_value=ds):
+        expected = extract.extract_points(points, units="C", date_start="1991-03-01", date_end="1992-02-01")
+    with patch("app.lib.historic.extract.load_merged_dataset", return_value=mapped):
+        got = extract.extract_points(points, units="C", date_start="1991-03-01", date_end="1992-02-01")
+    assert got == expected
+
+
+def test_load_merged_dataset_prefers_store(tmp_path):
+    ds = _dataset()
+    store.compile_store(ds, SIGNATURE, tmp_path)
+    loader.CACHE.clear()
+    try:
+        with patch("app.lib.historic.loader.get_ordered_sources", return_value=["a.nc", "b.nc"]), \
+                patch("app.lib.historic.loader._cache_key", return_value=SIGNATURE), \
+                patch("app.lib.historic.store.COMPILED_DIR", tmp_path), \
+                patch("app.lib.historic.loader.merge_sources", side_effect=AssertionError("NetCDFs opened")):
+            merged = loader.load_merged_dataset()
+        assert isinstance(merged["t2m"].variable._data, np.memmap)
+
+        loader.CACHE.clear()
+        with patch("app.lib.historic.loader.get_ordered_sources", return_value=["a.nc"]), \
+                patch("app.lib.historic.loader._cache_key", return_value=SIGNATURE[:1]), \
+                patch("app.lib.historic.store.COMPILED_DIR", tmp_path), \
+                patch("app.lib.historic.loader.merge_sources", return_value=ds) as merge:
+            assert loader.load_merged_dataset() is ds
+        merge.assert_called_once()
+    finally:
+        loader.CACHE.clear()
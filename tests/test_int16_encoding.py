@@ -0,0 +1,95 @@
+import io
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from app.services import sti_encoding, sti_tiles
+from app.services.sti_cache import DecodedStep
+
+VALUES = np.array([[0.1234, np.nan, -2.5], [40.0, 0.0, -0.0004]])
+
+
+@pytest.fixture(autouse=True)
+def patched_subset(serve_subset):
+    return serve_subset(VALUES)
+
+
+def test_quantize_roundtrip_and_sentinel():
+    q = sti_encoding.quantize_int16(VALUES)
+    assert q.dtype == np.int16
+    assert q.tolist() == [[123, -32768, -2500], [32767, 0, 0]]
+    back = sti_encoding.dequantize_int16(q)
+    assert np.isnan(back[0, 1])
+    np.testing.assert_allclose(back[0], [0.123, np.nan, -2.5], atol=1e-6)
+
+
+def test_json_grid_int16(client, subset_url):
+    response = client.get(subset_url + "&layout=grid&encoding=int16")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["encoding"] == "int16"
+    assert body["scale_factor"] == sti_encoding.INT16_SCALE
+    assert body["fill_value"] == sti_encoding.INT16_FILL
+    assert body["sti"] == [[123, -32768, -2500], [32767, 0, 0]]
+
+
+def test_json_flat_int16(client, subset_url):
+    body = client.get(subset_url + "&encoding=int16").json()
+    assert body["sti"] == [123, -32768, -2500, 32767, 0, 0]
+    assert len(body["latitudes"]) == 6
+
+
+def test_f32_payload_v2_roundtrip(client, subset_url):
+    response = client.get(subset_url + "&format=f32&encoding=int16")
+    assert response.headers["x-sti-encoding"] == "int16"
+    assert float(response.headers["x-sti-scale-factor"]) == sti_encoding.INT16_SCALE
+    lat, lon, grid = sti_encoding.decode_i16_grid(response.content)
+    assert lat.tolist() == [-33.0, -33.25]
+    assert lon.size == 3
+    assert np.isnan(grid[0, 1])
+    np.testing.assert_allclose(grid[0, 0], 0.123, atol=1e-6)
+    # Cuerpo: header 24 + ejes float32 + grilla int16
+    assert len(response.content) == sti_encoding.I16_HEADER.size + 4 * 5 + 2 * 6
+
+
+def test_npy_int16(client, subset_url):
+    response = client.get(subset_url + "&format=npy&encoding=int16")
+    arr = np.load(io.BytesIO(response.content))
+    assert arr.dtype == np.int16
+    assert arr.tolist() == [[123, -32768, -2500], [32767, 0, 0]]
+
+
+def test_encoding_is_part_of_etag(client, subset_url):
+    a = client.get(subset_url + "&format=npy")
+    b = client.get(subset_url + "&format=npy&encoding=int16")
+    assert a.headers["etag"] != b.headers["etag"]
+
+
+def test_int16_data_tile(client):
+    lats = np.linspace(-17.0, -56.0, 157)
+    lons = np.linspace(-76.0, -66.0, 41)
+    values = np.full((lats.size, lons.size), 1.5, dtype=np.float32)
+    sti = xr.DataArray(values, dims=("latitude", "longitude"), coords={"latitude": lats, "longitude": lons})
+    decoded = DecodedStep(run="2025010100", step="000", etag="etag-1", sti=sti)
+    sti_tiles.TILE_CACHE.clear_memory()
+
+    with patch("app.services.sti_service.get_sti", return_value=decoded), \
+            patch("app.services.sti_service.object_etag", return_value="etag-int16-tile"), \
+            patch.object(sti_tiles.TILE_CACHE, "put"):
+        packed = client.get("/sti/2025010100/000/tiles/4/5/9.bin?encoding=int16")
+        floats = client.get("/sti/2025010100/000/tiles/4/5/9.bin")
+
+    assert packed.status_code == 200
+    assert packed.headers["x-sti-shape"] == "256,256"
+    tile = np.frombuffer(packed.content, dtype="<i2").reshape(256, 256)
+    ref = np.frombuffer(floats.content, dtype="<f4").reshape(256, 256)
+    assert len(floats.content) == 2 * len(packed.content)
+    np.testing.assert_array_equal(tile == sti_encoding.INT16_FILL, np.isnan(ref))
+    assert set(np.unique(tile[tile != sti_encoding.INT16_FILL])) <= {1500}
+
+
+def test_encoding_rejected_for_png_tiles(client):
+    response = client.get("/sti/2025010100/000/tiles/4/5/9.png?encoding=int16")
+    assert response.status_code == 422
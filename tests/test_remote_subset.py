@@ -0,0 +1,122 @@
+import os
+import socket
+from typing import Any
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import xarray as xr
+import boto3
+import s3fs
+from moto.server import ThreadedMotoServer
+
+from app.services import sti_service
+from app.config import settings
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def moto_endpoint() -> Any:
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    port = _free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    yield f"http://127.0.0.1:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def remote_fs(moto_endpoint: str) -> Any:
+    client = boto3.client("s3", region_name="us-east-1", endpoint_url=moto_endpoint)
+    client.create_bucket(Bucket=settings.S3_BUCKET_NAME)
+    fs = s3fs.S3FileSystem(
+        key="testing",
+        secret="testing",
+        client_kwargs={"endpoint_url": moto_endpoint, "region_name": "us-east-1"},
+        skip_instance_cache=True,
+    )
+    with patch.object(sti_service, "s3_fs", fs):
+        yield client, fs
+
+
+def _upload_chunked_step(client: Any, tmp_path: Path, run: str, step: str) -> tuple[xr.Dataset, int]:
+    lats = np.linspace(-17.0, -56.0, 400)
+    lons = np.linspace(-76.0, -66.0, 200)
+    data = np.random.rand(lats.size, lons.size).astype(np.float32)
+    ds = xr.Dataset(
+        {"sti": (("latitude", "longitude"), data)},
+        coords={"latitude": lats, "longitude": lons},
+    )
+    local_file = tmp_path / "chunked.nc"
+    ds.to_netcdf(
+        str(local_file),
+        engine="h5netcdf",
+        encoding={"sti": {"chunksizes": (25, 25)}},
+    )
+    client.upload_file(str(local_file), settings.S3_BUCKET_NAME, sti_service.build_nc_key(run, step))
+    return ds, local_file.stat().st_size
+
+
+def test_load_subset_reads_only_bbox(remote_fs: Any, tmp_path: Path, monkeypatch: Any) -> None:
+    client, fs = remote_fs
+    monkeypatch.setattr(settings, "STI_REMOTE_BLOCK_SIZE", 16 * 1024)
+    ds, file_size = _upload_chunked_step(client, tmp_path, "2024021300", "024")
+
+    fetched = []
+    original_fetch = s3fs.core.S3File._fetch_range
+
+    def spy_fetch(self: Any, start: int, end: int) -> bytes:
+        fetched.append(end - start)
+        return original_fetch(self, start, end)
+
+    with patch.object(s3fs.core.S3File, "_fetch_range", spy_fetch):
+        sub = sti_service.load_subset("2024021300", 24, -34.0, -33.0, -71.0, -70.0)
+
+    expected = sti_service.select_bbox(ds["sti"], -34.0, -33.0, -71.0, -70.0)
+    np.testing.assert_allclose(sub.values, expected.values)
+    assert sum(fetched) < file_size / 2
+
+
+def test_load_subset_missing_object(remote_fs: Any) -> None:
+    with pytest.raises(FileNotFoundError):
+        sti_service.load_subset("1999010100", 0, -34.0, -33.0, -71.0, -70.0)
+
+
+def test_load_subset_does_not_hold_the_hdf5_lock_on_chunk_reads(remote_fs: Any, tmp_path: Path, monkeypatch: Any) -> None:
+    client, fs = remote_fs
+    monkeypatch.setattr(settings, "STI_REMOTE_BLOCK_SIZE", 16 * 1024)
+    ds, _ = _upload_chunked_step(client, tmp_path, "2024021300", "036")
+
+    original_fetch = s3fs.core.S3File._fetch_range
+    original_prefetch = sti_service.sti_remote.PrefetchedFile.prefetch
+    phase = {"name": "open"}
+    reads = {"open": [], "prefetch": [], "load": []}
+
+    def spy_fetch(self: Any, start: int, end: int) -> bytes:
+        reads[phase["name"]].append(sti_service._HDF5_LOCK.locked())
+        return original_fetch(self, start, end)
+
+    def spy_prefetch(self: Any, ranges: Any) -> int:
+        phase["name"] = "prefetch"
+        try:
+            return original_prefetch(self, ranges)
+        finally:
+            phase["name"] = "load"
+
+    with patch.object(s3fs.core.S3File, "_fetch_range", spy_fetch), \
+            patch.object(sti_service.sti_remote.PrefetchedFile, "prefetch", spy_prefetch):
+        sub = sti_service.load_subset("2024021300", 36, -34.0, -33.0, -71.0, -70.0)
+
+    expected = sti_service.select_bbox(ds["sti"], -34.0, -33.0, -71.0, -70.0)
+    np.testing.assert_allclose(sub.values, expected.values)
+    # Los chunks se bajan fuera del lock y la decodificación no vuelve a la red
+    assert reads["prefetch"] and not any(reads["prefetch"])
+    assert reads["load"] == []
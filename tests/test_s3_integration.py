@@ -32,7 +32,7 @@ def mocked_s3(aws_credentials: Any) -> Any:
 def clean_temp_dir() -> Any:
     yield
     # Cleanup artifacts in system temp directory to prevent test cross-contamination
-    temp_dir = tempfile.gettempdir()
+    temp_dir = sti_service.DISK_CACHE.directory
     for f in os.listdir(temp_dir):
         if f.startswith("sti_") and (f.endswith(".nc") or f.endswith(".lock") or ".tmp" in f):
             try:
@@ -85,7 +85,7 @@ def test_load_dataset_moto(mocked_s3: Any, tmp_path: Path, clean_temp_dir: Any)
     ds.to_netcdf(str(local_file), engine="h5netcdf")
     mocked_s3.upload_file(str(local_file), bucket_name, key)
     
-    target_local_path = os.path.join(tempfile.gettempdir(), f"sti_{run}_{step_str}.nc")
+    target_local_path = sti_service.local_path(run, step_str)
     if os.path.exists(target_local_path):
         os.remove(target_local_path)
     
@@ -0,0 +1,56 @@
+import numpy as np
+
+from app.services.sti_cache import DecodedCache
+
+
+class _Blob:
+    def __init__(self, nbytes: int):
+        self.nbytes = nbytes
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = DecodedCache(max_bytes=100)
+    cache.put("a", _Blob(40))
+    cache.put("b", _Blob(40))
+    assert cache.get("a") is not None  # "a" becomes most recently used
+    cache.put("c", _Blob(40))
+
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["evicted_bytes"] == 40
+    assert stats["bytes"] == 80
+
+
+def test_oversized_entry_is_served_but_not_cached():
+    cache = DecodedCache(max_bytes=10)
+    value = cache.get_or_load("big", lambda: _Blob(50))
+    assert value.nbytes == 50
+    assert "big" not in cache
+    assert cache.stats()["rejected"] == 1
+
+
+def test_get_or_load_counts_hits_and_misses():
+    cache = DecodedCache(max_bytes=1000)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return np.zeros(10)
+
+    cache.get_or_load("k", loader)
+    cache.get_or_load("k", loader)
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_resize_sets_the_budget():
+    cache = DecodedCache(max_bytes=100)
+    cache.put("a", _Blob(40))
+    cache.resize(30)
+    assert "a" not in cache
+    assert cache.stats()["max_bytes"] == 30
+    cache.put("b", _Blob(40))
+    assert "b" not in cache and cache.stats()["rejected"] == 1
@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import xarray as xr
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import compression
+from app.services.sti_cache import DecodedStep
+
+client = TestClient(app)
+
+LATS = np.round(np.arange(-17.0, -56.25, -0.25), 2)  # 157
+LONS = np.round(np.arange(-76.0, -65.75, 0.25), 2)   # 41
+
+
+def _values(run: str) -> np.ndarray:
+    rng = np.random.default_rng(int(run[-2:]))
+    values = rng.standard_normal((LATS.size, LONS.size)).astype(np.float32)
+    values[0, 0] = np.nan
+    return values
+
+
+def _get_sti(run, step, lons=LONS):
+    sti = xr.DataArray(_values(run), dims=("latitude", "longitude"), coords={"latitude": LATS, "longitude": lons})
+    return DecodedStep(run=run, step=str(step), etag=f"etag-{run}", sti=sti)
+
+
+@pytest.fixture(autouse=True)
+def patched():
+    compression.COMPRESSED_CACHE.clear()
+    with patch("app.services.sti_service.get_sti", side_effect=_get_sti) as get_sti, \
+            patch("app.services.sti_service.step_etag", side_effect=lambda run, step: f"etag-{run}"):
+        yield get_sti
+
+
+def test_diff_grid_and_stats(patched):
+    response = client.get("/sti/diff", params={"run_a": "2025010100", "run_b": "2025010106", "step": "024"})
+    assert response.status_code == 200
+    body = response.json()
+    expected = _values("2025010106").astype("float64") - _values("2025010100")
+    got = np.array(body["sti"], dtype="float64")
+    np.testing.assert_allclose(got, expected, rtol=1e-6, equal_nan=True)
+    assert body["latitude"] == LATS.tolist()
+
+    stats = body["diff_stats"]
+    finite = expected[np.isfinite(expected)]
+    assert stats["nan_count"] == 1
+    assert stats["mean"] == pytest.approx(finite.mean(), rel=1e-6)
+    assert stats["rmse"] == pytest.approx(np.sqrt(np.mean(finite ** 2)), rel=1e-6)
+    assert 0 < stats["sign_change_fraction"] < 1
+    assert {c.args[0] for c in patched.call_args_list} == {"2025010100", "2025010106"}
+    assert patched.call_count == 2
+
+
+def test_diff_bbox_stats_only_and_etag():
+    params = {
+        "run_a": "2025010100", "run_b": "2025010106", "step": "024",
+        "lat_min": -34, "lat_max": -32, "lon_min": -72, "lon_max": -70, "stats_only": True,
+    }
+    response = client.get("/sti/diff", params=params)
+    body = response.json()
+    assert "sti" not in body
+    assert body["diff_stats"]["count"] == 9 * 9
+
+    again = client.get("/sti/diff", params=params, headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+
+
+def test_diff_misaligned_grids_is_409():
+    shifted = lambda run, step: _get_sti(run, step, lons=LONS + (0.1 if run.endswith("06") else 0.0))
+    with patch("app.services.sti_service.get_sti", side_effect=shifted):
+        response = client.get("/sti/diff", params={"run_a": "2025010100", "run_b": "2025010106", "step": "024"})
+    assert response.status_code == 409
+    assert "longitude" in response.json()["detail"]
+
+
+def test_diff_partial_bbox_is_422():
+    response = client.get("/sti/diff", params={"run_a": "2025010100", "run_b": "2025010106", "step": "024", "lat_min": -34})
+    assert response.status_code == 422
+
+
+def test_diff_missing_run_is_404():
+    with patch("app.services.sti_service.step_etag", side_effect=FileNotFoundError):
+        response = client.get("/sti/diff", params={"run_a": "2025010100", "run_b": "2099010100", "step": "024"})
+    assert response.status_code == 404
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import boto3
+import numpy as np
+import pytest
+import xarray as xr
+from filelock import FileLock
+from moto import mock_aws
+
+from app.config import settings
+from app.services import sti_service
+from app.services.sti_disk_cache import (
+    DiskCache,
+    has_hdf5_signature,
+    marker_status,
+    read_marker,
+    write_marker,
+)
+
+RUN = "2024030100"
+STEP = "012"
+
+
+def _write(cache: DiskCache, name: str, size: int, age: float) -> str:
+    path = cache.path(name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    t = time.time() - age
+    os.utime(path, (t, t))
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskCache(str(tmp_path / "nc"), max_bytes=250, min_age=10)
+
+
+def test_evicts_least_recently_used_until_under_budget(cache):
+    a = _write(cache, "a.nc", 100, age=300)
+    b = _write(cache, "b.nc", 100, age=200)
+    c = _write(cache, "c.nc", 100, age=100)
+
+    cache.record_hit(a)  # a pasa a ser el más reciente
+    freed = cache.evict()
+
+    assert freed == 100
+    assert not os.path.exists(b)
+    assert not os.path.exists(b + ".lock")  # ni el lock que tomó la eviction
+    assert os.path.exists(a) and os.path.exists(c)
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["evicted_bytes"] == 100
+    assert stats["hits"] == 1 and stats["bytes"] == 200 and stats["files"] == 2
+
+
+def test_keep_and_recent_files_are_not_evicted(cache):
+    old = _write(cache, "old.nc", 200, age=300)
+    recent = _write(cache, "recent.nc", 200, age=0)
+    cache.evict(keep=[old])
+    assert os.path.exists(old) and os.path.exists(recent)
+
+
+def test_locked_file_is_skipped(cache):
+    a = _write(cache, "a.nc", 200, age=300)
+    b = _write(cache, "b.nc", 200, age=200)
+
+    held = threading.Event()
+    release = threading.Event()
+
+    def holder():
+        # Otro "proceso" tiene el lock de a.nc (descargando/validando)
+        with FileLock(a + ".lock"):
+            held.set()
+            release.wait(5)
+
+    t = threading.Thread(target=holder)
+    t.start()
+    held.wait(5)
+    try:
+        cache.evict()
+    finally:
+        release.set()
+        t.join()
+
+    assert os.path.exists(a) and os.path.exists(a + ".lock")
+    assert not os.path.exists(b) and not os.path.exists(b + ".lock")
+
+
+def test_cleanup_orphans(cache):
+    stale = _write(cache, "sti_x.nc.abc.tmp", 10, age=7200)
+    fresh = _write(cache, "sti_y.nc.def.tmp", 10, age=0)
+    live = _write(cache, "sti_z.nc", 10, age=0)
+    for name in ("sti_gone.nc.lock", "sti_z.nc.lock"):
+        open(cache.path(name), "w").close()
+
+    removed = cache.cleanup_orphans()
+
+    assert removed == {"tmp": 1, "lock": 1, "marker": 0}
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)  # descarga en curso de otro proceso
+    assert os.path.exists(live) and os.path.exists(live + ".lock")
+    assert not os.path.exists(cache.path("sti_gone.nc.lock"))
+
+
+def test_marker_status(tmp_path):
+    path = str(tmp_path / "x.nc")
+    with open(path, "wb") as f:
+        f.write(b"\x89HDF\r\n\x1a\n" + b"\0" * 200)
+    assert has_hdf5_signature(path)
+    assert marker_status(path, "e1") == "missing"
+
+    write_marker(path, "e1")
+    assert read_marker(path)["size"] == 208
+    assert marker_status(path, "e1") == "valid"
+    assert marker_status(path, "e2") == "stale"
+    assert marker_status(path, None) == "missing"  # sin ETag no se confía
+
+    with open(path, "ab") as f:
+        f.write(b"\0")  # truncado/reescrito fuera del cache
+    assert marker_status(path, "e1") == "missing"
+
+
+@pytest.fixture
+def published(tmp_path: Path) -> Any:
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    final_path = sti_service.local_path(RUN, STEP)
+
+    def cleanup():
+        for suffix in ("", ".lock", ".ok"):
+            if os.path.exists(final_path + suffix):
+                os.remove(final_path + suffix)
+
+    def upload(conn, value):
+        ds = xr.Dataset(
+            {"sti": (("latitude", "longitude"), np.full((4, 4), value, dtype=np.float32))},
+            coords={"latitude": np.linspace(-30, -33, 4), "longitude": np.linspace(-72, -69, 4)},
+        )
+        local_file = tmp_path / f"{value}.nc"
+        ds.to_netcdf(str(local_file), engine="h5netcdf")
+        conn.upload_file(str(local_file), settings.S3_BUCKET_NAME, sti_service.build_nc_key(RUN, STEP))
+        sti_service.ETAG_CACHE.clear()
+
+    cleanup()
+    with mock_aws():
+        conn = boto3.client("s3", region_name="us-east-1")
+        conn.create_bucket(Bucket=settings.S3_BUCKET_NAME)
+        upload(conn, 1.0)
+        with patch.object(sti_service, "s3_client", conn):
+            yield conn, upload, final_path
+    sti_service.ETAG_CACHE.clear()
+    cleanup()
+
+
+def test_hit_with_marker_skips_hdf5_open(published):
+    conn, _, final_path = published
+    sti_service.ensure_local_file(RUN, STEP)
+    assert read_marker(final_path)["etag"] == sti_service.step_etag(RUN, STEP)
+
+    with patch("app.services.sti_service.xr.open_dataset") as open_dataset, \
+            patch.object(conn, "download_file") as download:
+        assert sti_service.ensure_local_file(RUN, STEP) == final_path
+    open_dataset.assert_not_called()
+    download.assert_not_called()
+
+
+def test_missing_marker_revalidates_once(published):
+    _, _, final_path = published
+    sti_service.ensure_local_file(RUN, STEP)
+    os.remove(final_path + ".ok")
+
+    with patch("app.services.sti_service.xr.open_dataset", wraps=xr.open_dataset) as open_dataset:
+        sti_service.ensure_local_file(RUN, STEP)
+        sti_service.ensure_local_file(RUN, STEP)
+    assert open_dataset.call_count == 1
+    assert os.path.exists(final_path + ".ok")
+
+
+def test_republished_object_is_downloaded_again(published):
+    conn, upload, final_path = published
+    sti_service.ensure_local_file(RUN, STEP)
+    upload(conn, 2.0)
+
+    path = sti_service.ensure_local_file(RUN, STEP)
+    with xr.open_dataset(path, engine="h5netcdf") as ds:
+        assert float(ds["sti"].values[0, 0]) == 2.0
+    assert read_marker(final_path)["etag"] == sti_service.step_etag(RUN, STEP)
+
+
+def test_corrupt_file_without_marker_is_replaced(published):
+    _, _, final_path = published
+    with open(final_path, "wb") as f:
+        f.write(b"not a netcdf" * 20)
+
+    sti_service.ensure_local_file(RUN, STEP)
+    assert has_hdf5_signature(final_path)
+    assert marker_status(final_path, sti_service.step_etag(RUN, STEP)) == "valid"
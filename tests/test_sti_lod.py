@@ -0,0 +1,113 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import xarray as xr
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import sti_lod, sti_service
+from app.services.sti_cache import DecodedStep
+
+client = TestClient(app)
+
+LATS = np.round(np.arange(-17.0, -56.25, -0.25), 2)  # 157
+LONS = np.round(np.arange(-76.0, -65.75, 0.25), 2)   # 41
+
+
+def _decoded() -> DecodedStep:
+    rng = np.random.default_rng(0)
+    values = rng.standard_normal((LATS.size, LONS.size)).astype(np.float32)
+    values[:5, :7] = np.nan          # bloque 8x8 parcialmente NaN
+    values[16:24, 8:16] = np.nan     # bloque 8x8 entero NaN
+    sti = xr.DataArray(values, dims=("latitude", "longitude"), coords={"latitude": LATS, "longitude": LONS})
+    return DecodedStep(run="2025010100", step="000", etag="etag-1", sti=sti)
+
+
+@pytest.fixture
+def decoded():
+    d = _decoded()
+    sti_lod.LOD_CACHE.clear()
+    with patch("app.services.sti_service.get_sti", return_value=d), \
+            patch("app.services.sti_service.object_etag", return_value="etag-1"):
+        yield d
+    sti_lod.LOD_CACHE.clear()
+
+
+def _reference(values: np.ndarray, f: int) -> np.ndarray:
+    ny, nx = values.shape
+    out = np.full((-(-ny // f), -(-nx // f)), np.nan)
+    for i in range(out.shape[0]):
+        for j in range(out.shape[1]):
+            block = values[i * f:(i + 1) * f, j * f:(j + 1) * f]
+            if np.isfinite(block).any():
+                out[i, j] = np.nanmean(block)
+    return out
+
+
+def test_pyramid_levels_are_exact_nan_aware_block_means(decoded):
+    pyramid = sti_lod.get_pyramid("2025010100", "000")
+    values = decoded.sti.values.astype("float64")
+    for f in sti_lod.LEVELS:
+        level = pyramid.levels[f]
+        np.testing.assert_allclose(level.values, _reference(values, f), rtol=1e-5, equal_nan=True)
+        np.testing.assert_allclose(level.values, sti_lod.block_mean(values, f), rtol=1e-5, equal_nan=True)
+        assert level["latitude"].size == -(-LATS.size // f)
+        np.testing.assert_allclose(level["latitude"].values[0], LATS[:f].mean())
+    assert np.isnan(pyramid.levels[8].values[2, 1])
+    assert np.isfinite(pyramid.levels[8].values[0, 0])
+
+
+def test_pyramid_is_built_once_per_step(decoded):
+    with patch.object(sti_lod, "build_pyramid", wraps=sti_lod.build_pyramid) as build:
+        sti_lod.get_pyramid("2025010100", "000")
+        sti_lod.get_pyramid("2025010100", "000")
+    assert build.call_count == 1
+
+
+def test_choose_factor():
+    rows, cols = slice(0, 100), slice(0, 40)
+    assert sti_lod.choose_factor(rows, cols, 4000) == 1
+    assert sti_lod.choose_factor(rows, cols, 1000) == 2
+    assert sti_lod.choose_factor(rows, cols, 250) == 4
+    assert sti_lod.choose_factor(rows, cols, 1) == 8
+    # Recorte desalineado: 2 celdas que caen en 2 bloques de 2
+    assert sti_lod.choose_factor(slice(1, 3), slice(1, 3), 1) == 4
+
+
+def test_small_bbox_with_small_max_cells_is_not_empty():
+    lats = np.arange(10.0)
+    lons = np.arange(10.0)
+    values = np.arange(100, dtype=np.float32).reshape(10, 10)
+    sti = xr.DataArray(values, dims=("latitude", "longitude"), coords={"latitude": lats, "longitude": lons})
+    d = DecodedStep(run="2025010100", step="000", etag="etag-small", sti=sti)
+    sti_lod.LOD_CACHE.clear()
+    with patch("app.services.sti_service.get_sti", return_value=d):
+        for max_cells in (1, 2, 4):
+            sub = sti_lod.subset_lod("2025010100", "000", 1, 2, 1, 2, max_cells=max_cells)
+            assert 0 < sub.size <= max_cells
+        sub = sti_lod.subset_lod("2025010100", "000", 1, 2, 1, 2, max_cells=1)
+        assert sub.attrs["lod_factor"] == 4
+        assert float(sub.values[0, 0]) == pytest.approx(values[:4, :4].mean())
+    sti_lod.LOD_CACHE.clear()
+
+
+def test_subset_with_max_cells(decoded):
+    full = sti_service.subset_sti("2025010100", "000", -56, -17, -76, -66)
+    small = sti_service.subset_sti("2025010100", "000", -34, -33, -71, -70, max_cells=100)
+    big = sti_service.subset_sti("2025010100", "000", -56, -17, -76, -66, max_cells=200)
+
+    assert small.attrs["lod_factor"] == 1
+    assert big.attrs["lod_factor"] == 8
+    assert big.size <= 200 < full.size
+
+
+def test_endpoint_reports_lod_factor(decoded):
+    url = "/sti/2025010100/000/subset?lat_min=-56&lat_max=-17&lon_min=-76&lon_max=-66"
+    data = client.get(url + "&max_cells=2000&layout=grid").json()
+    assert data["lod_factor"] == 2
+    assert len(data["latitude"]) * len(data["longitude"]) <= 2000
+
+    response = client.get(url + "&max_cells=2000&format=f32")
+    assert response.headers["x-sti-lod-factor"] == "2"
+    assert "lod_factor" not in client.get(url + "&layout=grid").json()
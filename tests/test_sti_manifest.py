@@ -0,0 +1,192 @@
+import json
+import os
+import threading
+import time
+from typing import Any
+from unittest.mock import patch
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from app.config import settings
+from app.services import sti_manifest, sti_service
+from app.services.sti_manifest import MANIFEST_KEY, ManifestReader, publish_manifest
+
+BUCKET = settings.S3_BUCKET_NAME
+
+
+def _put_step(conn, run: str, step: str, body: bytes = b"x" * 200) -> None:
+    conn.put_object(Bucket=BUCKET, Key=sti_service.build_nc_key(run, step), Body=body)
+
+
+def _clear():
+    sti_manifest.MANIFEST.clear()
+    sti_service.METADATA_CACHE.clear()
+    sti_service.ETAG_CACHE.clear()
+
+
+@pytest.fixture
+def s3() -> Any:
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    _clear()
+    with mock_aws():
+        conn = boto3.client("s3", region_name="us-east-1")
+        conn.create_bucket(Bucket=BUCKET)
+        _put_step(conn, "2025010100", "000")
+        _put_step(conn, "2025010100", "006")
+        _put_step(conn, "2025010112", "000")
+        conn.put_object(Bucket=BUCKET, Key="indices/sti/run=2025010112/step=000/notes.txt", Body=b"x")
+        with patch.object(sti_service, "s3_client", conn):
+            yield conn
+    _clear()
+
+
+def _stored(conn) -> dict:
+    return json.loads(conn.get_object(Bucket=BUCKET, Key=MANIFEST_KEY)["Body"].read())
+
+
+def test_publish_full_manifest(s3):
+    manifest = publish_manifest(with_stats=False)
+    assert manifest == _stored(s3)
+    assert list(manifest["runs"]) == ["2025010100", "2025010112"]
+
+    entry = manifest["runs"]["2025010100"]["steps"]["006"]
+    head = s3.head_object(Bucket=BUCKET, Key=entry["key"])
+    assert entry["size"] == 200
+    assert entry["etag"] == head["ETag"].strip('"')
+    assert manifest["runs"]["2025010100"]["published_at"]
+
+
+def test_incremental_publish_merges_runs(s3):
+    publish_manifest(with_stats=False)
+    _put_step(s3, "2025010200", "000")
+    _put_step(s3, "2025010100", "012")
+
+    manifest = publish_manifest(["2025010200", "2025010100"], with_stats=False)
+    assert list(manifest["runs"]) == ["2025010100", "2025010112", "2025010200"]
+    assert list(manifest["runs"]["2025010100"]["steps"]) == ["000", "006", "012"]
+
+
+def test_conflicting_writer_is_retried(s3):
+    publish_manifest(with_stats=False)
+    real_put = s3.put_object
+    calls = {"n": 0}
+
+    def flaky_put(**kwargs):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+        return real_put(**kwargs)
+
+    with patch.object(s3, "put_object", side_effect=flaky_put):
+        publish_manifest(["2025010112"], with_stats=False)
+    assert calls["n"] == 2
+
+
+def test_full_rebuild_does_not_overwrite_a_concurrent_publish(s3):
+    publish_manifest(with_stats=False)
+    real_scan = sti_manifest.scan_runs
+    calls = {"n": 0}
+
+    def racing_scan(runs=None, with_stats=True):
+        calls["n"] += 1
+        out = real_scan(runs, with_stats=with_stats)
+        if runs is None and calls["n"] == 1:
+            # Otro publicador agrega un run entre el listado y el PUT de la reconstrucción
+            _put_step(s3, "2025010200", "000")
+            publish_manifest(["2025010200"], with_stats=False)
+        return out
+
+    with patch.object(sti_manifest, "scan_runs", side_effect=racing_scan):
+        manifest = publish_manifest(with_stats=False)
+    assert calls["n"] == 3  # reconstrucción, publish incremental, reconstrucción reintentada
+    assert list(manifest["runs"]) == ["2025010100", "2025010112", "2025010200"]
+    assert _stored(s3) == manifest
+
+
+def test_new_runs_are_not_hidden_by_the_listing_cache(s3):
+    publish_manifest(with_stats=False)
+    assert sti_service.list_runs() == ["2025010100", "2025010112"]
+    assert sti_service.list_steps("2025010100") == ["000", "006"]
+
+    _put_step(s3, "2025010100", "012")
+    _put_step(s3, "2025010200", "000")
+    publish_manifest(["2025010100", "2025010200"], with_stats=False)
+    sti_manifest.MANIFEST.clear()  # próxima revalidación del manifest; METADATA_CACHE intacto
+    assert sti_service.list_runs() == ["2025010100", "2025010112", "2025010200"]
+    assert sti_service.list_steps("2025010100") == ["000", "006", "012"]
+
+
+def test_list_runs_and_steps_use_manifest(s3):
+    publish_manifest(with_stats=False)
+    with patch.object(s3, "get_paginator") as paginator:
+        assert sti_service.list_runs() == ["2025010100", "2025010112"]
+        assert sti_service.list_steps("2025010100") == ["000", "006"]
+    paginator.assert_not_called()
+
+
+def test_without_manifest_falls_back_to_listing(s3):
+    assert sti_service.list_runs() == ["2025010100", "2025010112"]
+    assert sti_service.list_steps("2025010100") == ["000", "006"]
+
+
+def test_object_etag_from_manifest_skips_head(s3):
+    manifest = publish_manifest(with_stats=False)
+    key = sti_service.build_nc_key("2025010100", "000")
+    with patch.object(s3, "head_object") as head:
+        assert sti_service.object_etag(key) == manifest["runs"]["2025010100"]["steps"]["000"]["etag"]
+    head.assert_not_called()
+
+
+def test_stale_while_revalidate(s3):
+    publish_manifest(with_stats=False)
+    reader = ManifestReader(ttl=0.5)
+    assert reader.runs() == ["2025010100", "2025010112"]
+
+    _put_step(s3, "2025010200", "000")
+    publish_manifest(with_stats=False)
+    assert reader.runs() == ["2025010100", "2025010112"]  # copia fresca, sin GET
+
+    time.sleep(0.6)
+    assert reader.runs() == ["2025010100", "2025010112"]  # vencida: se sirve y se revalida en fondo
+    deadline = time.time() + 5
+    while reader.runs() != ["2025010100", "2025010112", "2025010200"] and time.time() < deadline:
+        time.sleep(0.02)
+    assert reader.runs()[-1] == "2025010200"
+
+
+def test_unchanged_manifest_revalidates_with_304(s3):
+    publish_manifest(with_stats=False)
+    reader = ManifestReader(ttl=0)
+    first = reader.get()
+    reader._fetch()
+    assert reader.get() is first
+    assert reader.status()["errors"] == 0
+
+
+def test_concurrent_first_reads_wait_for_the_loader():
+    release = threading.Event()
+    calls = []
+
+    def slow_read(if_none_match=None):
+        calls.append(1)
+        release.wait(5)
+        return {"runs": {"2025010100": {"steps": {}}}}, '"e1"'
+
+    reader = ManifestReader(ttl=60)
+    results = []
+    with patch.object(sti_manifest, "read_manifest", side_effect=slow_read):
+        threads = [threading.Thread(target=lambda: results.append(reader.runs())) for _ in range(4)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        assert results == []
+        release.set()
+        for t in threads:
+            t.join(5)
+    assert results == [["2025010100"]] * 4
+    assert len(calls) == 1
@@ -0,0 +1,59 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import xarray as xr
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import sti_points
+from app.services.sti_cache import DecodedCache, DecodedStep
+
+client = TestClient(app)
+
+LATS = np.array([-33.0, -33.25, -33.5])
+LONS = np.array([-71.0, -70.75])
+STEPS = ["000", "024", "048"]
+
+
+def _decoded(run, step):
+    values = np.full((LATS.size, LONS.size), float(int(step)))
+    values[2, 1] = np.nan
+    sti = xr.DataArray(values, dims=("latitude", "longitude"), coords={"latitude": LATS, "longitude": LONS})
+    return DecodedStep(run=run, step=step, etag=f"etag-{step}", sti=sti)
+
+
+@pytest.fixture
+def patched_service():
+    with patch.object(sti_points, "POINT_CUBE_CACHE", DecodedCache(10 * 1024 * 1024)), \
+         patch("app.services.sti_service.list_steps", return_value=STEPS), \
+         patch("app.services.sti_service.object_etag", side_effect=lambda key: key), \
+         patch("app.services.sti_service.get_sti", side_effect=_decoded) as get_sti:
+        yield get_sti
+
+
+def test_point_returns_whole_series(patched_service):
+    response = client.get("/sti/2025010100/point?lat=-33.2&lon=-70.8")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["steps"] == STEPS
+    pt = body["points"][0]
+    assert pt["lat_used"] == -33.25
+    assert pt["lon_used"] == -70.75
+    assert pt["sti"] == [0.0, 24.0, 48.0]
+
+
+def test_multi_point_post_reuses_cached_cube(patched_service):
+    payload = {"points": [{"lat": -33.5, "lon": -70.75}, {"lat": 10.0, "lon": -70.0}, {"lat": -33.0, "lon": 289.0}]}
+    body = client.post("/sti/2025010100/points", json=payload).json()
+    assert body["points"][0]["sti"] == [None, None, None]
+    assert "error" in body["points"][1]
+    assert body["points"][2]["lon_used"] == -71.0
+
+    client.get("/sti/2025010100/point?lat=-33.0&lon=-71.0")
+    assert patched_service.call_count == len(STEPS)
+
+
+def test_unknown_run_is_404(patched_service):
+    with patch("app.services.sti_service.list_steps", return_value=[]):
+        assert client.get("/sti/1999010100/point?lat=-33&lon=-70").status_code == 404
@@ -0,0 +1,107 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import xarray as xr
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.lib.geo import mask as geo_mask
+from app.main import app
+from app.services import sti_polygon
+from app.services.sti_cache import DecodedStep
+
+client = TestClient(app)
+
+LATS = np.round(np.arange(-17.0, -56.25, -0.25), 2)  # 157
+LONS = np.round(np.arange(-76.0, -65.75, 0.25), 2)   # 41
+URL = "/sti/2025010100/000/polygon"
+
+
+def _square(x0, y0, x1, y1):
+    return {"type": "Polygon", "coordinates": [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]}
+
+
+def _decoded() -> DecodedStep:
+    # Valor = latitud, así la media ponderada por área se puede verificar a mano
+    values = np.repeat(LATS[:, None], LONS.size, axis=1).astype(np.float32)
+    values[LATS == -33.0, :] = np.nan
+    sti = xr.DataArray(values, dims=("latitude", "longitude"), coords={"latitude": LATS, "longitude": LONS})
+    return DecodedStep(run="2025010100", step="000", etag="etag-1", sti=sti)
+
+
+@pytest.fixture(autouse=True)
+def decoded():
+    geo_mask.MASK_CACHE.clear()
+    with patch("app.services.sti_service.get_sti", return_value=_decoded()) as get_sti:
+        yield get_sti
+    geo_mask.MASK_CACHE.clear()
+
+
+def test_area_weighted_stats():
+    geom = _square(-71.1, -34.1, -69.9, -31.9)
+    response = client.post(URL, json=geom, params={"percentiles": [50]})
+    assert response.status_code == 200
+    stats = response.json()["sti_stats"]
+
+    lats = LATS[(LATS >= -34.0) & (LATS <= -32.0)]
+    assert stats["cells"] == lats.size * 5
+    assert stats["nan_cells"] == 5
+    valid = lats[lats != -33.0]
+    w = np.cos(np.deg2rad(valid))
+    assert stats["mean"] == pytest.approx(np.sum(valid * w) / w.sum(), rel=1e-6)
+    assert stats["min"] == pytest.approx(-34.0)
+    assert stats["max"] == pytest.approx(-32.0)
+    assert set(stats["percentiles"]) == {"p50"}
+    assert 0 < stats["valid_area_fraction"] < 1
+
+
+def test_mask_is_cached_per_geometry():
+    geom = _square(-71.1, -34.1, -69.9, -31.9)
+    with patch.object(geo_mask, "build_mask", wraps=geo_mask.build_mask) as build:
+        client.post(URL, json=geom)
+        client.post(URL, json={"type": "Feature", "properties": {}, "geometry": geom})
+        client.post(URL, json=_square(-72.1, -34.1, -69.9, -31.9))
+    assert build.call_count == 2
+    masks = client.get("/sti/cache").json()["masks"]
+    assert masks["hits"] == 1
+    assert masks["max_bytes"] == settings.STI_MASK_CACHE_MAX_BYTES
+
+
+def test_small_polygon_takes_containing_cell():
+    stats = client.post(URL, json=_square(-70.62, -40.62, -70.58, -40.58)).json()["sti_stats"]
+    assert stats["cells"] == 1
+    assert stats["mean"] == pytest.approx(-40.5)
+
+
+def test_multipolygon_and_outside_grid():
+    geom = {"type": "MultiPolygon", "coordinates": [
+        _square(-71.1, -20.1, -70.9, -19.9)["coordinates"],
+        _square(-71.1, -50.1, -70.9, -49.9)["coordinates"],
+    ]}
+    stats = client.post(URL, json=geom).json()["sti_stats"]
+    assert stats["cells"] == 2
+    assert stats["min"] == pytest.approx(-50.0)
+    assert stats["max"] == pytest.approx(-20.0)
+
+    outside = client.post(URL, json=_square(10, 10, 11, 11)).json()["sti_stats"]
+    assert outside["cells"] == 0
+    assert outside["mean"] is None
+
+
+def test_weighted_percentiles_match_numpy_with_equal_weights():
+    v = np.random.default_rng(0).standard_normal(101)
+    qs = [5, 50, 95]
+    np.testing.assert_allclose(
+        sti_polygon.weighted_percentiles(v, np.ones_like(v), qs), np.percentile(v, qs, method="hazen")
+    )
+
+
+def test_invalid_geometry_is_422():
+    response = client.post(URL, json={"type": "LineString", "coordinates": [[0, 0], [1, 1]]})
+    assert response.status_code == 422
+
+
+def test_percentiles_out_of_range_is_422():
+    response = client.post(URL, json=_square(-71.1, -34.1, -69.9, -31.9), params={"percentiles": [150]})
+    assert response.status_code == 422
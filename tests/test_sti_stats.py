@@ -0,0 +1,97 @@
+import json
+import os
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import boto3
+import numpy as np
+import pytest
+import xarray as xr
+from moto import mock_aws
+
+from app.config import settings
+from app.services import sti_service, sti_stats
+
+RUN = "2024021300"
+STEP = "024"
+
+
+def _remove_local_copy() -> None:
+    for suffix in ("", ".lock"):
+        path = sti_service.local_path(RUN, STEP) + suffix
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@pytest.fixture
+def mocked_s3(tmp_path: Path) -> Any:
+    _remove_local_copy()
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    with mock_aws():
+        conn = boto3.client("s3", region_name="us-east-1")
+        conn.create_bucket(Bucket=settings.S3_BUCKET_NAME)
+
+        data = np.arange(100, dtype=np.float32).reshape(10, 10)
+        data[0, :3] = np.nan
+        ds = xr.Dataset(
+            {"sti": (("latitude", "longitude"), data)},
+            coords={"latitude": np.linspace(-30, -39, 10), "longitude": np.linspace(-75, -66, 10)},
+        )
+        local_file = tmp_path / "step.nc"
+        ds.to_netcdf(str(local_file), engine="h5netcdf")
+        conn.upload_file(str(local_file), settings.S3_BUCKET_NAME, sti_service.build_nc_key(RUN, STEP))
+
+        sti_service.ETAG_CACHE.clear()
+        sti_service.STI_CACHE.clear()
+        sti_stats.STATS_CACHE.clear()
+        with patch.object(sti_service, "s3_client", conn):
+            yield conn
+        sti_service.ETAG_CACHE.clear()
+        sti_service.STI_CACHE.clear()
+        sti_stats.STATS_CACHE.clear()
+    _remove_local_copy()
+
+
+def test_stats_key_is_next_to_netcdf():
+    key = sti_stats.build_stats_key(RUN, 24)
+    assert key == f"indices/sti/run={RUN}/step={STEP}/sti_chile_run={RUN}_step={STEP}.stats.json"
+
+
+def test_value_stats_ignore_nan():
+    stats = sti_stats.sti_value_stats(np.array([1.0, np.nan, 3.0]))
+    assert stats["count"] == 2
+    assert stats["nan_count"] == 1
+    assert stats["mean"] == 2.0
+    assert sum(stats["histogram"]["counts"]) == 2
+    assert stats["percentiles"]["p50"] == 2.0
+
+
+def test_get_stats_writes_sidecar_on_first_miss(mocked_s3: Any):
+    stats = sti_stats.get_stats(RUN, STEP)
+    assert stats["sti_stats"]["nan_count"] == 3
+    assert stats["sti_stats"]["max"] == 99.0
+
+    body = mocked_s3.get_object(Bucket=settings.S3_BUCKET_NAME, Key=sti_stats.build_stats_key(RUN, STEP))["Body"].read()
+    assert json.loads(body)["etag"] == sti_service.object_etag(sti_service.build_nc_key(RUN, STEP))
+
+
+def test_get_stats_serves_sidecar_without_decoding(mocked_s3: Any):
+    sti_stats.publish_stats(RUN, STEP)
+    sti_service.STI_CACHE.clear()
+    sti_stats.STATS_CACHE.clear()
+
+    with patch.object(sti_service, "load_dataset", side_effect=AssertionError("NetCDF opened")):
+        stats = sti_stats.get_stats(RUN, STEP)
+    assert stats["dims"] == {"latitude": 10, "longitude": 10}
+    assert stats["vars"] == ["sti"]
+
+
+def test_stale_sidecar_is_recomputed(mocked_s3: Any):
+    stale = {"version": sti_stats.STATS_VERSION, "etag": "old", "sti_stats": {}}
+    mocked_s3.put_object(Bucket=settings.S3_BUCKET_NAME, Key=sti_stats.build_stats_key(RUN, STEP), Body=json.dumps(stale))
+    stats = sti_stats.get_stats(RUN, STEP)
+    assert stats["etag"] != "old"
+    assert stats["sti_stats"]["count"] == 97
@@ -0,0 +1,99 @@
+import struct
+import zlib
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import xarray as xr
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import sti_tiles
+from app.services.sti_cache import DecodedStep
+
+client = TestClient(app)
+
+
+def _decoded() -> DecodedStep:
+    lats = np.arange(-17.0, -56.25, -0.25)
+    lons = np.arange(-76.0, -65.75, 0.25)
+    values = np.linspace(-3, 3, lats.size * lons.size).reshape(lats.size, lons.size)
+    values[:10, :] = np.nan
+    sti = xr.DataArray(values, dims=("latitude", "longitude"), coords={"latitude": lats, "longitude": lons})
+    return DecodedStep(run="2025010100", step="000", etag="etag-1", sti=sti)
+
+
+@pytest.fixture
+def tile_cache(tmp_path):
+    cache = sti_tiles.TileCache(str(tmp_path), max_bytes=1024 * 1024)
+    with patch.object(sti_tiles, "TILE_CACHE", cache), \
+         patch("app.services.sti_service.object_etag", return_value="etag-1"), \
+         patch("app.services.sti_service.get_sti", return_value=_decoded()) as get_sti:
+        yield cache, get_sti
+
+
+def _png_rgba(data: bytes) -> np.ndarray:
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    w, h = struct.unpack(">II", data[16:24])
+    idat_len = struct.unpack(">I", data[33:37])[0]
+    raw = zlib.decompress(data[41:41 + idat_len])
+    return np.frombuffer(raw, dtype=np.uint8).reshape(h, w * 4 + 1)[:, 1:].reshape(h, w, 4)
+
+
+def test_tile_over_chile_is_rendered_and_cached(tile_cache):
+    cache, get_sti = tile_cache
+    # z=4, x=4, y=9 covers central Chile
+    response = client.get("/sti/2025010100/000/tiles/4/4/9.png")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    rgba = _png_rgba(response.content)
+    assert rgba.shape == (256, 256, 4)
+    assert (rgba[..., 3] == 255).any()
+    assert (rgba[..., 3] == 0).any()
+
+    again = client.get("/sti/2025010100/000/tiles/4/4/9.png")
+    assert again.content == response.content
+    assert get_sti.call_count == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_disk_level_survives_memory_eviction(tile_cache):
+    cache, get_sti = tile_cache
+    first = sti_tiles.get_tile("2025010100", "000", 4, 4, 9)
+    cache.clear_memory()
+    assert sti_tiles.get_tile("2025010100", "000", 4, 4, 9) == first
+    assert cache.stats()["disk_hits"] == 1
+    assert get_sti.call_count == 1
+
+
+def test_tile_outside_grid_is_transparent(tile_cache):
+    rgba = sti_tiles.render_tile(_decoded().sti, 2, 0, 0)
+    assert (rgba[..., 3] == 0).all()
+
+
+def test_invalid_tile_coordinates(tile_cache):
+    assert client.get("/sti/2025010100/000/tiles/2/9/0.png").status_code == 422
+    assert client.get("/sti/2025010100/000/tiles/2/0/0.gif").status_code == 422
+
+
+def test_disk_level_is_byte_bounded(tmp_path):
+    cache = sti_tiles.TileCache(str(tmp_path), max_bytes=1024, disk_max_bytes=2500)
+    keys = [("2025010100", "000", f"etag-{i}", "rdbu", 4, 4, 9, "png") for i in range(4)]
+    for key in keys[:2]:
+        cache.put(key, b"x" * 1000)
+    cache.clear_memory()
+    assert cache.get(keys[0]) is not None  # keys[1] pasa a ser el menos reciente
+    for key in keys[2:]:
+        cache.put(key, b"x" * 1000)
+
+    stats = cache.stats()
+    assert stats["disk_bytes"] <= 2500 and stats["disk_evictions"] == 2
+    assert not (tmp_path / "2025010100" / "000" / "etag-1").exists()
+    cache.clear_memory()
+    assert cache.get(keys[1]) is None and cache.get(keys[3]) is not None
+
+    # Un proceso nuevo siembra el índice desde el disco
+    reopened = sti_tiles.TileCache(str(tmp_path), max_bytes=1024, disk_max_bytes=2500)
+    reopened.put(keys[1], b"y" * 1000)
+    assert reopened.stats()["disk_bytes"] <= 2500
+    assert reopened.stats()["disk_evictions"] == 1
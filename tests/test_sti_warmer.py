@@ -0,0 +1,127 @@
+import os
+import time
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import boto3
+import numpy as np
+import pytest
+import xarray as xr
+from moto import mock_aws
+
+from app.config import settings
+from app.services import sti_service
+from app.services.sti_warmer import RunWarmer, TokenBucket
+
+RUNS = ["2023010100", "2023010112"]
+STEPS = ["000", "006"]
+
+
+def _cleanup(runs):
+    for run in runs:
+        for step in STEPS:
+            for suffix in ("", ".lock"):
+                path = sti_service.local_path(run, step) + suffix
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+@pytest.fixture
+def published(tmp_path: Path) -> Any:
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+    all_runs = RUNS + ["2023010200"]
+    _cleanup(all_runs)
+
+    ds = xr.Dataset({"sti": (("latitude", "longitude"), np.zeros((4, 4), dtype=np.float32))},
+                    coords={"latitude": np.arange(4.0), "longitude": np.arange(4.0)})
+    local_file = tmp_path / "step.nc"
+    ds.to_netcdf(str(local_file), engine="h5netcdf")
+
+    with mock_aws():
+        conn = boto3.client("s3", region_name="us-east-1")
+        conn.create_bucket(Bucket=settings.S3_BUCKET_NAME)
+
+        def publish(run):
+            for step in STEPS:
+                conn.upload_file(str(local_file), settings.S3_BUCKET_NAME, sti_service.build_nc_key(run, step))
+
+        for run in RUNS:
+            publish(run)
+        with patch.object(sti_service, "s3_client", conn):
+            yield publish
+    _cleanup(all_runs)
+
+
+def test_first_poll_warms_only_latest_run(published):
+    warmer = RunWarmer(poll_seconds=60, concurrency=2, initial_runs=1)
+    assert warmer.poll_once() == ["2023010112"]
+
+    assert all(os.path.exists(sti_service.local_path("2023010112", s)) for s in STEPS)
+    assert not os.path.exists(sti_service.local_path("2023010100", "000"))
+
+    progress = warmer.status()["runs"]["2023010112"]
+    assert progress["steps_done"] == 2
+    assert progress["steps_failed"] == 0
+    assert progress["bytes"] > 0
+    assert progress["finished_at"] is not None
+
+
+def test_new_run_is_detected_on_next_poll(published):
+    warmer = RunWarmer(poll_seconds=60, concurrency=2, initial_runs=1)
+    warmer.poll_once()
+    assert warmer.poll_once() == []
+
+    published("2023010200")
+    assert warmer.poll_once() == ["2023010200"]
+    assert os.path.exists(sti_service.local_path("2023010200", "006"))
+
+
+def test_token_bucket_throttles():
+    bucket = TokenBucket(rate=1000, capacity=100)
+    t0 = time.monotonic()
+    bucket.consume(100)
+    bucket.consume(200)
+    assert time.monotonic() - t0 >= 0.15
+
+
+def test_failed_and_late_steps_are_retried(published):
+    warmer = RunWarmer(poll_seconds=60, concurrency=1, initial_runs=1)
+    real = sti_service.ensure_local_file
+    calls = []
+
+    def flaky(run, step, **kwargs):
+        calls.append((run, step))
+        if step == "006" and calls.count((run, step)) == 1:
+            raise OSError("boom")
+        return real(run, step, **kwargs)
+
+    with patch.object(sti_service, "ensure_local_file", side_effect=flaky):
+        assert warmer.poll_once() == ["2023010112"]
+        assert warmer.status()["runs"]["2023010112"]["steps_failed"] == 1
+
+        # Sólo se reintenta el step que falló
+        assert warmer.poll_once() == ["2023010112"]
+        assert calls.count(("2023010112", "000")) == 1
+        progress = warmer.status()["runs"]["2023010112"]
+        assert progress["steps_done"] == 2 and progress["steps_failed"] == 0
+
+        # Un run más nuevo cierra el anterior, ya completo
+        published("2023010200")
+        assert warmer.poll_once() == ["2023010200"]
+    assert "2023010112" in warmer._seen and "2023010200" not in warmer._seen
+
+
+def test_step_published_later_is_warmed(published):
+    warmer = RunWarmer(poll_seconds=60, concurrency=1, initial_runs=1)
+    with patch.object(sti_service, "list_steps") as list_steps:
+        list_steps.side_effect = lambda run, use_cache=True: STEPS[:1]
+        assert warmer.poll_once() == ["2023010112"]
+        assert not os.path.exists(sti_service.local_path("2023010112", "006"))
+
+        list_steps.side_effect = lambda run, use_cache=True: STEPS
+        assert warmer.poll_once() == ["2023010112"]
+    assert os.path.exists(sti_service.local_path("2023010112", "006"))
+    assert warmer.status()["runs"]["2023010112"]["steps_total"] == 2
@@ -0,0 +1,131 @@
+import re
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from app.config import settings
+from app.services import sti_service, sti_zarr
+from app.services.sti_cache import DecodedStep
+
+pytest.importorskip("zarr")
+
+RUN = "2025020100"
+ETAGS = {}
+LATS = np.linspace(-17.0, -56.0, 157)
+LONS = np.linspace(-76.0, -66.0, 41)
+
+
+def _etag(run, step) -> str:
+    step = f"{int(step):03d}"
+    return ETAGS.get(step, f"etag-{step}")
+
+
+def _object_etag(key: str) -> str:
+    run, step = re.search(r"run=(\d{10})/step=(\d{3})/", key).groups()
+    return _etag(run, step)
+
+
+def _decoded(run, step) -> DecodedStep:
+    # Un step republicado ("etag-XXX-v2") trae otros valores
+    values = np.full((LATS.size, LONS.size), float(int(step)) + (step in ETAGS), dtype=np.float32)
+    values[0, 0] = np.nan
+    sti = xr.DataArray(values, dims=("latitude", "longitude"), coords={"latitude": LATS, "longitude": LONS})
+    return DecodedStep(run=run, step=step, etag=_etag(run, step), sti=sti)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    path = str(tmp_path / "run.zarr")
+    monkeypatch.setattr(settings, "STI_ZARR_ENABLED", True)
+    monkeypatch.setattr(settings, "STI_ZARR_CHUNK", 32)
+    sti_zarr.STORE_CACHE.clear()
+    sti_service.METADATA_CACHE.clear()
+    ETAGS.clear()
+    with patch.object(sti_zarr, "_store", return_value=path), \
+            patch("app.services.sti_service.get_sti", side_effect=_decoded) as get_sti, \
+            patch("app.services.sti_service.object_etag", side_effect=_object_etag):
+        yield path, get_sti
+    sti_zarr.STORE_CACHE.clear()
+    sti_service.METADATA_CACHE.clear()
+    ETAGS.clear()
+
+
+def test_convert_appends_only_missing_steps(store):
+    path, get_sti = store
+    assert sti_zarr.convert_run(RUN, ["000", "006"]) == ["000", "006"]
+    assert sti_zarr.convert_run(RUN, ["000", "006", "012"]) == ["012"]
+    assert get_sti.call_count == 3
+
+    ds = xr.open_zarr(path, consolidated=True)
+    assert ds["sti"].dims == ("step", "latitude", "longitude")
+    assert ds["sti"].encoding["chunks"] == (1, 32, 32)
+    assert sti_zarr.store_steps(RUN) == ["000", "006", "012"]
+    assert ds.attrs["source_etags"] == {"000": "etag-000", "006": "etag-006", "012": "etag-012"}
+
+
+def test_list_steps_unions_store_and_listing(store):
+    sti_zarr.convert_run(RUN, ["000", "024"])
+    # Store parcial: "006" sólo existe como NetCDF
+    with patch.object(sti_service, "_list_steps_s3", return_value=["000", "006"]):
+        assert sti_service.list_steps(RUN) == ["000", "006", "024"]
+
+
+def test_republished_step_is_not_served_stale(store):
+    _, get_sti = store
+    sti_zarr.convert_run(RUN, ["000", "006"])
+    ETAGS["006"] = "etag-006-v2"
+    sti_zarr.STORE_CACHE.clear()
+
+    with patch.object(sti_service, "load_dataset") as load_dataset:
+        sti_service.subset_sti(RUN, "006", -20.0, -18.0, -75.0, -73.0)
+        sub = sti_service.subset_sti(RUN, "000", -20.0, -18.0, -75.0, -73.0)
+    load_dataset.assert_not_called()
+    assert get_sti.call_args_list[-1].args == (RUN, "006")  # "006" desde el NetCDF
+    assert np.nanmax(sub.values) == 0.0  # "000" sigue saliendo del store
+
+    get_sti.reset_mock()
+    assert sti_zarr.convert_run(RUN, ["000", "006"]) == ["006"]
+    assert sti_zarr.store_steps(RUN) == ["000", "006"]
+    assert sti_zarr.store_etag(RUN, "006") == "etag-006-v2"
+    get_sti.reset_mock()
+    sub = sti_service.subset_sti(RUN, "006", -20.0, -18.0, -75.0, -73.0)
+    get_sti.assert_not_called()
+    assert np.nanmax(sub.values) == 7.0
+
+
+def test_subset_reads_from_store_without_netcdf(store):
+    _, get_sti = store
+    sti_zarr.convert_run(RUN, ["000", "006"])
+    get_sti.reset_mock()
+
+    with patch.object(sti_service, "load_dataset") as load_dataset:
+        sub = sti_service.subset_sti(RUN, "006", -20.0, -18.0, -75.0, -73.0)
+
+    load_dataset.assert_not_called()
+    get_sti.assert_not_called()
+    expected = sti_service.select_bbox(_decoded(RUN, "006").sti, -20.0, -18.0, -75.0, -73.0)
+    np.testing.assert_array_equal(sub.values, expected.values)
+    np.testing.assert_allclose(sub["latitude"].values, expected["latitude"].values)
+
+
+def test_missing_store_falls_back(store, monkeypatch):
+    monkeypatch.setattr(sti_zarr, "_zarr_available", lambda: True)
+    assert sti_zarr.open_run_store(RUN) is None
+    assert sti_zarr.store_steps(RUN) == []
+    assert not sti_zarr.has_step(RUN, 0, "etag-000")
+
+
+def test_int16_packing_roundtrip(store, monkeypatch):
+    path, _ = store
+    monkeypatch.setattr(settings, "STI_ZARR_INT16", True)
+    sti_zarr.convert_run(RUN, ["000", "006"])
+
+    raw = xr.open_zarr(path, consolidated=True, mask_and_scale=False)
+    assert raw["sti"].dtype == np.int16
+    assert int(raw["sti"].values[1, 0, 0]) == -32768
+
+    sub = sti_service.subset_sti(RUN, "006", -18, -17, -76, -74)
+    assert np.isnan(sub.values[0, 0])
+    np.testing.assert_allclose(sub.values[0, 1:], 6.0, atol=1e-3)
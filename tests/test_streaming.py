@@ -0,0 +1,81 @@
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from app.lib.historic.extract import MAX_POINTS
+from app.services import sti_encoding
+
+VALUES = np.array([[0.1, np.nan, 0.3], [0.4, 0.5, 0.6]])
+
+
+@pytest.fixture
+def patched_subset(serve_subset):
+    return serve_subset(VALUES)
+
+
+def test_subset_ndjson_rows(patched_subset, client, subset_url):
+    response = client.get(subset_url, headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(sti_encoding.NDJSON)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == {"run": "2025010100", "step": "000", "longitude": [-71.0, -70.75, -70.5], "rows": 2}
+    assert lines[1] == {"latitude": -33.0, "sti": [0.1, None, 0.3]}
+    assert lines[2] == {"latitude": -33.25, "sti": [0.4, 0.5, 0.6]}
+    assert client.get(subset_url + "&format=ndjson").text == response.text
+
+
+def test_subset_streamed_flat_matches_dict_layout(patched_subset, client, subset_url):
+    streamed = client.get(subset_url + "&stream=true")
+    assert streamed.status_code == 200
+    assert "content-length" not in streamed.headers  # chunked
+    body = streamed.json()
+    assert body["latitudes"] == [-33.0, -33.0, -33.0, -33.25, -33.25, -33.25]
+    assert body["longitudes"] == [-71.0, -70.75, -70.5] * 2
+    assert body["sti"] == [0.1, None, 0.3, 0.4, 0.5, 0.6]
+
+
+def _historic_dataset() -> xr.Dataset:
+    times = pd.date_range("2020-01-01", periods=3, freq="MS")
+    data = np.arange(3 * 2 * 2, dtype=float).reshape(3, 2, 2) + 280.0
+    ds = xr.Dataset(
+        {"t2m": (["valid_time", "latitude", "longitude"], data)},
+        coords={"valid_time": times, "latitude": [40.0, 41.0], "longitude": [-4.0, -3.0]},
+    )
+    ds["t2m"].attrs["units"] = "K"
+    return ds
+
+
+@pytest.fixture
+def historic():
+    with patch("app.lib.historic.extract.load_merged_dataset", return_value=_historic_dataset()), \
+            patch("app.routers.historic.dataset_signature", return_value=(("a.nc", 1, 1),)):
+        yield
+
+
+BODY = {"points": [{"lat": 40.0, "lon": -4.0}, {"lat": 41.0, "lon": -3.0}, {"lat": 10.0, "lon": 10.0}]}
+
+
+def test_historic_stream_matches_buffered(historic, client):
+    buffered = client.post("/historic/t2m", json=BODY).json()
+    streamed = client.post("/historic/t2m?stream=true", json=BODY)
+    assert streamed.status_code == 200
+    assert streamed.json() == buffered
+    assert streamed.headers["etag"] != client.post("/historic/t2m", json=BODY).headers["etag"]
+
+
+def test_historic_ndjson(historic, client):
+    response = client.post("/historic/t2m", json=BODY, headers={"Accept": "application/x-ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 3
+    assert lines[0]["series"][0]["value"] == pytest.approx(280.0 - 273.15)
+    assert "error" in lines[2]
+
+
+def test_historic_stream_validates_before_streaming(historic, client):
+    too_many = {"points": [{"lat": 40.0, "lon": -4.0}] * (MAX_POINTS + 1)}
+    assert client.post("/historic/t2m?format=ndjson", json=too_many).status_code == 422
@@ -0,0 +1,74 @@
+import io
+
+import numpy as np
+import pytest
+
+from app.services import sti_encoding
+
+VALUES = np.array([[0.1, np.nan, 0.3], [0.4, 0.5, 0.6]])
+
+
+@pytest.fixture(autouse=True)
+def patched_subset(serve_subset):
+    return serve_subset(VALUES)
+
+
+def test_json_is_default(serve_subset, client, subset_url):
+    serve_subset(np.nan_to_num(VALUES))
+    response = client.get(subset_url)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/json")
+    assert len(response.json()["sti"]) == 6
+
+
+def test_octet_stream_grid_roundtrip(client, subset_url):
+    response = client.get(subset_url, headers={"Accept": "application/octet-stream"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == sti_encoding.F32
+    lat, lon, grid = sti_encoding.decode_f32_grid(response.content)
+    np.testing.assert_allclose(lat, [-33.0, -33.25])
+    np.testing.assert_allclose(lon, [-71.0, -70.75, -70.5])
+    np.testing.assert_allclose(grid, VALUES.astype(np.float32))
+    assert len(response.content) == 16 + 4 * (2 + 3 + 6)
+
+
+def test_npy_with_axis_headers(client, subset_url):
+    response = client.get(subset_url + "&format=npy")
+    assert response.status_code == 200
+    grid = np.load(io.BytesIO(response.content))
+    assert grid.dtype == np.dtype("<f4")
+    assert grid.shape == (2, 3)
+    assert response.headers["x-sti-latitude"] == "-33.0,-33.25,2"
+
+
+def test_arrow_ipc_stream(client, subset_url):
+    pa = pytest.importorskip("pyarrow")
+    response = client.get(subset_url, headers={"Accept": "application/vnd.apache.arrow.stream"})
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.schema.metadata[b"shape"] == b"[2, 3]"
+    np.testing.assert_allclose(table.column("sti").to_numpy(), VALUES.ravel().astype(np.float32))
+
+
+def test_negotiate_prefers_highest_quality():
+    accept = "application/json;q=0.5, application/x-npy"
+    assert sti_encoding.negotiate(accept) == sti_encoding.NPY
+    assert sti_encoding.negotiate("text/html") == sti_encoding.JSON
+    assert sti_encoding.negotiate(accept, "f32") == sti_encoding.F32
+
+
+def test_grid_layout_axes_once_and_nan_as_null(client, subset_url):
+    response = client.get(subset_url + "&layout=grid")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["layout"] == "grid"
+    assert body["latitude"] == [-33.0, -33.25]
+    assert body["longitude"] == [-71.0, -70.75, -70.5]
+    assert body["sti"] == [[0.1, None, 0.3], [0.4, 0.5, 0.6]]
+
+
+def test_grid_layout_empty_subset(serve_subset, client, subset_url):
+    serve_subset(VALUES[:0])
+    response = client.get(subset_url + "&layout=grid")
+    assert response.json()["sti"] == []
+    assert response.json()["latitude"] == []